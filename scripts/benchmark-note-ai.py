@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the AI note pipelines (no network, no API key).
+
+Runs NoteExtractionGraph and NoteNormalizationGraph against the fake LLM backend on
+synthetic ambiguous-notes files and reports phrases/sec, p50/p95/p99 per-phrase latency,
+peak RSS and tokens per phrase. Each (pipeline, size) runs in its own process so peak RSS
+is not inflated by the previous run.
+
+Usage:
+    python scripts/benchmark-note-ai.py                                   # 1k and 10k, both pipelines
+    python scripts/benchmark-note-ai.py --sizes 1000,10000,100000 --concurrency 8 --batch-size 10
+    python scripts/benchmark-note-ai.py --latency lognormal:0.4,0.5 --faults 429=0.02,malformed=0.01
+    python scripts/benchmark-note-ai.py --latency lognormal:0.05,1.0 --faults stall=0.01 --call-timeout 2 --hedge
+    python scripts/benchmark-note-ai.py --sizes 1000 --baseline reports/benchmarks/baseline.json  # CI gate
+    python scripts/benchmark-note-ai.py --cluster                        # Duplicate clustering, 10k and 100k notes
+
+With --baseline, exits 1 when phrases/sec drops, or p95 latency grows, by more than
+--max-regression (default 20%) for any (pipeline, size) present in both files.
+
+--startup instead measures start-up of the short invocations the JS/TS importers make
+(bad arguments, an exact-match normalization, --help) with `python -X importtime`, and
+exits 1 if one of them imports LangChain/LangGraph/NumPy or exceeds --startup-budget-ms.
+
+--cluster instead times catalog-wide duplicate clustering (normalize-note-ai.py cluster) on
+synthetic catalogs of --sizes notes (default 10k and 100k) with injected case, hyphen, suffix and
+typo variants: seconds per stage, candidate pairs, clusters, matrix memory, peak RSS, and the share
+of injected variants that landed in their original's cluster. Needs numpy.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import importlib.util
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+project_root = Path(__file__).parent.parent
+scripts_dir = Path(__file__).parent
+sys.path.insert(0, str(scripts_dir))
+
+from note_ai.fake_llm import FakeChatModel
+from note_ai.metrics import METRICS
+from note_ai.scheduler import DEFAULT_CALL_TIMEOUT, DEFAULT_HEDGE_BUDGET, HedgePolicy, RequestScheduler
+
+BENCH_DIR = project_root / "reports" / "benchmarks"
+
+# Vocabulary for synthetic phrases; shapes mirror what extract-ambiguous-notes.js emits.
+NOTE_WORDS = [
+    "vanilla", "rose", "amber", "musk", "oud", "sandalwood", "bergamot", "jasmine", "patchouli",
+    "vetiver", "tonka", "leather", "tobacco", "iris", "neroli", "cedar", "incense", "saffron",
+    "black tea", "sea salt", "pink pepper", "white birch wood", "coconut", "fig leaf", "myrrh",
+    "orange blossom", "tuberose", "lavender", "cardamom", "benzoin", "labdanum", "honey", "cocoa",
+]
+MODIFIERS = ["fresh", "smoky", "dark", "sweet", "warm", "bitter", "green", "creamy", "dried", "wet"]
+TEMPLATES = [
+    "{a} and {b}",
+    "{a}, {b}, {c}",
+    "hints of {a}",
+    "soaked in {a}",
+    "along with {a}",
+    "a touch of {m} {a}",
+    "base {a}",
+    "{a} & more",
+    "{a}/{b}",
+    "{m} {a} and {b} and {c}",
+    "he spritzes a touch of the {d}s",
+    "with every inhale",
+    "limited time only",
+]
+REASONS = [
+    "Complex phrase requiring AI extraction",
+    "Marked invalid but might have extractable notes",
+    "Confirm valid scent note",
+]
+
+
+def synthetic_phrase(rng: random.Random) -> str:
+    a, b, c = rng.sample(NOTE_WORDS, 3)
+    return rng.choice(TEMPLATES).format(a=a, b=b, c=c, m=rng.choice(MODIFIERS), d=rng.choice(range(20, 100, 10)))
+
+
+def synthetic_ambiguous_notes(size: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(size):
+        reason = REASONS[2] if rng.random() < 0.1 else rng.choice(REASONS[:2])
+        phrase = f"{rng.choice(MODIFIERS)} {rng.choice(NOTE_WORDS)}" if reason == REASONS[2] else synthetic_phrase(rng)
+        rows.append({"id": f"bench_{i}", "name": phrase, "reason": reason})
+    return rows
+
+
+def synthetic_catalog(size: int, seed: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    catalog = list(NOTE_WORDS)
+    while len(catalog) < size:
+        catalog.append(f"{rng.choice(MODIFIERS)} {rng.choice(NOTE_WORDS)} {len(catalog)}")
+    return catalog
+
+
+# Pseudo-words for synthetic note catalogs large enough for --cluster; NOTE_WORDS alone repeats too soon.
+SYLLABLES = [
+    "ba", "ver", "to", "ka", "mi", "ra", "san", "dal", "wo", "od", "ne", "ro", "li", "am", "ber", "gam", "pa",
+    "chou", "lo", "ve", "ti", "ir", "is", "sa", "ron", "mus", "ky", "cit", "rus", "lem", "on", "ly", "che", "ri",
+    "ta", "fi", "go", "nu", "mar", "zel", "qua", "dor", "bel", "vin", "tam", "sor", "pel", "gu", "xa", "hel",
+]
+VARIANT_SUFFIXES = ["oil", "petals", "flower", "leaf", "extract", "absolute", "bean"]
+
+
+def _variant(rng: random.Random, name: str) -> str:
+    kind = rng.random()
+    if kind < 0.3:
+        return name.title()
+    if kind < 0.55:
+        return f"{name} {rng.choice(VARIANT_SUFFIXES)}"
+    if kind < 0.7 and " " in name:
+        return name.replace(" ", "-", 1)
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1:] if len(name) > 4 else name + name[-1]
+
+
+def synthetic_note_catalog(size: int, seed: int, variant_rate: float = 0.1) -> List[Dict]:
+    """
+    Notes-table rows ({"id", "name"}) with unique names; about variant_rate of them are variants
+    of an earlier row, which they reference as "variant_of".
+    """
+    rng = random.Random(seed)
+    rows: List[Dict] = []
+    seen = set()
+    while len(rows) < size:
+        row = {"id": f"note_{len(rows)}"}
+        if rows and rng.random() < variant_rate:
+            base = rng.choice(rows)
+            row.update(name=_variant(rng, base["name"]), variant_of=base.get("variant_of", base["id"]))
+        else:
+            words = rng.choice([1, 1, 2, 2, 3])
+            row["name"] = " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                                   for _ in range(words))
+        if row["name"] not in seen:
+            seen.add(row["name"])
+            rows.append(row)
+    return rows
+
+
+def dataset_path(size: int, seed: int) -> Path:
+    """Write (once) and return the synthetic ambiguous-notes file for this size and seed."""
+    path = BENCH_DIR / f"synthetic-ambiguous-notes-{size}-s{seed}.json"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_ambiguous_notes(size, seed), f, indent=2)
+    return path
+
+
+def _load_script(filename: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, scripts_dir / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class _TimedApp:
+    """
+    Compiled-graph proxy that records the wall time of every graph invocation.
+
+    Each invocation's time is charged to every phrase it carried. abatch_as_completed
+    re-implements the Runnable default (semaphore + ainvoke per input) so inputs are timed
+    individually rather than as one batch.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.latencies: List[float] = []
+
+    def _record(self, state, started: float):
+        self.latencies.extend([time.perf_counter() - started] * len(state.get("batch") or [None]))
+
+    def invoke(self, state, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self.app.invoke(state, *args, **kwargs)
+        finally:
+            self._record(state, started)
+
+    async def abatch_as_completed(self, inputs, config=None, return_exceptions=False):
+        semaphore = asyncio.Semaphore((config or {}).get("max_concurrency") or len(inputs) or 1)
+
+        async def run(index, state):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    return index, await self.app.ainvoke(state)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    return index, e
+                finally:
+                    self._record(state, started)
+
+        for done in asyncio.as_completed([run(i, s) for i, s in enumerate(inputs)]):
+            yield await done
+
+
+def _scheduler(args) -> RequestScheduler:
+    # The fake backend has no quota, so pacing is off; retries and backoff stay realistic.
+    return RequestScheduler(
+        requests_per_minute=float("inf"),
+        tokens_per_minute=float("inf"),
+        max_concurrency=args.concurrency,
+        base_delay=args.retry_after,
+        call_timeout=args.call_timeout,
+        hedge=HedgePolicy(budget=args.hedge_budget) if args.hedge else None,
+    )
+
+
+async def _extract_windows(crew, items: List[tuple], catalog: List[str], args):
+    # Same windowing as process_notes_concurrently
+    window = args.concurrency * args.batch_size * 4
+    for start in range(0, len(items), window):
+        await crew.extract_many(items[start:start + window], catalog, args.concurrency, batch_size=args.batch_size)
+
+
+def run_extract(args, rows: List[Dict], catalog: List[str]) -> Dict:
+    module = _load_script("clean-notes-ai.py", "clean_notes_ai")
+    crew = module.NoteExtractionGraph(model="fake-bench", cache=None, scheduler=_scheduler(args), backend="fake")
+    crew._app = timed = _TimedApp(crew.app)
+    items = [(row["name"], row["reason"]) for row in rows]
+    started = time.perf_counter()
+    if args.concurrency > 1:
+        asyncio.run(_extract_windows(crew, items, catalog, args))
+    else:
+        for start in range(0, len(items), args.batch_size):
+            chunk = items[start:start + args.batch_size]
+            if len(chunk) > 1:
+                crew.extract_batch(chunk, catalog)
+            else:
+                crew.extract_notes(chunk[0][0], catalog, reason=chunk[0][1])
+    return _summary(len(items), time.perf_counter() - started, timed.latencies, crew.llm.llm, crew.scheduler)
+
+
+def run_normalize(args, rows: List[Dict], catalog: List[str]) -> Dict:
+    module = _load_script("normalize-note-ai.py", "normalize_note_ai")
+    crew = module.NoteNormalizationGraph(model="fake-bench", cache=None, scheduler=_scheduler(args), backend="fake")
+    notes = [row["name"] for row in rows]
+    latencies: List[float] = []
+    started = time.perf_counter()
+    for start in range(0, len(notes), args.batch_size):
+        chunk = notes[start:start + args.batch_size]
+        t0 = time.perf_counter()
+        if len(chunk) > 1:
+            crew.normalize_notes_scored(chunk, catalog, args.batch_size)
+        else:
+            crew.normalize_note_scored(chunk[0], catalog)
+        latencies.extend([time.perf_counter() - t0] * len(chunk))
+    return _summary(len(notes), time.perf_counter() - started, latencies, crew.llm.llm, crew.scheduler)
+
+
+def _summary(count: int, elapsed: float, latencies: List[float], fake: FakeChatModel,
+             scheduler: RequestScheduler) -> Dict:
+    ordered = sorted(latencies)
+    llm = fake.stats()
+    return {
+        "phrases": count,
+        "seconds": round(elapsed, 3),
+        "phrases_per_sec": round(count / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p95": round(percentile(ordered, 95) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "llm_calls": llm["calls"],
+        "tokens_per_phrase": round((llm["prompt_tokens"] + llm["completion_tokens"]) / count, 1) if count else 0,
+        "injected_faults": llm["injected"],
+        "scheduler": scheduler.stats(),
+        "stage_mean_ms": {
+            f"{stage}.{kind}": round(h["mean_seconds"] * 1000, 3)
+            for stage, kinds in METRICS.snapshot()["stages"].items()
+            for kind, h in kinds.items()
+        },
+    }
+
+
+# Invocations that must not need the LLM stack: (name, script, arguments).
+STARTUP_SCENARIOS = [
+    ("normalize-bad-args", "normalize-note-ai.py", []),
+    ("normalize-exact-hit", "normalize-note-ai.py", ["{exact_hit}", "--no-cache"]),
+    ("extract-help", "clean-notes-ai.py", ["--help"]),
+]
+HEAVY_MODULES = ("langgraph", "langchain_core", "langchain_openai", "openai", "numpy")
+
+
+def _parse_importtime(stderr: str):
+    """(total import microseconds, set of top-level packages imported) from -X importtime output."""
+    total_us = 0
+    packages = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        packages.add(name.strip().split(".")[0])
+        if not name[1:].startswith(" "):  # top-level import; nested ones are already in its cumulative time
+            total_us += int(cumulative)
+    return total_us, packages
+
+
+def measure_startup(runs: int) -> List[Dict]:
+    exact_hit = BENCH_DIR / "synthetic-startup-note.json"
+    exact_hit.parent.mkdir(parents=True, exist_ok=True)
+    with open(exact_hit, "w", encoding="utf-8") as f:
+        json.dump({"note": "Rose", "existingNotes": ["rose", "amber", "vanilla"]}, f)
+    results = []
+    for name, script, script_args in STARTUP_SCENARIOS:
+        argv = [sys.executable, "-X", "importtime", str(scripts_dir / script)]
+        argv += [a.format(exact_hit=exact_hit) for a in script_args]
+        walls, imports, heavy = [], [], set()
+        for _ in range(runs):
+            started = time.perf_counter()
+            child = subprocess.run(argv, capture_output=True, text=True, env=dict(os.environ, NOTE_AI_LLM_BACKEND="fake"))
+            walls.append(time.perf_counter() - started)
+            import_us, packages = _parse_importtime(child.stderr)
+            imports.append(import_us / 1000.0)
+            heavy |= packages.intersection(HEAVY_MODULES)
+        results.append({
+            "scenario": name,
+            "wall_ms_median": round(sorted(walls)[len(walls) // 2] * 1000, 1),
+            "import_ms_median": round(sorted(imports)[len(imports) // 2], 1),
+            "heavy_modules": sorted(heavy),
+        })
+    return results
+
+
+def run_startup(args):
+    results = measure_startup(args.startup_runs)
+    failures = []
+    for r in results:
+        print(f"⏱️  {r['scenario']}: {r['wall_ms_median']} ms wall, {r['import_ms_median']} ms imports")
+        if r["heavy_modules"]:
+            failures.append(f"{r['scenario']} imports {', '.join(r['heavy_modules'])}")
+        if r["import_ms_median"] > args.startup_budget_ms:
+            failures.append(f"{r['scenario']}: {r['import_ms_median']} ms imports > budget {args.startup_budget_ms} ms")
+    timestamp = time.strftime("%Y-%m-%dT%H-%M-%S")
+    output = Path(args.output) if args.output else BENCH_DIR / f"note-ai-startup-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"budget_ms": args.startup_budget_ms, "startup": results}, f, indent=2)
+    print(f"\n📄 Results saved to: {output}")
+    if failures:
+        print("\n❌ Start-up budget exceeded:")
+        for line in failures:
+            print(f"   • {line}")
+        sys.exit(1)
+    print("\n✅ Start-up within budget")
+
+
+def run_cluster(args) -> Dict:
+    from note_ai.clusters import CatalogClusterer
+
+    rows = synthetic_note_catalog(args.size, args.seed)
+    report = CatalogClusterer().cluster(rows)
+    cluster_of = {note["id"]: i for i, c in enumerate(report.clusters) for note in c.notes}
+    variants = [r for r in rows if "variant_of" in r]
+    found = sum(1 for r in variants if r["id"] in cluster_of and cluster_of[r["id"]] == cluster_of.get(r["variant_of"]))
+    stats = report.stats
+    return {
+        "pipeline": "cluster",
+        "size": args.size,
+        "seconds": stats["seconds"],
+        "stages_seconds": stats["stages_seconds"],
+        "candidate_pairs": stats["candidate_pairs"],
+        "edges": stats["edges"],
+        "clusters": stats["clusters"],
+        "by_method": stats["by_method"],
+        "matrix_mb": stats["matrix_mb"],
+        "signatures_mb": stats["signatures_mb"],
+        "peak_rss_mb": peak_rss_mb(),
+        "variant_recall": round(found / len(variants), 4) if variants else None,
+    }
+
+
+def run_cluster_sizes(args, sizes: List[int]):
+    results = []
+    for size in sizes:
+        print(f"⏱️  cluster x{size} ...", end="", flush=True)
+        child = subprocess.run([sys.executable, str(Path(__file__).resolve()), "--run-one", "--cluster",
+                                "--size", str(size), "--seed", str(args.seed)], capture_output=True, text=True)
+        if child.returncode != 0:
+            print(" failed")
+            print(child.stderr, file=sys.stderr)
+            sys.exit(1)
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f" {result['seconds']} s, {result['candidate_pairs']} candidate pairs, {result['clusters']} clusters, "
+              f"matrix {result['matrix_mb']} MB, peak RSS {result['peak_rss_mb']} MB, "
+              f"variant recall {result['variant_recall']}")
+    timestamp = time.strftime("%Y-%m-%dT%H-%M-%S")
+    output = Path(args.output) if args.output else BENCH_DIR / f"note-ai-cluster-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"config": {"seed": args.seed}, "results": results}, f, indent=2)
+    print(f"\n📄 Results saved to: {output}")
+
+
+def run_one(args) -> Dict:
+    if args.cluster:
+        return run_cluster(args)
+    with open(dataset_path(args.size, args.seed), "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    catalog = synthetic_catalog(args.catalog_size, args.seed)
+    runner = run_extract if args.pipeline == "extract" else run_normalize
+    result = runner(args, rows, catalog)
+    result.update({"pipeline": args.pipeline, "size": args.size})
+    return result
+
+
+def _child_argv(args, pipeline: str, size: int) -> List[str]:
+    return [
+        sys.executable, str(Path(__file__).resolve()), "--run-one",
+        "--pipeline", pipeline, "--size", str(size),
+        "--concurrency", str(args.concurrency), "--batch-size", str(args.batch_size),
+        "--catalog-size", str(args.catalog_size), "--seed", str(args.seed), "--retry-after", str(args.retry_after),
+        "--call-timeout", str(args.call_timeout), "--hedge-budget", str(args.hedge_budget),
+    ] + (["--hedge"] if args.hedge else [])
+
+
+def _child_env(args) -> Dict[str, str]:
+    """The fake backend is configured through the same environment variables a CI run would set."""
+    return dict(
+        os.environ,
+        PYTHONUNBUFFERED="1",
+        NOTE_AI_LLM_BACKEND="fake",
+        NOTE_AI_FAKE_LATENCY=args.latency,
+        NOTE_AI_FAKE_FAULTS=args.faults,
+        NOTE_AI_FAKE_SEED=str(args.seed),
+        NOTE_AI_FAKE_RETRY_AFTER=str(args.retry_after),
+        NOTE_AI_FAKE_STALL_SECONDS=str(args.stall_seconds),
+    )
+
+
+def compare(results: List[Dict], baseline: List[Dict], max_regression: float) -> List[str]:
+    """Regressions of results against a baseline, as human-readable lines."""
+    previous = {(r["pipeline"], r["size"]): r for r in baseline}
+    failures = []
+    for r in results:
+        base = previous.get((r["pipeline"], r["size"]))
+        if base is None:
+            continue
+        label = f"{r['pipeline']} x{r['size']}"
+        if base.get("phrases_per_sec") and r["phrases_per_sec"] < base["phrases_per_sec"] * (1 - max_regression):
+            failures.append(f"{label}: {r['phrases_per_sec']} phrases/sec vs baseline {base['phrases_per_sec']}")
+        base_p95 = base.get("latency_ms", {}).get("p95")
+        if base_p95 and r["latency_ms"]["p95"] > base_p95 * (1 + max_regression):
+            failures.append(f"{label}: p95 {r['latency_ms']['p95']} ms vs baseline {base_p95} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI note pipelines against an offline fake LLM")
+    parser.add_argument("--sizes", type=str,
+                        help="Comma-separated input sizes (default: 1000,10000; with --cluster 10000,100000)")
+    parser.add_argument("--pipeline", choices=["extract", "normalize", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight (extraction only)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Phrases per LLM request")
+    parser.add_argument("--catalog-size", type=int, default=2000, help="Synthetic existing-notes catalog size")
+    parser.add_argument("--latency", type=str, default="none",
+                        help='Fake LLM latency: "none", "fixed:S", "uniform:LO,HI" or "lognormal:MEDIAN,SIGMA"')
+    parser.add_argument("--faults", type=str, default="", help='Injected faults, e.g. "429=0.02,timeout=0.01,malformed=0.01,stall=0.01"')
+    parser.add_argument("--retry-after", type=float, default=0.05, help="retry-after seconds on injected 429s")
+    parser.add_argument("--stall-seconds", type=float, default=30.0, help="How long an injected stall holds a call")
+    parser.add_argument("--call-timeout", type=float, default=DEFAULT_CALL_TIMEOUT,
+                        help="Per-call timeout in seconds (0: no limit)")
+    parser.add_argument("--hedge", action="store_true", help="Hedge calls that outlast the observed p90 latency")
+    parser.add_argument("--hedge-budget", type=float, default=DEFAULT_HEDGE_BUDGET,
+                        help="With --hedge, maximum duplicate requests as a fraction of all requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, help="Results file (default: reports/benchmarks/note-ai-<timestamp>.json)")
+    parser.add_argument("--baseline", type=str, help="Earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative slowdown vs baseline")
+    parser.add_argument("--startup", action="store_true", help="Measure script start-up instead of throughput")
+    parser.add_argument("--startup-runs", type=int, default=5, help="Runs per start-up scenario (median is reported)")
+    parser.add_argument("--startup-budget-ms", type=float, default=250.0,
+                        help="Maximum import time for each start-up scenario")
+    parser.add_argument("--cluster", action="store_true",
+                        help="Time catalog-wide duplicate clustering instead of the LLM pipelines")
+    parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.batch_size = max(1, args.batch_size)
+    args.concurrency = max(1, args.concurrency)
+
+    if args.run_one:
+        print(json.dumps(run_one(args)))
+        return
+    if args.startup:
+        run_startup(args)
+        return
+    sizes = [int(s) for s in (args.sizes or ("10000,100000" if args.cluster else "1000,10000")).split(",")
+             if s.strip()]
+    if args.cluster:
+        run_cluster_sizes(args, sizes)
+        return
+
+    pipelines = ["extract", "normalize"] if args.pipeline == "both" else [args.pipeline]
+    results = []
+    for size in sizes:
+        dataset_path(size, args.seed)
+        for pipeline in pipelines:
+            print(f"⏱️  {pipeline} x{size} ...", end="", flush=True)
+            child = subprocess.run(_child_argv(args, pipeline, size), capture_output=True, text=True,
+                                   env=_child_env(args))
+            if child.returncode != 0:
+                print(" failed")
+                print(child.stderr, file=sys.stderr)
+                sys.exit(1)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f" {result['phrases_per_sec']} phrases/sec, p95 {result['latency_ms']['p95']} ms, "
+                  f"peak RSS {result['peak_rss_mb']} MB, {result['tokens_per_phrase']} tokens/phrase")
+
+    timestamp = time.strftime("%Y-%m-%dT%H-%M-%S")
+    output = Path(args.output) if args.output else BENCH_DIR / f"note-ai-{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    config = {k: getattr(args, k) for k in ("concurrency", "batch_size", "catalog_size", "latency", "faults", "seed")}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "results": results}, f, indent=2)
+    print(f"\n📄 Results saved to: {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"\n⚠️  Baseline was run with a different config: {baseline.get('config')}")
+        failures = compare(results, baseline.get("results", []), args.max_regression)
+        if failures:
+            print("\n❌ Performance regression against baseline:")
+            for line in failures:
+                print(f"   • {line}")
+            sys.exit(1)
+        print("\n✅ Within budget of baseline")
+
+
+if __name__ == "__main__":
+    main()
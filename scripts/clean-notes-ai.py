@@ -9,16 +9,34 @@ Usage:
     python scripts/clean-notes-ai.py --dry-run                    # Preview changes
     python scripts/clean-notes-ai.py --input ambiguous-notes.json  # Process specific notes
     python scripts/clean-notes-ai.py --all                         # Process all ambiguous notes
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --concurrency 8  # Async, 8 requests in flight
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --batch-size 10  # 10 phrases per request
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --resume reports/ai-note-extraction-<ts>.jsonl
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --structured-output  # schema-constrained answers
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --call-timeout 20 --hedge  # cut tail latency
+    python scripts/clean-notes-ai.py --all --workers 4                    # 4 local shard processes, merged at the end
+    python scripts/clean-notes-ai.py --all --shard 1/4 --output reports/run.shard-1-of-4.jsonl  # one shard of 4
+    python scripts/clean-notes-ai.py merge reports/run.shard-*-of-4.jsonl --output reports/run.jsonl
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --apply --dry-run  # diff of the database writes
+    python scripts/clean-notes-ai.py --input ambiguous-notes.json --apply            # write results to $DATABASE_URL
+    python scripts/clean-notes-ai.py apply reports/run.jsonl --target notes.sqlite3  # apply an earlier run's results
 """
 
+import io
 import os
 import re
 import sys
 import json
+import time
+import shutil
+import asyncio
 import argparse
+import subprocess
+import tempfile
 import warnings
 from pathlib import Path
-from typing import List, Dict, Optional, TypedDict
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Dict, Optional, TextIO, TypedDict
 from dotenv import load_dotenv
 
 # Suppress LangChain/Pydantic v1 warning on Python 3.14 (upstream compatibility)
@@ -26,41 +44,57 @@ warnings.filterwarnings("ignore", message=".*Pydantic V1.*Python 3.14.*", catego
 
 # Set UTF-8 encoding for stdout on Windows
 if sys.platform == 'win32':
-    import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
 # Load environment variables
 load_dotenv()
 
-try:
-    from langgraph.graph import StateGraph, END
-    from langchain_openai import ChatOpenAI
-    from langchain_core.messages import HumanMessage
-except ImportError:
-    print("❌ LangGraph not installed. Install with: pip install -r scripts/requirements-ai.txt")
-    sys.exit(1)
+# LangGraph/LangChain are imported on first use (NoteExtractionGraph.app, note_ai.backends),
+# so --help and argument/input errors return without loading them.
 
 # Get project root
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from note_ai.aliases import AliasStore
+from note_ai.apply import DEFAULT_APPLY_BATCH, NoteApplier, check_target
+from note_ai.backends import BACKENDS, LazyChatModel, backend_name, missing_dependency, prompt_messages
+from note_ai.cache import ResponseCache, prompt_version
+from note_ai.dedup import PhraseDeduper, canonical_phrase
+from note_ai.manifest import RunManifest, manifest_key
+from note_ai.metrics import METRICS
+from note_ai.notes_index import alias_key
+from note_ai.prompts import CACHE_MIN_PREFIX_TOKENS, DEFAULT_CONTEXT_TOKENS, Prompt, cacheable, context_section, fit_context
+from note_ai.results import (
+    RETRY_STATUSES, UNPARSED_REASONINGS, JsonlResults, JsonlResultWriter, completed_note_ids, drop_failed, is_unanswered,
+)
+from note_ai.rules import apply_rules
+from note_ai.shards import in_shard, merge_streams, parse_shard, shard_path
+from note_ai.structured import compile_schema, parse_object, response_format
+from note_ai.sources import (
+    DEFAULT_PAGE_SIZE, JSONL_SUFFIXES, describe_source, iter_candidates, iter_input_notes, iter_source_notes,
+)
+from note_ai.scheduler import (
+    DEFAULT_CALL_TIMEOUT, DEFAULT_HEDGE_BUDGET, DEFAULT_MAX_RETRIES, DEFAULT_RPM, DEFAULT_TPM, HedgePolicy,
+    RequestScheduler, ScheduledLLM,
+)
+from note_ai.retrieval import NoteRetriever, merge_ranked
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 
 class ExtractState(TypedDict, total=False):
     phrase: str
-    existing_notes: list
+    existing_notes: list  # context for the prompt, most relevant first
     result: dict
     reason: str  # e.g. "Confirm valid scent note" → use confirmation prompt
+    batch: list  # [{"phrase", "reason"}, ...] → batched prompt, answers in results
+    results: list
+    structured: bool  # --structured-output: request the answer schema and parse strictly
 
 
-def _build_extract_prompt(phrase: str, existing_notes: List[str]) -> str:
-    """Build the combined analysis + extraction prompt (same logic as original CrewAI tasks)."""
-    existing_preview = ", ".join(existing_notes[:50]) if existing_notes else "(none)"
-    return f"""You are a perfume note expert. Analyze this perfume note phrase and extract valid notes or mark for deletion.
-
-Phrase: "{phrase}"
-Existing notes in database (for reference): {existing_preview}
-
-Rules:
+EXTRACT_RULES = """Rules:
 - Valid notes: 1-5 words, 2-50 characters, not stopwords
 - Multi-word notes are valid (e.g., "vanilla bean", "black tea", "white birch wood", "motor oil", "coppery blood")
 - Remove leading adjectives when appropriate (e.g., "fresh sugared ginger" → "sugared ginger")
@@ -91,31 +125,141 @@ Examples:
 - "limited time only" → null (delete)
 - "no name" → null (delete)
 
-Return ONLY a single JSON object with these exact keys (no markdown, no extra text):
+"""
+
+
+# Static prompt prefixes, built once; only _build_*_prompt bodies change per call (see note_ai/prompts.py).
+EXTRACT_PREFIX = f"""You are a perfume note expert. Analyze the perfume note phrase given below and extract valid notes or mark it for deletion.
+
+{EXTRACT_RULES}Return ONLY a single JSON object with these exact keys (no markdown, no extra text):
 {{
     "extracted_notes": ["note1", "note2"] or null,
     "should_delete": true or false,
-    "reasoning": "brief explanation"
+    "reasoning": "brief explanation",
+    "confidence": number from 0 to 1 (how sure you are of this answer)
 }}
 """
 
-
-def _build_confirm_prompt(phrase: str) -> str:
-    """Build prompt for confirming whether a phrase is a valid perfume note (e.g. hot leather, old makeup)."""
-    return f"""You are a perfume note expert. Is the following a valid perfume/scent note?
-
-Phrase: "{phrase}"
+CONFIRM_PREFIX = """You are a perfume note expert. Is the phrase given below a valid perfume/scent note?
 
 Valid perfume notes are typically 1-5 words describing a scent (e.g. "hot leather", "old books", "grey iris", "cut grass", "cold steel", "vanilla bean"). 
 Invalid examples: standalone stopwords ("cut" alone, "hot" alone), placeholders ("null", "test"), or non-scent phrases.
 
 Reply with ONLY a single JSON object (no markdown, no extra text):
-- If it IS a valid scent note: {{ "valid": true, "reasoning": "brief reason" }}
-- If it is NOT valid and you can extract real notes from it: {{ "valid": false, "extracted_notes": ["note1"], "reasoning": "brief reason" }}
-- If it is NOT valid and should be deleted: {{ "valid": false, "should_delete": true, "reasoning": "brief reason" }}
+- If it IS a valid scent note: { "valid": true, "reasoning": "brief reason" }
+- If it is NOT valid and you can extract real notes from it: { "valid": false, "extracted_notes": ["note1"], "reasoning": "brief reason" }
+- If it is NOT valid and should be deleted: { "valid": false, "should_delete": true, "reasoning": "brief reason" }
+Also include "confidence": a number from 0 to 1 for how sure you are.
+"""
+
+EXTRACT_BATCH_PREFIX = f"""You are a perfume note expert. Analyze each of the perfume note phrases given below independently and extract valid notes or mark it for deletion.
+
+{EXTRACT_RULES}
+Return ONLY a JSON array with one object per phrase, using the phrase number as "index" (no markdown, no extra text):
+[
+    {{"index": 1, "extracted_notes": ["note1", "note2"] or null, "should_delete": true or false, "reasoning": "brief explanation", "confidence": 0.0-1.0}}
+]
 """
 
 
+def _build_extract_prompt(phrase: str, existing_notes: List[str]) -> Prompt:
+    """Build the combined analysis + extraction prompt (same logic as original CrewAI tasks)."""
+    return Prompt(EXTRACT_PREFIX, f"""
+Phrase: "{phrase}"
+Existing notes in database (for reference): {context_section(existing_notes)}
+""")
+
+
+def _build_confirm_prompt(phrase: str) -> Prompt:
+    """Build prompt for confirming whether a phrase is a valid perfume note (e.g. hot leather, old makeup)."""
+    return Prompt(CONFIRM_PREFIX, f"""
+Phrase: "{phrase}"
+""")
+
+
+def _build_extract_batch_prompt(phrases: List[str], existing_notes: List[str]) -> Prompt:
+    """Build one extraction prompt for several phrases; the model answers with a JSON array keyed by index."""
+    numbered = "\n".join(f'{i}. "{phrase}"' for i, phrase in enumerate(phrases, 1))
+    return Prompt(EXTRACT_BATCH_PREFIX, f"""
+Phrases:
+{numbered}
+Existing notes in database (for reference): {context_section(existing_notes)}
+""")
+
+
+# --structured-output: answer shapes requested from the model (strict mode) and checked on return.
+_NOTES_FIELD = {"type": ["array", "null"], "items": {"type": "string"}}
+EXTRACT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "extracted_notes": _NOTES_FIELD,
+        "should_delete": {"type": "boolean"},
+        "reasoning": {"type": "string"},
+        "confidence": {"type": "number"},
+    },
+    "required": ["extracted_notes", "should_delete", "reasoning", "confidence"],
+    "additionalProperties": False,
+}
+CONFIRM_SCHEMA = {
+    "type": "object",
+    "properties": {"valid": {"type": "boolean"}, **EXTRACT_SCHEMA["properties"]},
+    "required": ["valid", *EXTRACT_SCHEMA["required"]],
+    "additionalProperties": False,
+}
+_EXTRACT_VALIDATOR = compile_schema(EXTRACT_SCHEMA)
+_CONFIRM_VALIDATOR = compile_schema(CONFIRM_SCHEMA)
+
+
+def _parse_extraction_batch_response(text: str, count: int) -> List[Optional[dict]]:
+    """
+    Parse a batch extraction response into one result per phrase.
+
+    Every item is checked on its own; a slot is None when its item is missing, duplicated
+    or malformed so the caller can retry that phrase individually.
+    """
+    results: List[Optional[dict]] = [None] * count
+    json_match = re.search(r'\[.*\]', str(text), re.DOTALL)
+    if not json_match:
+        return results
+    try:
+        items = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return results
+    if not isinstance(items, list):
+        return results
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        if not isinstance(index, int) or isinstance(index, bool) or not 1 <= index <= count:
+            continue
+        if index in seen:
+            results[index - 1] = None
+            continue
+        seen.add(index)
+        notes = item.get("extracted_notes")
+        should_delete = item.get("should_delete")
+        if notes is not None and not (isinstance(notes, list) and all(isinstance(n, str) for n in notes)):
+            continue
+        if not isinstance(should_delete, bool):
+            continue
+        results[index - 1] = _with_confidence({
+            "extracted_notes": notes,
+            "should_delete": should_delete,
+            "reasoning": str(item.get("reasoning", "")),
+        }, item)
+    return results
+
+
+def _with_confidence(result: dict, data: dict) -> dict:
+    """Copy the model's self-reported confidence into result when it is a number in [0, 1]."""
+    confidence = data.get("confidence")
+    if isinstance(confidence, (int, float)) and not isinstance(confidence, bool) and 0 <= confidence <= 1:
+        result["confidence"] = float(confidence)
+    return result
+
+
 def _parse_confirm_response(text: str) -> dict:
     """Parse confirm response into same shape as extraction: extracted_notes, should_delete, reasoning."""
     result_text = str(text).strip()
@@ -124,17 +268,17 @@ def _parse_confirm_response(text: str) -> dict:
         try:
             data = json.loads(json_match.group())
             if data.get("valid") is True:
-                return {
+                return _with_confidence({
                     "extracted_notes": None,
                     "should_delete": False,
                     "reasoning": data.get("reasoning", "Confirmed valid scent note"),
-                }
+                }, data)
             # valid: false
-            return {
+            return _with_confidence({
                 "extracted_notes": data.get("extracted_notes"),
                 "should_delete": data.get("should_delete", True),
                 "reasoning": data.get("reasoning", "Not a valid scent note"),
-            }
+            }, data)
         except json.JSONDecodeError:
             pass
     return {
@@ -151,20 +295,20 @@ def _parse_extraction_response(text: str) -> dict:
     if json_match:
         try:
             data = json.loads(json_match.group())
-            return {
+            return _with_confidence({
                 "extracted_notes": data.get("extracted_notes"),
                 "should_delete": data.get("should_delete", True),
                 "reasoning": data.get("reasoning", ""),
-            }
+            }, data)
         except json.JSONDecodeError:
             pass
     try:
         data = json.loads(result_text)
-        return {
+        return _with_confidence({
             "extracted_notes": data.get("extracted_notes"),
             "should_delete": data.get("should_delete", True),
             "reasoning": data.get("reasoning", ""),
-        }
+        }, data)
     except json.JSONDecodeError:
         pass
     return {
@@ -174,40 +318,520 @@ def _parse_extraction_response(text: str) -> dict:
     }
 
 
-def _extract_node(state: ExtractState, llm: ChatOpenAI) -> dict:
-    """LangGraph node: call LLM and parse result into state.result."""
+def _unparseable_result(error: str) -> dict:
+    """A structured answer that failed validation: kept for manual review and retried, never deleted."""
+    return {
+        "extracted_notes": None,
+        "should_delete": False,
+        "status": "unparseable",
+        "reasoning": f"Unparseable model response: {error}",
+    }
+
+
+def _parse_structured_response(text: str, use_confirm: bool) -> dict:
+    """Strict parse of a schema-constrained answer: one validation pass, no fallbacks."""
+    data, error = parse_object(text, _CONFIRM_VALIDATOR if use_confirm else _EXTRACT_VALIDATOR)
+    if data is None:
+        return _unparseable_result(error)
+    if use_confirm and data["valid"]:
+        return _with_confidence({
+            "extracted_notes": None,
+            "should_delete": False,
+            "reasoning": data["reasoning"] or "Confirmed valid scent note",
+        }, data)
+    return _with_confidence({
+        "extracted_notes": data["extracted_notes"],
+        "should_delete": data["should_delete"],
+        "reasoning": data["reasoning"],
+    }, data)
+
+
+def _prepare_extract(state: ExtractState) -> tuple:
+    """Pick the prompt for a state; returns (prompt, use_confirm)."""
     phrase = state["phrase"]
     existing_notes = state.get("existing_notes") or []
     reason = state.get("reason") or ""
     use_confirm = "Confirm" in reason
-    if use_confirm:
-        prompt = _build_confirm_prompt(phrase)
+    with METRICS.timer("prompt_build", "confirm" if use_confirm else "extract"):
+        if use_confirm:
+            return _build_confirm_prompt(phrase), True
+        return _build_extract_prompt(phrase, existing_notes), False
+
+
+EXTRACT_PROMPT_VERSION = prompt_version(_build_extract_prompt("{phrase}", []).text)
+CONFIRM_PROMPT_VERSION = prompt_version(_build_confirm_prompt("{phrase}").text)
+
+def _cache_key(state: ExtractState, llm: "ChatOpenAI", use_confirm: bool) -> str:
+    kind = "confirm" if use_confirm else "extract"
+    version = CONFIRM_PROMPT_VERSION if use_confirm else EXTRACT_PROMPT_VERSION
+    return ResponseCache.make_key(getattr(llm, "model_name", ""), kind, state["phrase"], version)
+
+
+def _parse_content(content: str, use_confirm: bool, structured: bool = False) -> dict:
+    if structured:
+        return _parse_structured_response(content, use_confirm)
+    return _parse_confirm_response(content) if use_confirm else _parse_extraction_response(content)
+
+
+def _answer_schema(state: ExtractState, use_confirm: bool) -> Optional[dict]:
+    """The schema to request for this state's answer, or None outside structured-output mode."""
+    if not state.get("structured"):
+        return None
+    return CONFIRM_SCHEMA if use_confirm else EXTRACT_SCHEMA
+
+
+def _finish_extract(
+    response,
+    use_confirm: bool,
+    state: ExtractState,
+    llm: "ChatOpenAI",
+    cache: Optional[ResponseCache],
+    key: Optional[str],
+) -> dict:
+    """Parse an LLM response message into the extraction result shape, caching parseable answers."""
+    kind = "confirm" if use_confirm else "extract"
+    content = response.content if hasattr(response, "content") else str(response)
+    with METRICS.timer("parse", kind):
+        result = _parse_content(content, use_confirm, bool(state.get("structured")))
+    METRICS.count("parse", kind)
+    if result.get("status") == "unparseable" or result.get("reasoning") in UNPARSED_REASONINGS:
+        METRICS.count("parse_failure", kind)
+        return result
+    if cache is not None:
+        cache.put(key, kind, getattr(llm, "model_name", ""), state["phrase"], str(content))
+    return _versioned(result, use_confirm)
+
+
+def _versioned(result: dict, use_confirm: bool) -> dict:
+    """Tag a parsed LLM answer with its prompt version, which makes it eligible for the alias store."""
+    result["prompt_version"] = CONFIRM_PROMPT_VERSION if use_confirm else EXTRACT_PROMPT_VERSION
+    return result
+
+
+def _local_result(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache],
+                  use_confirm: bool, rules: bool = True, aliases: Optional[AliasStore] = None):
+    """
+    Answer a phrase without the LLM if possible.
+
+    Returns (cache_key, result): result comes from the deterministic rules, the learned
+    alias store or the cache, or is None when the LLM has to be asked.
+    """
+    kind = "confirm" if use_confirm else "extract"
+    if rules:
+        result = apply_rules(state["phrase"])
+        if result is not None:
+            METRICS.count("rule_hit", kind)
+            return None, result
+    if aliases is not None:
+        version = CONFIRM_PROMPT_VERSION if use_confirm else EXTRACT_PROMPT_VERSION
+        learned = aliases.lookup(kind, state["phrase"], version)
+        METRICS.count("alias_miss" if learned is None else "alias_hit", kind)
+        if learned is not None:
+            return None, dict(learned, source="alias")
+    if cache is None:
+        return None, None
+    key = _cache_key(state, llm, use_confirm)
+    cached = cache.get(key)
+    result = None if cached is None else _parse_content(cached, use_confirm, bool(state.get("structured")))
+    if result is not None and is_unanswered(result):
+        # Cached before --structured-output and not of the schema's shape, or unreadable: ask again.
+        cache.reject()
+        result = None
+    METRICS.count("cache_miss" if result is None else "cache_hit", kind)
+    if result is None:
+        return key, None
+    return key, _versioned(result, use_confirm)
+
+
+def _node_error_result(e: Exception) -> dict:
+    """A call that failed after the scheduler's retries: kept for manual review, never deleted."""
+    if isinstance(e, TimeoutError):
+        print(f"⏱️  Timeout: {e}")
+        METRICS.count("llm_error", "timeout")
+        reasoning = f"Processing timed out - kept for manual review ({e})"
     else:
-        prompt = _build_extract_prompt(phrase, existing_notes)
+        print(f"❌ Error: {e}")
+        METRICS.count("llm_error")
+        reasoning = f"Error: {str(e)}"
+    return {
+        "extracted_notes": None,
+        "should_delete": False,
+        "status": "error",
+        "reasoning": reasoning,
+    }
+
+
+def _call_llm(llm: "ChatOpenAI", prompt: Prompt, kind: str, schema: Optional[dict] = None):
+    """
+    Invoke the model on one prompt, recording call latency and token usage under `kind` and the model.
+
+    With a schema the answer is requested in strict structured-output mode and streamed only up
+    to the end of its JSON object.
+    """
+    with METRICS.timer("llm_call", kind), METRICS.timer("llm_model", getattr(llm, "model_name", "")):
+        if schema is None:
+            response = llm.invoke(prompt_messages(prompt))
+        else:
+            response = llm.stream_object(prompt_messages(prompt), response_format=response_format(kind, schema),
+                                         stream_usage=True)
+    METRICS.record_usage(kind, response, getattr(llm, "model_name", ""))
+    return response
+
+
+async def _acall_llm(llm: "ChatOpenAI", prompt: Prompt, kind: str, schema: Optional[dict] = None):
+    with METRICS.timer("llm_call", kind), METRICS.timer("llm_model", getattr(llm, "model_name", "")):
+        if schema is None:
+            response = await llm.ainvoke(prompt_messages(prompt))
+        else:
+            response = await llm.astream_object(prompt_messages(prompt), response_format=response_format(kind, schema),
+                                                stream_usage=True)
+    METRICS.record_usage(kind, response, getattr(llm, "model_name", ""))
+    return response
+
+
+def _invoke_extract(prompt: Prompt, use_confirm: bool, state: ExtractState, llm: "ChatOpenAI",
+                    cache: Optional[ResponseCache], key: Optional[str]) -> dict:
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
-        content = response.content if hasattr(response, "content") else str(response)
-        result = _parse_confirm_response(content) if use_confirm else _parse_extraction_response(content)
+        response = _call_llm(llm, prompt, "confirm" if use_confirm else "extract", _answer_schema(state, use_confirm))
+        return _finish_extract(response, use_confirm, state, llm, cache, key)
     except Exception as e:
-        print(f"❌ Error: {e}")
-        result = {
-            "extracted_notes": None,
-            "should_delete": True,
-            "reasoning": f"Error: {str(e)}",
-        }
+        return _node_error_result(e)
+
+
+async def _ainvoke_extract(prompt: Prompt, use_confirm: bool, state: ExtractState, llm: "ChatOpenAI",
+                           cache: Optional[ResponseCache], key: Optional[str]) -> dict:
+    try:
+        response = await _acall_llm(llm, prompt, "confirm" if use_confirm else "extract",
+                                    _answer_schema(state, use_confirm))
+        return _finish_extract(response, use_confirm, state, llm, cache, key)
+    except Exception as e:
+        return _node_error_result(e)
+
+
+def _extract_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                  rules: bool = True, aliases: Optional[AliasStore] = None) -> dict:
+    """LangGraph node: settle the phrase by rule, alias or cache, else call the LLM and parse into state.result."""
+    with METRICS.timer("node", "extract"):
+        prompt, use_confirm = _prepare_extract(state)
+        key, result = _local_result(state, llm, cache, use_confirm, rules, aliases)
+        if result is None:
+            result = _invoke_extract(prompt, use_confirm, state, llm, cache, key)
     return {"result": result}
 
 
+async def _aextract_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                         rules: bool = True, aliases: Optional[AliasStore] = None) -> dict:
+    """Async variant of _extract_node; used when the graph is run with ainvoke/abatch."""
+    with METRICS.timer("node", "extract"):
+        prompt, use_confirm = _prepare_extract(state)
+        key, result = _local_result(state, llm, cache, use_confirm, rules, aliases)
+        if result is None:
+            result = await _ainvoke_extract(prompt, use_confirm, state, llm, cache, key)
+    return {"result": result}
+
+
+def _batch_items(state: ExtractState) -> List[ExtractState]:
+    """One single-phrase state per item of a batch state, sharing its context notes."""
+    existing_notes = state.get("existing_notes") or []
+    structured = bool(state.get("structured"))
+    return [
+        {"phrase": item["phrase"], "reason": item.get("reason") or "", "existing_notes": existing_notes,
+         "structured": structured}
+        for item in state["batch"]
+    ]
+
+
+class _BatchPlan:
+    """Per-item bookkeeping for a batch state: cached answers, packed phrases and individual retries."""
+
+    def __init__(self, state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache], rules: bool,
+                 aliases: Optional[AliasStore] = None):
+        existing_notes = state.get("existing_notes") or []
+        self.items = _batch_items(state)
+        self.results: List[Optional[dict]] = [None] * len(self.items)
+        self.prompts = [None] * len(self.items)
+        self.keys = [None] * len(self.items)
+        self.packed: List[int] = []
+        for i, item in enumerate(self.items):
+            prompt, use_confirm = _prepare_extract(item)
+            self.prompts[i] = (prompt, use_confirm)
+            self.keys[i], self.results[i] = _local_result(item, llm, cache, use_confirm, rules, aliases)
+            if self.results[i] is None and not use_confirm:
+                self.packed.append(i)
+        # A single leftover phrase is cheaper with the normal prompt.
+        if len(self.packed) < 2:
+            self.packed = []
+        self.batch_prompt = None
+        if self.packed:
+            with METRICS.timer("prompt_build", "extract_batch"):
+                self.batch_prompt = _build_extract_batch_prompt(
+                    [self.items[i]["phrase"] for i in self.packed], existing_notes
+                )
+
+    def accept(self, response, llm: "ChatOpenAI", cache: Optional[ResponseCache]):
+        content = response.content if hasattr(response, "content") else str(response)
+        with METRICS.timer("parse", "extract_batch"):
+            parsed = _parse_extraction_batch_response(content, len(self.packed))
+        METRICS.count("parse", "extract_batch", len(self.packed))
+        for i, result in zip(self.packed, parsed):
+            if result is None:
+                METRICS.count("parse_failure", "extract_batch")
+                continue
+            self.results[i] = _versioned(result, False)
+            if cache is not None:
+                model = getattr(llm, "model_name", "")
+                cache.put(self.keys[i], "extract", model, self.items[i]["phrase"], json.dumps(result))
+
+    def retries(self) -> List[int]:
+        return [i for i, result in enumerate(self.results) if result is None]
+
+
+def _extract_batch_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                        rules: bool = True, aliases: Optional[AliasStore] = None) -> dict:
+    """
+    LangGraph node: answer several phrases with one batched prompt.
+
+    Phrases settled by rule, alias or cache never reach the prompt. Confirmation items and phrases
+    whose batch item is missing or malformed are retried one at a time with the normal prompts.
+    """
+    with METRICS.timer("node", "extract_batch"):
+        plan = _BatchPlan(state, llm, cache, rules, aliases)
+        if plan.batch_prompt:
+            try:
+                plan.accept(_call_llm(llm, plan.batch_prompt, "extract_batch"), llm, cache)
+            except Exception as e:
+                print(f"⚠️  Batch request failed, retrying phrases individually: {e}")
+        for i in plan.retries():
+            prompt, use_confirm = plan.prompts[i]
+            plan.results[i] = _invoke_extract(prompt, use_confirm, plan.items[i], llm, cache, plan.keys[i])
+    return {"results": plan.results}
+
+
+async def _aextract_batch_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                               rules: bool = True, aliases: Optional[AliasStore] = None) -> dict:
+    """Async variant of _extract_batch_node; individual retries run concurrently."""
+    with METRICS.timer("node", "extract_batch"):
+        plan = _BatchPlan(state, llm, cache, rules, aliases)
+        if plan.batch_prompt:
+            try:
+                plan.accept(await _acall_llm(llm, plan.batch_prompt, "extract_batch"), llm, cache)
+            except Exception as e:
+                print(f"⚠️  Batch request failed, retrying phrases individually: {e}")
+        retries = plan.retries()
+        retried = await asyncio.gather(*[
+            _ainvoke_extract(plan.prompts[i][0], plan.prompts[i][1], plan.items[i], llm, cache, plan.keys[i])
+            for i in retries
+        ])
+        for i, result in zip(retries, retried):
+            plan.results[i] = result
+    return {"results": plan.results}
+
+
+DEFAULT_MIN_CONFIDENCE = 0.7
+
+
+def _ungrounded(phrase: str, notes) -> bool:
+    """True if an extracted note has a word (plural/punctuation-folded) that is not in the phrase."""
+    words = set(alias_key(phrase).split())
+    return any(not set(alias_key(note).split()) <= words for note in notes or [] if isinstance(note, str))
+
+
+def _escalation_reason(phrase: str, result: Optional[dict], min_confidence: float) -> Optional[str]:
+    """Why a cheap-tier answer should go to the stronger model, or None to keep it."""
+    if not result or result.get("source") or result.get("status") == "error" or result.get("tier"):
+        return None
+    if result.get("status") == "unparseable" or result.get("reasoning") in UNPARSED_REASONINGS:
+        return "parse_failure"
+    if result.get("confidence", 1.0) < min_confidence:
+        return "low_confidence"
+    if _ungrounded(phrase, result.get("extracted_notes")):
+        return "ungrounded"
+    return None
+
+
+def _prepare_escalation(state: ExtractState, reason: str, llm: "ChatOpenAI",
+                        cache: Optional[ResponseCache]) -> tuple:
+    """Count the escalation and look the phrase up in the cache under the strong model: (prompt, use_confirm, key, cached)."""
+    METRICS.count("escalation", reason)
+    prompt, use_confirm = _prepare_extract(state)
+    key, cached = _local_result(state, llm, cache, use_confirm, rules=False)
+    return prompt, use_confirm, key, cached
+
+
+def _settle_escalation(cheap: dict, strong: dict, reason: str) -> dict:
+    """Prefer the strong answer; if it failed or did not parse, keep the cheap one and say so."""
+    if is_unanswered(strong):
+        METRICS.count("escalation_failed", reason)
+        return dict(cheap, escalation_reason=reason, tier="cheap")
+    return dict(strong, escalation_reason=reason, tier="escalated")
+
+
+def _escalate_one(state: ExtractState, result: dict, reason: str, llm: "ChatOpenAI",
+                  cache: Optional[ResponseCache]) -> dict:
+    prompt, use_confirm, key, strong = _prepare_escalation(state, reason, llm, cache)
+    if strong is None:
+        strong = _invoke_extract(prompt, use_confirm, state, llm, cache, key)
+    return _settle_escalation(result, strong, reason)
+
+
+async def _aescalate_one(state: ExtractState, result: dict, reason: str, llm: "ChatOpenAI",
+                         cache: Optional[ResponseCache]) -> dict:
+    prompt, use_confirm, key, strong = _prepare_escalation(state, reason, llm, cache)
+    if strong is None:
+        strong = await _ainvoke_extract(prompt, use_confirm, state, llm, cache, key)
+    return _settle_escalation(result, strong, reason)
+
+
+def _escalate_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                   min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> dict:
+    """LangGraph node: re-ask the stronger model about a phrase the cheap tier was unsure of."""
+    with METRICS.timer("node", "escalate"):
+        result = state["result"]
+        reason = _escalation_reason(state["phrase"], result, min_confidence)
+        return {"result": _escalate_one(state, result, reason, llm, cache)}
+
+
+async def _aescalate_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                          min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> dict:
+    with METRICS.timer("node", "escalate"):
+        result = state["result"]
+        reason = _escalation_reason(state["phrase"], result, min_confidence)
+        return {"result": await _aescalate_one(state, result, reason, llm, cache)}
+
+
+def _escalate_batch_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                         min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> dict:
+    """LangGraph node: escalate the unsure items of a batch one at a time; the rest pass through."""
+    with METRICS.timer("node", "escalate_batch"):
+        results = list(state["results"])
+        for i, item in enumerate(_batch_items(state)):
+            reason = _escalation_reason(item["phrase"], results[i], min_confidence)
+            if reason:
+                results[i] = _escalate_one(item, results[i], reason, llm, cache)
+    return {"results": results}
+
+
+async def _aescalate_batch_node(state: ExtractState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                                min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> dict:
+    with METRICS.timer("node", "escalate_batch"):
+        results = list(state["results"])
+        pending = []
+        for i, item in enumerate(_batch_items(state)):
+            reason = _escalation_reason(item["phrase"], results[i], min_confidence)
+            if reason:
+                pending.append((i, _aescalate_one(item, results[i], reason, llm, cache)))
+        for (i, _), escalated in zip(pending, await asyncio.gather(*[c for _, c in pending])):
+            results[i] = escalated
+    return {"results": results}
+
+
 class NoteExtractionGraph:
-    """LangGraph-based extraction: one node that runs the LLM and parses JSON."""
+    """
+    LangGraph-based extraction: a single-phrase node and a batched multi-phrase node.
+
+    With escalate_model set, the graph becomes a two-tier cascade: `model` answers first and a
+    conditional edge sends answers that did not parse, report a confidence below
+    min_confidence, or contain notes not found in the phrase to escalate_model.
+
+    With structured_output, every request asks for a strict JSON schema and answers are validated
+    once; one that does not match becomes a status "unparseable" result instead of a guess.
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini", cache: Optional[ResponseCache] = None, rules: bool = True,
+                 scheduler: Optional[RequestScheduler] = None, backend: Optional[str] = None,
+                 aliases: Optional[AliasStore] = None, escalate_model: Optional[str] = None,
+                 min_confidence: float = DEFAULT_MIN_CONFIDENCE, context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+                 structured_output: bool = False):
+        # Retries are owned by the scheduler so they are paced and counted in one place.
+        self.scheduler = scheduler or RequestScheduler()
+        timeout = self.scheduler.call_timeout
+        self.llm = ScheduledLLM(LazyChatModel(model, backend, timeout), self.scheduler)
+        self.strong_llm = (ScheduledLLM(LazyChatModel(escalate_model, backend, timeout), self.scheduler)
+                           if escalate_model else None)
+        self.min_confidence = min_confidence
+        self.context_tokens = context_tokens
+        self.structured_output = structured_output
+        self.cache = cache
+        self.rules = rules
+        self.aliases = aliases
+        self._app = None
+        self._retrieved_notes: Optional[List[str]] = None
+        self._retriever: Optional[NoteRetriever] = None
+
+    @property
+    def app(self):
+        """The compiled graph, built (and LangGraph imported) on first use."""
+        if self._app is None:
+            self._app = self._build_app()
+        return self._app
+
+    def _build_app(self):
+        from langgraph.graph import StateGraph, END
+        from langchain_core.runnables import RunnableLambda
 
-    def __init__(self, model: str = "gpt-4o-mini"):
-        self.llm = ChatOpenAI(model=model, temperature=0.1)
         graph = StateGraph(ExtractState)
-        graph.add_node("extract", lambda s: _extract_node(s, self.llm))
-        graph.set_entry_point("extract")
-        graph.add_edge("extract", END)
-        self.app = graph.compile()
+        graph.add_node(
+            "extract",
+            RunnableLambda(
+                lambda s: _extract_node(s, self.llm, self.cache, self.rules, self.aliases),
+                afunc=lambda s: _aextract_node(s, self.llm, self.cache, self.rules, self.aliases),
+            ),
+        )
+        graph.add_node(
+            "extract_batch",
+            RunnableLambda(
+                lambda s: _extract_batch_node(s, self.llm, self.cache, self.rules, self.aliases),
+                afunc=lambda s: _aextract_batch_node(s, self.llm, self.cache, self.rules, self.aliases),
+            ),
+        )
+        graph.set_conditional_entry_point(lambda s: "extract_batch" if s.get("batch") else "extract")
+        if self.strong_llm is None:
+            graph.add_edge("extract", END)
+            graph.add_edge("extract_batch", END)
+            return graph.compile()
+
+        graph.add_node(
+            "escalate",
+            RunnableLambda(
+                lambda s: _escalate_node(s, self.strong_llm, self.cache, self.min_confidence),
+                afunc=lambda s: _aescalate_node(s, self.strong_llm, self.cache, self.min_confidence),
+            ),
+        )
+        graph.add_node(
+            "escalate_batch",
+            RunnableLambda(
+                lambda s: _escalate_batch_node(s, self.strong_llm, self.cache, self.min_confidence),
+                afunc=lambda s: _aescalate_batch_node(s, self.strong_llm, self.cache, self.min_confidence),
+            ),
+        )
+        graph.add_conditional_edges(
+            "extract",
+            lambda s: "escalate" if _escalation_reason(s["phrase"], s.get("result"), self.min_confidence) else END,
+        )
+        graph.add_conditional_edges(
+            "extract_batch",
+            lambda s: "escalate_batch" if any(
+                _escalation_reason(item["phrase"], result, self.min_confidence)
+                for item, result in zip(s["batch"], s.get("results") or [])
+            ) else END,
+        )
+        graph.add_edge("escalate", END)
+        graph.add_edge("escalate_batch", END)
+        return graph.compile()
+
+    def retriever_for(self, existing_notes: List[str]) -> NoteRetriever:
+        """Return the similarity retriever for this catalog, building it only when the catalog changes."""
+        if self._retriever is None or existing_notes is not self._retrieved_notes:
+            self._retriever = NoteRetriever(existing_notes)
+            self._retrieved_notes = existing_notes
+        return self._retriever
+
+    def context_for(self, phrases: List[str], existing_notes: List[str]) -> List[List[str]]:
+        """Most similar existing notes for each phrase, scored in one batch (trimmed to the budget by _*_state)."""
+        if not existing_notes:
+            return [[] for _ in phrases]
+        with METRICS.timer("retrieval", "extract"):
+            return self.retriever_for(existing_notes).top_k_many(phrases)
 
     def extract_notes(self, phrase: str, existing_notes: List[str], reason: Optional[str] = None) -> Dict:
         """
@@ -217,14 +841,92 @@ class NoteExtractionGraph:
         Returns:
             {"extracted_notes": [...], "should_delete": bool, "reasoning": str}
         """
+        context = self.context_for([phrase], existing_notes)[0]
+        final = self.app.invoke(self._initial_state(phrase, context, reason))
+        return self._final_result(final)
+
+    def extract_batch(self, items: List[tuple], existing_notes: List[str]) -> List[Dict]:
+        """Extract notes for several (phrase, reason) items with one batched prompt; results in input order."""
+        context = merge_ranked(self.context_for([phrase for phrase, _ in items], existing_notes))
+        final = self.app.invoke(self._batch_state(items, context))
+        return self._final_results(final, len(items))
+
+    async def extract_many(
+        self,
+        items: List[tuple],
+        existing_notes: List[str],
+        concurrency: int,
+        on_result: Optional[Callable[[int, object], None]] = None,
+        batch_size: int = 1,
+    ) -> List[object]:
+        """
+        Run (phrase, reason) items through the graph with at most `concurrency` requests in flight.
+
+        With batch_size > 1, items are packed into batched prompts of that many phrases.
+        Returns results in input order. Each slot holds the result dict, or the exception raised
+        for that item. `on_result(index, result_or_exception)` is called as each item finishes.
+        """
+        batch_size = max(1, batch_size)
+        chunks = [list(range(start, min(start + batch_size, len(items))))
+                  for start in range(0, len(items), batch_size)]
+        contexts = self.context_for([phrase for phrase, _ in items], existing_notes)
+        if batch_size == 1:
+            inputs = [self._initial_state(phrase, context, reason) for (phrase, reason), context in zip(items, contexts)]
+        else:
+            inputs = [
+                self._batch_state([items[i] for i in chunk], merge_ranked([contexts[i] for i in chunk]))
+                for chunk in chunks
+            ]
+        results: List[object] = [None] * len(items)
+        stream = self.app.abatch_as_completed(
+            inputs,
+            config={"max_concurrency": max(1, concurrency)},
+            return_exceptions=True,
+        )
+        async for chunk_index, final in stream:
+            chunk = chunks[chunk_index]
+            if isinstance(final, Exception):
+                outcomes = [final] * len(chunk)
+            elif batch_size == 1:
+                outcomes = [self._final_result(final)]
+            else:
+                outcomes = self._final_results(final, len(chunk))
+            for index, outcome in zip(chunk, outcomes):
+                results[index] = outcome
+                if on_result:
+                    on_result(index, outcome)
+        return results
+
+    def _batch_state(self, items: List[tuple], context: List[str]) -> ExtractState:
+        state: ExtractState = {
+            "batch": [{"phrase": phrase, "reason": reason or ""} for phrase, reason in items],
+            "existing_notes": fit_context(context, self.context_tokens, "extract_batch"),
+            "results": [],
+        }
+        if self.structured_output:
+            state["structured"] = True
+        return state
+
+    @classmethod
+    def _final_results(cls, final: dict, count: int) -> List[Dict]:
+        results = list(final.get("results") or [])
+        results += [None] * (count - len(results))
+        return [cls._final_result({"result": r}) for r in results[:count]]
+
+    def _initial_state(self, phrase: str, context: List[str], reason: Optional[str]) -> ExtractState:
         initial: ExtractState = {
             "phrase": phrase,
-            "existing_notes": list(existing_notes),
+            "existing_notes": fit_context(context, self.context_tokens, "extract"),
             "result": {},
         }
         if reason:
             initial["reason"] = reason
-        final = self.app.invoke(initial)
+        if self.structured_output:
+            initial["structured"] = True
+        return initial
+
+    @staticmethod
+    def _final_result(final: dict) -> Dict:
         return final.get("result") or {
             "extracted_notes": None,
             "should_delete": True,
@@ -232,41 +934,116 @@ class NoteExtractionGraph:
         }
 
 
-def load_ambiguous_notes(input_file: Optional[str] = None) -> List[Dict]:
-    """Load notes that need AI extraction"""
-    if input_file:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+def load_ambiguous_notes(input_file: Optional[str] = None) -> Iterable[Dict]:
+    """Load notes that need AI extraction; .jsonl/.ndjson inputs are streamed rather than loaded."""
+    if not input_file:
+        return []
+    if not Path(input_file).exists():
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+    if Path(input_file).suffix.lower() in JSONL_SUFFIXES:
+        return iter_input_notes(input_file)
+    return list(iter_input_notes(input_file))
+
+
+def load_existing_notes(notes_file: Optional[str] = None) -> List[str]:
+    """Load the existing-notes catalog used as prompt context (list of names or of {"name": ...})."""
+    if not notes_file:
+        return []
+    with open(notes_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return [n.get("name", "") if isinstance(n, dict) else str(n) for n in data]
 
 
-def save_results(results: List[Dict], output_file: str, format: str = "json"):
-    """Save extraction results to JSON or Markdown file"""
+def save_results(results: Iterable[Dict], output_file: str, format: str = "json"):
+    """
+    Save extraction results to JSON or Markdown file.
+
+    `results` may be a list or a JsonlResults stream; the JSON report is written one item
+    at a time so a stream is never loaded whole.
+    """
     output_path = project_root / "reports" / output_file
     output_path.parent.mkdir(exist_ok=True)
 
-    if format == "md":
-        md_content = generate_markdown_report(results)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(md_content)
-    else:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+    with METRICS.timer("report_write", format):
+        _write_report(results, output_path, format)
 
     print(f"\n✅ Results saved to: {output_path}")
 
 
-def generate_markdown_report(results: List[Dict]) -> str:
-    """Generate a markdown report from extraction results"""
+def _write_report(results: Iterable[Dict], output_path: Path, format: str):
+    if format == "md":
+        with open(output_path, 'w', encoding='utf-8') as f:
+            write_markdown_report(results, f)
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            # Same layout as json.dump(results, f, indent=2)
+            first = True
+            for result in results:
+                f.write("[\n  " if first else ",\n  ")
+                f.write(json.dumps(result, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+                first = False
+            f.write("[]" if first else "\n]")
+
+
+# Markdown report tables in document order: (bucket, heading, table header).
+_REPORT_SECTIONS = (
+    ("extracted", "### Extracted Notes",
+     "| Original Phrase | Extracted Note(s) | Reasoning |\n|-----------------|-------------------|----------|\n"),
+    ("deleted", "### Notes Marked for Deletion",
+     "| Original Phrase | Reasoning |\n|-----------------|----------|\n"),
+    ("confirmed", "### Confirmed Valid Scent Notes (no change)",
+     "| Original Phrase | Reasoning |\n|-----------------|----------|\n"),
+    ("review", "### Notes Requiring Manual Review",
+     "| Original Phrase | Status | Reasoning |\n|-----------------|--------|----------|\n"),
+)
+
+
+def _report_bucket(result: Dict) -> str:
+    """The one report table a result belongs to."""
+    if result.get("status") in RETRY_STATUSES:
+        return "review"
+    if result.get("extracted_notes"):
+        return "extracted"
+    if result.get("should_delete"):
+        return "deleted"
+    if "valid" in (result.get("reasoning") or "").lower():
+        return "confirmed"
+    return "review"
+
+
+def _report_row(bucket: str, result: Dict) -> str:
+    phrase = result.get("original_phrase", "")
+    if bucket == "extracted":
+        notes = result.get("extracted_notes", [])
+        notes_str = ", ".join([f'"{n}"' for n in notes]) if notes else "None"
+        return f'| "{phrase}" | {notes_str} | {result.get("reasoning", "N/A")[:100]}... |\n'
+    if bucket == "deleted":
+        return f'| "{phrase}" | {result.get("reasoning", "No extractable notes")[:100]}... |\n'
+    if bucket == "confirmed":
+        return f'| "{phrase}" | {result.get("reasoning", "Confirmed valid")[:100]} |\n'
+    return f'| "{phrase}" | Review Needed | {result.get("reasoning", "No action determined")[:100]}... |\n'
+
+
+def write_markdown_report(results: Iterable[Dict], out: TextIO):
+    """
+    Write the markdown report for `results` to `out` in a single pass.
+
+    Each result is classified once and its table row spooled to a temporary file per table,
+    so only the counts are held in memory; the summary is written first, then each table is
+    copied across. `results` may be a JsonlResults stream.
+    """
     from datetime import datetime
 
     timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-    extracted_count = sum(1 for r in results if r.get("extracted_notes"))
-    deleted_count = sum(1 for r in results if r.get("should_delete") and not r.get("extracted_notes"))
-    confirmed_count = sum(1 for r in results if not r.get("extracted_notes") and not r.get("should_delete") and "valid" in (r.get("reasoning") or "").lower())
-    no_action_count = len(results) - extracted_count - deleted_count - confirmed_count
+    spools = {bucket: tempfile.TemporaryFile("w+", encoding="utf-8") for bucket, _, _ in _REPORT_SECTIONS}
+    counts = dict.fromkeys(spools, 0)
+    try:
+        for result in results:
+            bucket = _report_bucket(result)
+            counts[bucket] += 1
+            spools[bucket].write(_report_row(bucket, result))
 
-    md = f"""# AI-Powered Note Extraction - Dry Run Report
+        out.write(f"""# AI-Powered Note Extraction - Dry Run Report
 
 **Generated:** {timestamp}
 
@@ -276,65 +1053,29 @@ def generate_markdown_report(results: List[Dict]) -> str:
 
 ## Summary
 
-- **Total Notes Processed:** {len(results)}
-- **Notes with Extracted Notes:** {extracted_count}
-- **Notes Marked for Deletion:** {deleted_count}
-- **Confirmed Valid (no change):** {confirmed_count}
-- **Notes Requiring Review:** {no_action_count}
+- **Total Notes Processed:** {sum(counts.values())}
+- **Notes with Extracted Notes:** {counts["extracted"]}
+- **Notes Marked for Deletion:** {counts["deleted"]}
+- **Confirmed Valid (no change):** {counts["confirmed"]}
+- **Notes Requiring Review:** {counts["review"]}
 
 ---
 
 ## Notes with Extracted Notes
 
-"""
-    extracted_notes = [r for r in results if r.get("extracted_notes")]
-    deleted_notes = [r for r in results if r.get("should_delete") and not r.get("extracted_notes")]
-    confirmed_notes = [r for r in results if not r.get("extracted_notes") and not r.get("should_delete") and "valid" in (r.get("reasoning") or "").lower()]
-    review_notes = [r for r in results if not r.get("extracted_notes") and not r.get("should_delete") and r not in confirmed_notes]
-
-    if extracted_notes:
-        md += "### Extracted Notes\n\n"
-        md += "| Original Phrase | Extracted Note(s) | Reasoning |\n"
-        md += "|-----------------|-------------------|----------|\n"
-        for result in extracted_notes:
-            phrase = result.get("original_phrase", "")
-            notes = result.get("extracted_notes", [])
-            reasoning = result.get("reasoning", "N/A")
-            notes_str = ", ".join([f'"{n}"' for n in notes]) if notes else "None"
-            md += f'| "{phrase}" | {notes_str} | {reasoning[:100]}... |\n'
-        md += "\n"
-
-    if deleted_notes:
-        md += "### Notes Marked for Deletion\n\n"
-        md += "| Original Phrase | Reasoning |\n"
-        md += "|-----------------|----------|\n"
-        for result in deleted_notes:
-            phrase = result.get("original_phrase", "")
-            reasoning = result.get("reasoning", "No extractable notes")
-            md += f'| "{phrase}" | {reasoning[:100]}... |\n'
-        md += "\n"
-
-    if confirmed_notes:
-        md += "### Confirmed Valid Scent Notes (no change)\n\n"
-        md += "| Original Phrase | Reasoning |\n"
-        md += "|-----------------|----------|\n"
-        for result in confirmed_notes:
-            phrase = result.get("original_phrase", "")
-            reasoning = result.get("reasoning", "Confirmed valid")
-            md += f'| "{phrase}" | {reasoning[:100]} |\n'
-        md += "\n"
-
-    if review_notes:
-        md += "### Notes Requiring Manual Review\n\n"
-        md += "| Original Phrase | Status | Reasoning |\n"
-        md += "|-----------------|--------|----------|\n"
-        for result in review_notes:
-            phrase = result.get("original_phrase", "")
-            reasoning = result.get("reasoning", "No action determined")
-            md += f'| "{phrase}" | Review Needed | {reasoning[:100]}... |\n'
-        md += "\n"
-
-    md += """---
+""")
+        for bucket, heading, header in _REPORT_SECTIONS:
+            if not counts[bucket]:
+                continue
+            out.write(f"{heading}\n\n{header}")
+            spools[bucket].seek(0)
+            shutil.copyfileobj(spools[bucket], out)
+            out.write("\n")
+    finally:
+        for spool in spools.values():
+            spool.close()
+
+    out.write("""---
 
 ## Next Steps
 
@@ -347,20 +1088,597 @@ def generate_markdown_report(results: List[Dict]) -> str:
 ```bash
 npm run db:backup
 ```
-"""
-    return md
+""")
+
+
+def generate_markdown_report(results: Iterable[Dict]) -> str:
+    """Generate a markdown report from extraction results (see write_markdown_report)"""
+    out = io.StringIO()
+    write_markdown_report(results, out)
+    return out.getvalue()
+
+
+def _note_fields(note_data: Dict, i: int) -> tuple:
+    """Return (phrase, note_id, reason) for an input row."""
+    phrase = note_data.get("name", note_data.get("phrase", note_data.get("original_phrase", "")))
+    note_id = note_data.get("id", f"note_{i}")
+    reason = note_data.get("reason", "")
+    return phrase, note_id, reason
+
+
+def _dedup_key(note_data: Dict) -> tuple:
+    """Rows with the same key get the same answer: folded phrase plus prompt kind."""
+    phrase, _, reason = _note_fields(note_data, 0)
+    # Same test as _prepare_extract
+    return canonical_phrase(phrase), "confirm" if "Confirm" in reason else "extract"
+
+
+def _manifest_key(note_data: Dict, model: str) -> str:
+    """Run-manifest key: phrase, reason, model (the whole cascade) and the prompt version used."""
+    phrase, _, reason = _note_fields(note_data, 0)
+    version = CONFIRM_PROMPT_VERSION if "Confirm" in reason else EXTRACT_PROMPT_VERSION
+    return manifest_key(phrase, reason, model, version)
+
+
+def _print_outcome(result: Dict, reason: str):
+    if result.get("status") == "unparseable":
+        print(f"   ⚠️  Unparseable response - kept for review", flush=True)
+    elif result.get("extracted_notes"):
+        print(f"   ✅ Extracted: {result['extracted_notes']}", flush=True)
+    elif result.get("should_delete"):
+        print(f"   🗑️  Marked for deletion", flush=True)
+    elif "Confirm" in reason and not result.get("should_delete"):
+        print(f"   ✓ Confirmed valid scent note", flush=True)
+    else:
+        print(f"   ⚠️  No notes extracted", flush=True)
+
+
+def _failure_result(phrase: str, note_id: str, error: Exception) -> Dict:
+    """Result row for a phrase whose processing raised; prints the matching console line."""
+    if isinstance(error, TimeoutError):
+        print(f"   ⏱️  Timeout - Skipping this phrase", flush=True)
+        reasoning = "Processing timed out - kept for manual review"
+    else:
+        print(f"   ❌ Error: {error} - Skipping", flush=True)
+        reasoning = f"Error during processing: {str(error)}"
+    return {
+        "original_phrase": phrase,
+        "note_id": note_id,
+        "extracted_notes": None,
+        "should_delete": False,
+        "status": "error",
+        "reasoning": reasoning,
+    }
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    """Consecutive lists of up to `size` rows; only one chunk is held at a time."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _progress(i: int, total: Optional[int]) -> str:
+    return f"{i}/{total}" if total is not None else str(i)
+
+
+def process_notes(
+    crew: NoteExtractionGraph,
+    notes: Iterable[Dict],
+    existing_notes: List[str],
+    sink: Callable[[Dict], None],
+    batch_size: int = 1,
+    total: Optional[int] = None,
+):
+    """
+    Process notes one request at a time with blocking LLM calls (batch_size phrases per request).
+
+    `notes` may be a stream (e.g. paged from the database); `total` is only used for progress.
+    Each result is passed to `sink` as soon as it is ready, in input order.
+    """
+    if batch_size > 1:
+        return _process_notes_batched(crew, notes, existing_notes, sink, batch_size, total)
+    for i, note_data in enumerate(notes, 1):
+        phrase, note_id, reason = _note_fields(note_data, i)
+
+        print(f"\n[{_progress(i, total)}] Processing: {phrase}", flush=True)
+        print("   ⏳ Calling LLM...", end="", flush=True)
+
+        try:
+            result = crew.extract_notes(phrase, existing_notes, reason=reason)
+            print("\r   ", end="", flush=True)  # clear "Calling LLM..." line
+            result["original_phrase"] = phrase
+            result["note_id"] = note_id
+            _print_outcome(result, reason)
+        except Exception as e:
+            print("\r   ", end="", flush=True)
+            result = _failure_result(phrase, note_id, e)
+        sink(result)
+
+
+def _process_notes_batched(
+    crew: NoteExtractionGraph,
+    notes: Iterable[Dict],
+    existing_notes: List[str],
+    sink: Callable[[Dict], None],
+    batch_size: int,
+    total: Optional[int] = None,
+):
+    start = 0
+    for chunk in _chunks(notes, batch_size):
+        fields = [_note_fields(note_data, i) for i, note_data in enumerate(chunk, start + 1)]
+        print(f"\n[{start + 1}-{_progress(start + len(fields), total)}] ⏳ Processing {len(fields)} phrases...",
+              flush=True)
+        try:
+            outcomes = crew.extract_batch([(phrase, reason) for phrase, _, reason in fields], existing_notes)
+        except Exception as e:
+            outcomes = [e] * len(fields)
+        for offset, ((phrase, note_id, reason), outcome) in enumerate(zip(fields, outcomes)):
+            print(f"\n[{_progress(start + offset + 1, total)}] {phrase}", flush=True)
+            if isinstance(outcome, Exception):
+                sink(_failure_result(phrase, note_id, outcome))
+                continue
+            outcome["original_phrase"] = phrase
+            outcome["note_id"] = note_id
+            _print_outcome(outcome, reason)
+            sink(outcome)
+        start += len(fields)
+
+
+async def process_notes_concurrently(
+    crew: NoteExtractionGraph,
+    notes: Iterable[Dict],
+    existing_notes: List[str],
+    sink: Callable[[Dict], None],
+    concurrency: int,
+    batch_size: int = 1,
+    total: Optional[int] = None,
+):
+    """
+    Process notes through the async graph path with bounded in-flight requests.
+
+    Notes are pulled from `notes` in windows of a few rounds of requests. Progress is printed as
+    each phrase completes (so lines can appear out of input order); at the end of each window its
+    results are passed to `sink` in input order, which keeps memory bounded by the window.
+    """
+    window = max(1, concurrency) * max(1, batch_size) * 4
+    done = 0
+    start = 0
+    for chunk in _chunks(notes, window):
+        fields = [_note_fields(note_data, i) for i, note_data in enumerate(chunk, start + 1)]
+        results: List[Optional[Dict]] = [None] * len(fields)
+
+        def on_result(index: int, outcome):
+            nonlocal done
+            done += 1
+            phrase, note_id, reason = fields[index]
+            print(f"\n[{_progress(done, total)}] #{start + index + 1}: {phrase}", flush=True)
+            if isinstance(outcome, Exception):
+                results[index] = _failure_result(phrase, note_id, outcome)
+                return
+            outcome["original_phrase"] = phrase
+            outcome["note_id"] = note_id
+            results[index] = outcome
+            _print_outcome(outcome, reason)
+
+        await crew.extract_many(
+            [(phrase, reason) for phrase, _, reason in fields],
+            existing_notes,
+            concurrency,
+            on_result=on_result,
+            batch_size=batch_size,
+        )
+        for result in results:
+            sink(result)
+        start += len(fields)
+
+
+def _tier_stats(model: str, escalate_model: Optional[str]) -> Dict[str, Dict]:
+    """Calls and mean latency per cascade tier (from the per-model LLM timers), plus escalation reasons."""
+    tiers = {"cheap": model}
+    if escalate_model:
+        tiers["strong"] = escalate_model
+    stats = {}
+    for tier, name in tiers.items():
+        histogram = METRICS.histograms.get(("llm_model", name))
+        count = histogram.count if histogram else 0
+        stats[tier] = {
+            "model": name,
+            "calls": count,
+            "mean_ms": round(histogram.sum / count * 1000, 1) if count else None,
+        }
+    if escalate_model:
+        stats["strong"]["escalations"] = {
+            reason: n for (event, reason), n in sorted(METRICS.counters.items()) if event == "escalation"
+        }
+    return stats
+
+
+def _new_stream_path(label: str = "") -> Path:
+    timestamp = __import__("datetime").datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    return project_root / "reports" / f"ai-note-extraction-{label}{timestamp}.jsonl"
+
+
+def _count_results(results: Iterable[Dict]) -> Dict[str, int]:
+    counts = dict.fromkeys(("processed", "extracted", "deleted", "rule", "alias", "error", "unparseable"), 0)
+    for r in results:
+        counts["processed"] += 1
+        counts["extracted"] += 1 if r.get("extracted_notes") else 0
+        counts["deleted"] += 1 if r.get("should_delete") else 0
+        counts["rule"] += 1 if r.get("source") == "rule" else 0
+        counts["alias"] += 1 if r.get("source") == "alias" else 0
+        counts["error"] += 1 if r.get("status") == "error" else 0
+        counts["unparseable"] += 1 if r.get("status") == "unparseable" else 0
+    return counts
+
+
+def merge_results(shard_paths: List[Path], stream_path: Path) -> Dict[str, int]:
+    """
+    Concatenate shard results streams into stream_path (replacing it) and write the same
+    JSON and Markdown reports a single run produces from it.
+    """
+    tmp = stream_path.with_name(stream_path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    with JsonlResultWriter(tmp) as writer:
+        for result in merge_streams(shard_paths):
+            writer.write(result)
+    tmp.replace(stream_path)
+
+    results = JsonlResults(stream_path)
+    save_results(results, f"{stream_path.stem}.json", format="json")
+    save_results(results, f"{stream_path.stem}.md", format="md")
+    return _count_results(results)
+
+
+def _print_merge_summary(counts: Dict[str, int], shard_count: int, stream_path: Path):
+    print(f"\n📊 Merged {shard_count} shards:")
+    print(f"   • Notes processed: {counts['processed']}")
+    print(f"   • Notes extracted: {counts['extracted']}")
+    print(f"   • Notes to delete: {counts['deleted']}")
+    print(f"   • Failed after retries (kept for review): {counts['error']}")
+    if counts["unparseable"]:
+        print(f"   • Unparseable responses (kept for review): {counts['unparseable']}")
+    print(f"\n📄 Reports saved:")
+    print(f"   • Results stream: {stream_path}")
+    print(f"   • JSON: reports/{stream_path.stem}.json")
+    print(f"   • Markdown: reports/{stream_path.stem}.md")
+
+
+def merge_main(argv: List[str]):
+    """`clean-notes-ai.py merge`: combine shard results streams (from --shard or --workers) into one report."""
+    parser = argparse.ArgumentParser(prog="clean-notes-ai.py merge",
+                                     description="Merge the results streams of a sharded run into one set of reports")
+    parser.add_argument("shards", nargs="+", help="Shard results .jsonl files; a note_id already merged is skipped")
+    parser.add_argument("--output", type=str,
+                        help="Merged results .jsonl (default: reports/ai-note-extraction-merged-<ts>.jsonl)")
+    args = parser.parse_args(argv)
+
+    shard_paths = [Path(p) for p in args.shards]
+    missing = [p for p in shard_paths if not p.exists()]
+    if missing:
+        print(f"❌ Shard results not found: {missing[0]}")
+        sys.exit(1)
+    stream_path = Path(args.output) if args.output else _new_stream_path("merged-")
+    if stream_path.resolve() in {p.resolve() for p in shard_paths}:
+        print("❌ --output must not be one of the shard streams")
+        sys.exit(1)
+    counts = merge_results(shard_paths, stream_path)
+    _print_merge_summary(counts, len(shard_paths), stream_path)
+
+
+def _apply_target(explicit: Optional[str], source: Optional[str] = None) -> Optional[str]:
+    """
+    Database for --apply: the flag's value, else a database --source, else the database
+    apply-ai-recommendations.js writes to ($LOCAL_DATABASE_URL outside production, else $DATABASE_URL).
+    """
+    if explicit:
+        return explicit
+    if source and not source.lower().endswith(".csv"):
+        return source
+    if os.getenv("NODE_ENV") != "production" and os.getenv("LOCAL_DATABASE_URL"):
+        return os.getenv("LOCAL_DATABASE_URL")
+    return os.getenv("DATABASE_URL")
+
+
+def apply_results(results: Iterable[Dict], target: str, batch_size: int, dry_run: bool,
+                  stem: str) -> Optional[Dict]:
+    """
+    Write accepted results to `target` in batched transactions (see note_ai/apply.py) and print
+    a summary; with dry_run only reports/<stem>.apply.diff is written. Returns the stats, or
+    None if the apply failed (batches committed before the failure stay applied).
+    """
+    diff_path = project_root / "reports" / f"{stem}.apply.diff"
+    diff_path.parent.mkdir(exist_ok=True)
+    print(f"\n🗄️  {'Diffing' if dry_run else 'Applying'} results against {check_target(target)} "
+          f"({batch_size} results per transaction)...")
+    diff = open(diff_path, "w", encoding="utf-8") if dry_run else None
+    try:
+        with NoteApplier(target, batch_size=batch_size, dry_run=dry_run, diff=diff) as applier:
+            try:
+                stats = applier.apply(results)
+                duplicates = applier.duplicate_groups()
+            except RuntimeError as e:
+                stats = applier.stats()
+                print(f"❌ Apply stopped: {e}")
+                print(f"   {stats['transactions']} transactions were committed before it; "
+                      f"rerun to apply the rest")
+                return None
+    finally:
+        if diff is not None:
+            diff.close()
+    verb = "Would" if dry_run else "Applied:"
+    print(f"   • {verb} extract {stats['extracted']} phrases, delete {stats['deleted']} notes, "
+          f"create {stats['notes_created']} notes")
+    print(f"   • Relations relinked / removed: {stats['relations_added']}/{stats['relations_removed']}")
+    print(f"   • Phrases no longer in the database (skipped): {stats['missing']}")
+    if stats["skipped"]:
+        print(f"   • Phrases extracting to themselves (skipped): {stats['skipped']}")
+    if stats["unanswered"]:
+        print(f"   • Results without a parsed answer (not applied, see the report): {stats['unanswered']}")
+    rate = f"{stats['rows_per_sec']:g} rows/sec" if stats["rows_per_sec"] is not None else "n/a"
+    print(f"   • {stats['rows_written']} rows in {stats['batches']} batches, {stats['transactions']} transactions, "
+          f"{stats['seconds']:g}s ({rate})")
+    if dry_run:
+        print(f"   • Diff: {diff_path}")
+    if duplicates:
+        print(f"\n⚠️  {len(duplicates)} duplicate note group(s) {'would remain' if dry_run else 'remain'} "
+              f"(same name up to case/spacing):")
+        for names in duplicates[:20]:
+            print(f"   • {' / '.join(repr(n) for n in names)}")
+        if len(duplicates) > 20:
+            print(f"   • ... and {len(duplicates) - 20} more")
+        print("   💡 Run duplicate detection to merge them: npm run clean:notes:dry-run, then npm run clean:notes")
+    else:
+        print("   • No duplicate notes detected")
+    stats["duplicate_groups"] = len(duplicates)
+    return stats
+
+
+def apply_main(argv: List[str]):
+    """`clean-notes-ai.py apply`: write an earlier run's results (e.g. a merged sharded run) to the database."""
+    parser = argparse.ArgumentParser(prog="clean-notes-ai.py apply",
+                                     description="Write extraction results to the notes database in batched transactions")
+    parser.add_argument("results", help="Results stream (.jsonl) or JSON report of a run")
+    parser.add_argument("--target", type=str,
+                        help="PostgreSQL DSN or SQLite file (default: $LOCAL_DATABASE_URL outside production, "
+                             "else $DATABASE_URL)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_APPLY_BATCH,
+                        help="Results written per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only write the diff of what would change")
+    args = parser.parse_args(argv)
+
+    path = Path(args.results)
+    if not path.exists():
+        print(f"❌ Results not found: {path}")
+        sys.exit(1)
+    target = _apply_target(args.target)
+    if not target:
+        print("❌ apply needs --target (PostgreSQL DSN or SQLite file) or DATABASE_URL")
+        sys.exit(1)
+    results = JsonlResults(path) if path.suffix.lower() in JSONL_SUFFIXES else list(iter_input_notes(str(path)))
+    try:
+        stats = apply_results(results, target, max(1, args.batch_size), args.dry_run, path.stem)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ Could not open apply target: {e}")
+        sys.exit(1)
+    if stats is None:
+        sys.exit(1)
+
+
+SHARD_PROGRESS_INTERVAL = 2.0  # seconds between --workers progress updates
+
+
+class _LineCounter:
+    """Lines in a growing file, reading only the bytes appended since the last update."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset = 0
+        self.lines = 0
+
+    def update(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    # Rewritten (a resumed shard drops its failed rows first): count again.
+                    self.offset = self.lines = 0
+                f.seek(self.offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return self.lines
+        self.offset += len(chunk)
+        self.lines += chunk.count(b"\n")
+        return self.lines
+
+
+def _strip_options(argv: List[str], options: tuple) -> List[str]:
+    """argv without `options` and their values ("--opt value" and "--opt=value" forms)."""
+    kept, skip_value = [], False
+    for arg in argv:
+        if skip_value:
+            skip_value = False
+            continue
+        if arg.split("=", 1)[0] in options:
+            skip_value = "=" not in arg
+            continue
+        kept.append(arg)
+    return kept
+
+
+def _print_shard_progress(counters: List[_LineCounter], running: int):
+    per_shard = " · ".join(f"{i}: {c.update()}" for i, c in enumerate(counters))
+    print(f"\r🧩 {sum(c.lines for c in counters)} results, {running}/{len(counters)} shards running ({per_shard})",
+          end="", flush=True)
+
+
+def run_workers(args, argv: List[str]) -> int:
+    """
+    Run args.workers shard processes of this script on this machine, show their combined
+    progress and merge their streams when they finish; returns the exit status.
+
+    Shard i writes <output stem>.shard-i-of-N.jsonl (log: .log next to it). Launching again
+    with the same --output resumes every shard stream that already exists.
+    """
+    count = args.workers
+    stream_path = Path(args.output) if args.output else _new_stream_path()
+    shard_paths = [shard_path(stream_path, i, count) for i in range(count)]
+    # Each child gets its own --shard/--output/--resume; --prometheus would be overwritten by every shard.
+    child_argv = _strip_options(argv, ("--workers", "--output", "--resume", "--shard", "--rpm", "--tpm", "--prometheus"))
+
+    print(f"🧩 Starting {count} shard processes for {stream_path.name}\n")
+    procs, logs = [], []
+    for i, path in enumerate(shard_paths):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logs.append(open(path.with_suffix(".log"), "a", encoding="utf-8"))
+        procs.append(subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), *child_argv,
+             "--shard", f"{i}/{count}", "--resume" if path.exists() else "--output", str(path),
+             # The API tier's limits are split evenly between the shards.
+             "--rpm", str(args.rpm / count), "--tpm", str(args.tpm / count)],
+            stdout=logs[-1], stderr=subprocess.STDOUT,
+        ))
+    counters = [_LineCounter(path) for path in shard_paths]
+    try:
+        while any(p.poll() is None for p in procs):
+            _print_shard_progress(counters, sum(p.poll() is None for p in procs))
+            time.sleep(SHARD_PROGRESS_INTERVAL)
+    except KeyboardInterrupt:
+        # The shards received the same Ctrl-C and close their streams on their own.
+        for p in procs:
+            p.wait()
+        print(f"\n\n⏸️  Interrupted. Resume every shard with: --workers {count} --output {stream_path}")
+        return 130
+    finally:
+        for log in logs:
+            log.close()
+    _print_shard_progress(counters, 0)
+    print()
+
+    failed = [i for i, p in enumerate(procs) if p.returncode != 0]
+    for i in failed:
+        print(f"❌ Shard {i}/{count} exited with status {procs[i].returncode}; see {shard_paths[i].with_suffix('.log')}")
+    counts = merge_results([p for p in shard_paths if p.exists()], stream_path)
+    _print_merge_summary(counts, count, stream_path)
+    if failed:
+        print(f"\n   Rerun with --workers {count} --output {stream_path} to resume the failed shards")
+    return 1 if failed else 0
 
 
 def main():
+    if sys.argv[1:2] == ["merge"]:
+        merge_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["apply"]:
+        apply_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description="AI-powered note extraction using LangGraph")
     parser.add_argument("--dry-run", action="store_true", help="Preview changes without applying")
-    parser.add_argument("--input", type=str, help="Input JSON file with ambiguous notes")
+    parser.add_argument("--input", type=str,
+                        help="Input file with ambiguous notes: a JSON array, or JSONL/NDJSON (streamed)")
     parser.add_argument("--all", action="store_true", help="Process all ambiguous notes from database")
+    parser.add_argument("--source", type=str,
+                        help="Notes for --all: PostgreSQL DSN, SQLite file or CSV export (default: $DATABASE_URL)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help="Rows per keyset-paginated database read with --all")
     parser.add_argument("--model", type=str, default="gpt-4o-mini", help="OpenAI model to use")
+    parser.add_argument("--escalate-model", type=str,
+                        help="Stronger model for answers the first model could not settle (e.g. gpt-4o); off by default")
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE,
+                        help="With --escalate-model, escalate answers whose self-reported confidence is below this")
+    parser.add_argument("--llm-backend", choices=BACKENDS,
+                        help="LLM backend (default: $NOTE_AI_LLM_BACKEND or openai); 'fake' runs offline")
+    parser.add_argument("--existing-notes", type=str,
+                        help="JSON list of existing note names; the most similar ones are given to the LLM as context")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Max LLM requests in flight (values > 1 use the async path)")
+    parser.add_argument("--context-tokens", type=int, default=DEFAULT_CONTEXT_TOKENS,
+                        help="Token budget for the existing-notes context in each prompt")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Phrases packed into one LLM request (missing/malformed answers are retried singly)")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Request a strict JSON schema and validate answers once; non-matching ones are "
+                             "kept as unparseable instead of guessed at (one phrase per request)")
+    parser.add_argument("--resume", type=str,
+                        help="Results .jsonl from an interrupted run; skips note_ids already in it and appends")
+    parser.add_argument("--output", type=str,
+                        help="Results .jsonl to write (default: reports/ai-note-extraction-<ts>.jsonl)")
+    parser.add_argument("--shard", type=str, metavar="I/N",
+                        help="Only process rows whose note_id hashes to shard I of N (0-based); see the merge command")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Run N shard processes locally (--shard 0/N .. N-1/N) and merge their results")
+    parser.add_argument("--no-aliases", action="store_true",
+                        help="Do not answer phrases from the learned alias store (see scripts/note-aliases.py)")
+    parser.add_argument("--full", action="store_true",
+                        help="Recompute every row instead of carrying forward unchanged ones from earlier runs")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Process every row, even ones whose phrase only differs by case/whitespace/punctuation")
+    parser.add_argument("--no-rules", action="store_true",
+                        help="Send every phrase to the LLM instead of settling obvious ones by rule")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="Requests per minute allowed by the API tier")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TPM, help="Tokens per minute allowed by the API tier")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Retries per request for rate limits and transient API errors")
+    parser.add_argument("--call-timeout", type=float, default=DEFAULT_CALL_TIMEOUT,
+                        help="Seconds one LLM call may take before it is abandoned and retried (0: no limit)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request when a call outlasts the observed p90 latency; first answer wins")
+    parser.add_argument("--hedge-budget", type=float, default=DEFAULT_HEDGE_BUDGET,
+                        help="With --hedge, maximum duplicate requests as a fraction of all requests")
+    parser.add_argument("--apply", nargs="?", const="", metavar="DSN",
+                        help="Write accepted results to the notes database in batched transactions: PostgreSQL DSN "
+                             "or SQLite file (default: a database --source, else $LOCAL_DATABASE_URL outside "
+                             "production, else $DATABASE_URL); with --dry-run only a diff is written")
+    parser.add_argument("--apply-batch-size", type=int, default=DEFAULT_APPLY_BATCH,
+                        help="Results written per --apply transaction")
+    parser.add_argument("--prometheus", type=str, metavar="PATH",
+                        help="Also write the run metrics in Prometheus text format to PATH")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the LLM response cache")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Ignore cached responses but store fresh ones")
 
     args = parser.parse_args()
 
-    if not os.getenv("OPENAI_API_KEY"):
+    if args.shard:
+        try:
+            shard_index, shard_count = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    if args.apply is not None and (args.shard or args.workers > 1):
+        print("❌ --apply writes one run's results; apply a sharded run after merging: clean-notes-ai.py apply <merged .jsonl>")
+        sys.exit(1)
+    if args.workers > 1:
+        if args.shard or args.resume:
+            print("❌ --workers runs its own shards; resume them by repeating --workers N --output <results .jsonl>")
+            sys.exit(1)
+        sys.exit(run_workers(args, sys.argv[1:]))
+    if args.structured_output and args.batch_size > 1:
+        print("⚠️  --structured-output sends one phrase per request; ignoring --batch-size\n")
+        args.batch_size = 1
+    if args.output and not args.resume and Path(args.output).exists():
+        print(f"❌ {args.output} already exists; continue it with --resume {args.output}")
+        sys.exit(1)
+
+    if missing_dependency(args.llm_backend):
+        print("❌ LangGraph not installed. Install with: pip install -r scripts/requirements-ai.txt")
+        sys.exit(1)
+
+    apply_target = None
+    if args.apply is not None:
+        apply_target = _apply_target(args.apply, args.source if args.all else None)
+        try:
+            if not apply_target:
+                raise ValueError("--apply needs a DSN, a database --source or DATABASE_URL")
+            check_target(apply_target)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    if backend_name(args.llm_backend) == "openai" and not os.getenv("OPENAI_API_KEY"):
         print("❌ OPENAI_API_KEY not found in environment variables")
         print("   Add it to your .env file or export it")
         sys.exit(1)
@@ -372,83 +1690,232 @@ def main():
     if args.dry_run:
         print("⚠️  DRY RUN MODE - No changes will be made\n")
 
-    crew = NoteExtractionGraph(model=args.model)
-
+    cache = None if args.no_cache else ResponseCache(refresh=args.refresh_cache)
+    scheduler = RequestScheduler(
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        max_retries=args.max_retries,
+        max_concurrency=args.concurrency,
+        call_timeout=args.call_timeout,
+        hedge=HedgePolicy(budget=args.hedge_budget) if args.hedge else None,
+    )
+    aliases = None if args.no_aliases else AliasStore()
+    crew = NoteExtractionGraph(
+        model=args.model, cache=cache, rules=not args.no_rules, scheduler=scheduler, backend=args.llm_backend,
+        aliases=aliases, escalate_model=args.escalate_model, min_confidence=args.min_confidence,
+        context_tokens=args.context_tokens, structured_output=args.structured_output,
+    )
+
+    # `total` stays None for streamed inputs; they are never counted up front.
+    total = None
     if args.input:
         notes = load_ambiguous_notes(args.input)
-        print(f"📋 Loaded {len(notes)} notes from {args.input}\n")
+        if isinstance(notes, list):
+            total = len(notes)
+            print(f"📋 Loaded {total} notes from {args.input}\n")
+        else:
+            print(f"📋 Streaming notes from {args.input}\n")
     elif args.all:
-        print("⚠️  --all flag not yet implemented. Use --input to provide a JSON file.")
-        sys.exit(1)
+        source = args.source or os.getenv("DATABASE_URL")
+        if not source:
+            print("❌ --all needs --source (PostgreSQL DSN, SQLite file or CSV export) or DATABASE_URL")
+            sys.exit(1)
+        try:
+            notes = iter_candidates(iter_source_notes(source, max(1, args.page_size)))
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ Could not open notes source: {e}")
+            sys.exit(1)
+        print(f"📋 Streaming candidate notes from {describe_source(source)} ({args.page_size} rows per page)\n")
     else:
         print("❌ Please provide --input file or use --all flag")
         sys.exit(1)
 
-    results = []
-    existing_notes = []
-
-    for i, note_data in enumerate(notes, 1):
-        phrase = note_data.get("name", note_data.get("phrase", note_data.get("original_phrase", "")))
-        note_id = note_data.get("id", f"note_{i}")
-
-        print(f"\n[{i}/{len(notes)}] Processing: {phrase}", flush=True)
-        print("   ⏳ Calling LLM...", end="", flush=True)
-
-        reason = note_data.get("reason", "")
+    existing_notes = load_existing_notes(args.existing_notes)
+    if existing_notes:
+        print(f"📚 Loaded {len(existing_notes)} existing notes for prompt context\n")
+
+    # Give every row its final note_id up front so resumed runs see the same ids.
+    notes = (dict(note_data, id=_note_fields(note_data, i)[1]) for i, note_data in enumerate(notes, 1))
+
+    if args.shard:
+        notes = in_shard(notes, shard_index, shard_count)
+        if total is not None:
+            notes = list(notes)
+            total = len(notes)
+        print(f"🧩 Shard {shard_index}/{shard_count}" + (f": {total} notes\n" if total is not None else "\n"))
+
+    if args.resume:
+        stream_path = Path(args.resume)
+        # Rows that failed last time are dropped and retried rather than carried over.
+        failed = drop_failed(stream_path)
+        done_ids = completed_note_ids(stream_path)
+        notes = (n for n in notes if str(n["id"]) not in done_ids)
+        if total is not None:
+            notes = list(notes)
+            total = len(notes)
+        print(f"⏭️  Resuming {stream_path}: {len(done_ids)} already done, {failed} failed to retry"
+              + (f", {total} remaining\n" if total is not None else "\n"))
+    else:
+        stream_path = Path(args.output) if args.output else _new_stream_path()
+
+    started = time.perf_counter()
+    with JsonlResultWriter(stream_path) as writer:
+        sink = writer.write
+        model_key = args.model + (f">{args.escalate_model}" if args.escalate_model else "")
+        model_key += "+structured" if args.structured_output else ""
+        manifest = RunManifest(writer.write, key=lambda row: _manifest_key(row, model_key),
+                               phrase=lambda row: _note_fields(row, 0)[0], origin=stream_path.name, full=args.full)
+        notes, sink = manifest.iter_changed(notes), manifest.sink
+        if total is not None:
+            notes = list(notes)
+            total = len(notes)
+            if not args.full:
+                print(f"♻️  {manifest.reused} unchanged rows carried forward from earlier runs, {total} to compute\n")
+        deduper = None
+        if not args.no_dedup:
+            deduper = PhraseDeduper(sink, key=_dedup_key, phrase=lambda row: _note_fields(row, 0)[0])
+            notes, sink = deduper.iter_unique(notes), deduper.sink
+            if total is not None:
+                notes = list(notes)
+                total = len(notes)
+                print(f"🔁 {deduper.rows} rows → {total} unique phrases (dedup ratio {deduper.ratio:.2f}x)\n")
         try:
-            result = crew.extract_notes(phrase, existing_notes, reason=reason)
-            print("\r   ", end="", flush=True)  # clear "Calling LLM..." line
-            result["original_phrase"] = phrase
-            result["note_id"] = note_id
-            results.append(result)
-
-            if result.get("extracted_notes"):
-                print(f"   ✅ Extracted: {result['extracted_notes']}", flush=True)
-            elif result.get("should_delete"):
-                print(f"   🗑️  Marked for deletion", flush=True)
-            elif "Confirm" in reason and not result.get("should_delete"):
-                print(f"   ✓ Confirmed valid scent note", flush=True)
+            if args.concurrency > 1:
+                asyncio.run(process_notes_concurrently(
+                    crew, notes, existing_notes, sink, args.concurrency, args.batch_size, total
+                ))
             else:
-                print(f"   ⚠️  No notes extracted", flush=True)
-        except TimeoutError:
-            print("\r   ", end="", flush=True)
-            print(f"   ⏱️  Timeout - Skipping this phrase", flush=True)
-            results.append({
-                "original_phrase": phrase,
-                "note_id": note_id,
-                "extracted_notes": None,
-                "should_delete": True,
-                "reasoning": "Processing timed out - marked for deletion",
-            })
-        except Exception as e:
-            print("\r   ", end="", flush=True)
-            print(f"   ❌ Error: {e} - Skipping", flush=True)
-            results.append({
-                "original_phrase": phrase,
-                "note_id": note_id,
-                "extracted_notes": None,
-                "should_delete": True,
-                "reasoning": f"Error during processing: {str(e)}",
-            })
-
-    timestamp = __import__("datetime").datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-    json_file = f"ai-note-extraction-{timestamp}.json"
-    md_file = f"ai-note-extraction-{timestamp}.md"
+                process_notes(crew, notes, existing_notes, sink, args.batch_size, total)
+        except KeyboardInterrupt:
+            print(f"\n\n⏸️  Interrupted. {writer.written} results saved this run.")
+            print(f"   Resume with: --resume {stream_path}")
+            sys.exit(130)
+        finally:
+            manifest.close()
+
+        phrases_this_run = writer.written
+    processing_seconds = time.perf_counter() - started
+    results = JsonlResults(stream_path)
+    json_file = f"{stream_path.stem}.json"
+    md_file = f"{stream_path.stem}.md"
+    metrics_file = f"{stream_path.stem}.metrics.json"
 
     save_results(results, json_file, format="json")
     save_results(results, md_file, format="md")
 
-    extracted_count = sum(1 for r in results if r.get("extracted_notes"))
-    deleted_count = sum(1 for r in results if r.get("should_delete"))
+    counts = _count_results(results)
 
     print(f"\n📊 Summary:")
-    print(f"   • Notes processed: {len(results)}")
-    print(f"   • Notes extracted: {extracted_count}")
-    print(f"   • Notes to delete: {deleted_count}")
+    print(f"   • Notes processed: {counts['processed']}")
+    print(f"   • Notes extracted: {counts['extracted']}")
+    print(f"   • Notes to delete: {counts['deleted']}")
+    print(f"   • Settled by rule (no LLM call): {counts['rule']}")
+    print(f"   • Answered from learned aliases (no LLM call): {counts['alias']}")
+    print(f"   • Failed after retries (kept for review): {counts['error']}")
+    parses = sum(n for (event, _), n in METRICS.counters.items() if event == "parse")
+    parse_failures = sum(n for (event, _), n in METRICS.counters.items() if event == "parse_failure")
+    parse_failure_rate = parse_failures / parses if parses else None
+    if args.structured_output:
+        print(f"   • Unparseable responses (kept for review, retried on --resume): {counts['unparseable']}")
+    if parses:
+        print(f"   • Response parse failures: {parse_failures}/{parses} ({parse_failure_rate:.2%})")
+    if deduper is not None:
+        print(f"   • Duplicate rows answered from one request: {deduper.fanned_out} "
+              f"({deduper.rows} rows, {deduper.unique} unique, dedup ratio {deduper.ratio:.2f}x)")
+    print(f"   • Carried forward unchanged / recomputed: {manifest.reused}/{manifest.recomputed}"
+          + (" (--full)" if args.full else ""))
+    if args.all:
+        candidates = METRICS.counters.get(("source_row", "candidate"), 0)
+        scanned = candidates + METRICS.counters.get(("source_row", "skipped"), 0)
+        print(f"   • Notes scanned / sent for extraction: {scanned}/{candidates}")
+    tiers = _tier_stats(args.model, args.escalate_model)
+    for tier, stats in tiers.items():
+        print(f"   • {tier.capitalize()} tier ({stats['model']}): {stats['calls']} calls, "
+              f"mean {stats['mean_ms']} ms" + (f", escalations {stats['escalations']}" if "escalations" in stats else ""))
+    sched = scheduler.stats()
+    print(f"   • LLM retries / rate-limited responses: {sched['retries']}/{sched['rate_limited']}")
+    if sched["call_timeout"] is not None:
+        print(f"   • Calls abandoned after --call-timeout {sched['call_timeout']:g}s: {sched['call_timeouts']}")
+    if args.hedge:
+        print(f"   • Hedged requests sent / won: {sched['hedges_sent']}/{sched['hedges_won']} "
+              f"(cap {args.hedge_budget:.0%} extra, {sched['hedges_over_budget']} held back by the cap)")
+    prompt_tokens = sum(t["prompt_tokens"] for t in METRICS.tokens.values())
+    cached_tokens = sum(t["cached_prompt_tokens"] for t in METRICS.tokens.values())
+    print(f"   • Prompt tokens served from the provider's prefix cache / uncached: "
+          f"{cached_tokens}/{prompt_tokens - cached_tokens}")
+    if not any(cacheable(prefix) for prefix in (EXTRACT_PREFIX, CONFIRM_PREFIX, EXTRACT_BATCH_PREFIX)):
+        print(f"     (every prompt prefix is under {CACHE_MIN_PREFIX_TOKENS} tokens, so the provider caches none)")
+    cache_stats = None
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"   • Cache hits/misses: {cache_stats['hits']}/{cache_stats['misses']}")
+        cache.close()
+    alias_stats = None
+    if aliases is not None:
+        alias_stats = aliases.stats()
+        aliases.close()
+    apply_stats = None
+    if apply_target:
+        try:
+            apply_stats = apply_results(results, apply_target, max(1, args.apply_batch_size), args.dry_run,
+                                        stream_path.stem)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ Could not open apply target: {e}")
+
+    run = {
+        "model": args.model,
+        "phrases_this_run": phrases_this_run,
+        "results_total": counts["processed"],
+        "processing_seconds": round(processing_seconds, 3),
+        "phrases_per_sec": round(phrases_this_run / processing_seconds, 3) if processing_seconds > 0 else None,
+        "concurrency": args.concurrency,
+        "shard": args.shard,
+        "batch_size": args.batch_size,
+        "structured_output": args.structured_output,
+        "parse_failure_rate": round(parse_failure_rate, 6) if parse_failure_rate is not None else None,
+        "tiers": tiers,
+    }
+    run["manifest"] = manifest.stats()
+    if deduper is not None:
+        run["dedup"] = {
+            "rows": deduper.rows,
+            "unique_phrases": deduper.unique,
+            "fanned_out": deduper.fanned_out,
+            "ratio": round(deduper.ratio, 4),
+        }
+    METRICS.write_json(
+        project_root / "reports" / metrics_file,
+        run=run,
+        scheduler=sched,
+        cache=cache_stats,
+        aliases=alias_stats,
+        apply=apply_stats,
+    )
+    print(f"   • Estimated LLM cost: ${METRICS.cost_usd:.4f}")
+    if args.prometheus:
+        METRICS.write_prometheus(
+            args.prometheus,
+            processing_seconds=processing_seconds,
+            llm_retries_total=sched["retries"],
+            llm_rate_limited_total=sched["rate_limited"],
+            llm_call_timeouts_total=sched["call_timeouts"],
+            llm_hedges_sent_total=sched.get("hedges_sent"),
+            llm_hedges_won_total=sched.get("hedges_won"),
+            dedup_ratio=deduper.ratio if deduper is not None else None,
+            apply_rows_total=apply_stats["rows_written"] if apply_stats else None,
+            apply_rows_per_sec=apply_stats["rows_per_sec"] if apply_stats else None,
+            apply_transactions_total=apply_stats["transactions"] if apply_stats else None,
+        )
     print(f"\n📄 Reports saved:")
+    print(f"   • Results stream: {stream_path}")
     print(f"   • JSON: reports/{json_file}")
     print(f"   • Markdown: reports/{md_file}")
+    print(f"   • Metrics: reports/{metrics_file}")
+    if args.prometheus:
+        print(f"   • Prometheus metrics: {args.prometheus}")
 
+    if apply_target and apply_stats is None:
+        sys.exit(1)
     if args.dry_run:
         print("\n✅ Dry run complete. Review the markdown report before applying changes.")
 
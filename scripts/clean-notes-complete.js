@@ -13,6 +13,10 @@
  *   node scripts/clean-notes-complete.js --dry-run  # Preview changes
  *   node scripts/clean-notes-complete.js --confirm-apply            # Apply changes (after backup!)
  *   node scripts/clean-notes-complete.js --confirm-apply --apply-ai --recheck-duplicates
+ *   node scripts/clean-notes-complete.js --dry-run --full  # Re-run AI extraction on every ambiguous note
+ *
+ * AI extraction is incremental: ambiguous notes whose phrase, reason, model and prompt are
+ * unchanged since an earlier run reuse that run's result. --full recomputes all of them.
  */
 
 import { execSync } from 'child_process'
@@ -64,7 +68,7 @@ function findLatestReport(pattern, minTime = 0) {
   try {
     // Convert glob pattern to regex
     const regexPattern = pattern.replace(/\*/g, '.*')
-    const regex = new RegExp(regexPattern)
+    const regex = new RegExp(`^${regexPattern}$`)
     
     const files = readdirSync(reportsDir)
       .filter(f => regex.test(f))
@@ -432,6 +436,7 @@ async function main() {
   const recheckDuplicates = process.argv.includes('--recheck-duplicates')
   const confirmApply = process.argv.includes('--confirm-apply')
   const skipBackupCheck = process.argv.includes('--skip-backup-check')
+  const fullAIRun = process.argv.includes('--full')
   
   console.log('='.repeat(60))
   console.log('🧹 Complete Note Cleaning Workflow')
@@ -533,36 +538,31 @@ async function main() {
   console.log('\n📋 Step 3/4: Running AI-powered extraction...')
   const aiStepStartedAt = Date.now()
   const pythonCmd = pythonForAI.includes(' ') ? `"${pythonForAI}"` : pythonForAI
+  // With --apply-ai the extraction run also writes its results to the database, in batched
+  // transactions (clean-notes-ai.py --apply), instead of a separate apply-ai-recommendations.js pass.
+  const applyAIInRun = applyAI && runApply
   const aiSuccess = runCommand(
-    `${pythonCmd} scripts/clean-notes-ai.py --input ${ambiguousPath} --dry-run`,
-    'Running AI-Powered Extraction (Analysis Only)'
+    `${pythonCmd} scripts/clean-notes-ai.py --input ${ambiguousPath} ${applyAIInRun ? '--apply' : '--dry-run'}${fullAIRun ? ' --full' : ''}`,
+    applyAIInRun ? 'Running AI-Powered Extraction and Applying Results' : 'Running AI-Powered Extraction (Analysis Only)'
   )
   
   if (!aiSuccess) {
     console.warn('⚠️  AI extraction failed. Continuing with rule-based results only.')
   }
   
-  // Step 5: Find AI results
+  // Step 5: Find AI results (written before the apply step, so they exist even if applying failed)
   const aiResultsPattern = 'ai-note-extraction-*.json'
-  const aiResultsPath = aiSuccess
-    ? (findLatestReport(aiResultsPattern, aiStepStartedAt) || '')
-    : ''
-  
-  // Step 6: Apply AI recommendations (if requested and not dry-run)
-  let aiApplied = false
-  if (applyAI && !isDryRun && aiResultsPath) {
-    console.log('\n📋 Step 4/5: Applying AI recommendations...')
-    const applyAISuccess = runCommand(
-      `node scripts/apply-ai-recommendations.js ${aiResultsPath}`,
-      'Applying AI-Generated Recommendations'
-    )
-    
-    if (applyAISuccess) {
-      aiApplied = true
-      console.log('✅ AI recommendations applied successfully')
-    } else {
-      console.warn('⚠️  Failed to apply AI recommendations. Continuing...')
-    }
+  const aiResultsPath = findLatestReport(aiResultsPattern, aiStepStartedAt) || ''
+  
+  // Step 6: AI recommendations were applied by the extraction run itself (if requested and not dry-run)
+  const aiApplied = applyAIInRun && aiSuccess && Boolean(aiResultsPath)
+  if (aiApplied) {
+    console.log('✅ AI recommendations applied successfully')
+  } else if (applyAIInRun && aiResultsPath) {
+    console.warn('⚠️  AI extraction finished but applying its results failed. Continuing...')
+    console.warn(`   Apply them later with: python scripts/clean-notes-ai.py apply reports/${aiResultsPath.split(/[/\\]/).pop()}`)
+  } else if (applyAIInRun) {
+    console.warn('⚠️  Failed to apply AI recommendations. Continuing...')
   }
   
   // Step 7: Re-check duplicates (if requested and not dry-run)
@@ -606,7 +606,7 @@ async function main() {
     console.log(`   2. Backup your database: npm run db:backup`)
     console.log(`   3. Run: npm run clean:notes:complete:apply`)
     if (aiResultsPath) {
-      console.log(`   4. Apply AI recommendations: node scripts/apply-ai-recommendations.js ${aiResultsPath.split(/[/\\]/).pop()}`)
+      console.log(`   4. Apply AI recommendations: python scripts/clean-notes-ai.py apply reports/${aiResultsPath.split(/[/\\]/).pop()}`)
       console.log(`   5. Re-check duplicates: npm run clean:notes`)
     }
   } else {
@@ -5,12 +5,20 @@
  * Finds and merges duplicate notes with case-insensitive matching
  * Ensures one note like "oud" can be used for multiple perfumes in different types
  * 
+ * With --plan, merges the groups of a plan written by
+ * `python scripts/normalize-note-ai.py cluster` (near-duplicates such as "Vanilla Bean" / "vanilla")
+ * instead of exact case-insensitive matches. The plan's canonical note is kept.
+ *
+ * A duplicate's PerfumeNoteRelation rows are moved to the kept note before it is deleted.
+ *
  * Run with: node scripts/merge-duplicate-notes.js
  * Dry run: node scripts/merge-duplicate-notes.js --dry-run
+ * From a plan: node scripts/merge-duplicate-notes.js --plan reports/note-merge-plan-<ts>.json [--dry-run]
  */
 
 import { PrismaClient } from "@prisma/client"
 import dotenv from "dotenv"
+import { readFileSync } from "fs"
 import { join } from "path"
 import { dirname } from "path"
 import { fileURLToPath } from "url"
@@ -26,6 +34,67 @@ dotenv.config({ path: join(projectRoot, ".env") })
 const prisma = new PrismaClient()
 
 const isDryRun = process.argv.includes("--dry-run")
+const planIndex = process.argv.indexOf("--plan")
+const planFile = planIndex !== -1 ? process.argv[planIndex + 1] : null
+
+// Exact duplicates: notes whose names match case-insensitively, oldest first.
+async function findExactDuplicates() {
+  // Get all notes grouped by normalized name (lowercase, trimmed)
+  const allNotes = await prisma.perfumeNotes.findMany({
+    orderBy: { createdAt: "asc" }, // Keep the oldest one
+  })
+
+  // Group by normalized name
+  const notesByName = new Map()
+  const duplicates = []
+
+  for (const note of allNotes) {
+    const normalizedName = note.name.trim().toLowerCase()
+
+    if (!notesByName.has(normalizedName)) {
+      notesByName.set(normalizedName, [note])
+    } else {
+      notesByName.get(normalizedName).push(note)
+    }
+  }
+
+  // Find groups with multiple notes (duplicates)
+  for (const [normalizedName, notes] of notesByName.entries()) {
+    if (notes.length > 1) {
+      duplicates.push({
+        normalizedName,
+        notes: notes.sort((a, b) => a.createdAt.getTime() - b.createdAt.getTime()),
+      })
+    }
+  }
+  return duplicates
+}
+
+// Plan groups: the canonical note first, then its duplicates. Notes already gone are skipped.
+async function loadPlanDuplicates(file) {
+  const plan = JSON.parse(readFileSync(file, "utf-8"))
+  const groups = plan.groups || []
+  const ids = groups.flatMap(group => [group.canonical.id, ...group.duplicates.map(d => d.id)])
+  const notes = await prisma.perfumeNotes.findMany({ where: { id: { in: ids } } })
+  const byId = new Map(notes.map(note => [note.id, note]))
+
+  const duplicates = []
+  for (const group of groups) {
+    const master = byId.get(group.canonical.id)
+    if (!master) {
+      console.log(`  ⚠️  Skipping "${group.canonical.name}": canonical note ${group.canonical.id} not found`)
+      continue
+    }
+    const others = group.duplicates.map(d => byId.get(d.id)).filter(Boolean)
+    if (others.length > 0) {
+      duplicates.push({ normalizedName: master.name, notes: [master, ...others] })
+    }
+  }
+  if (plan.review?.length) {
+    console.log(`ℹ️  ${plan.review.length} cluster(s) in the plan are marked for review and will not be merged\n`)
+  }
+  return duplicates
+}
 
 async function mergeDuplicateNotes() {
   try {
@@ -35,34 +104,9 @@ async function mergeDuplicateNotes() {
       console.log("⚠️  DRY RUN MODE - No changes will be made\n")
     }
 
-    // Get all notes grouped by normalized name (lowercase, trimmed)
-    const allNotes = await prisma.perfumeNotes.findMany({
-      orderBy: { createdAt: "asc" }, // Keep the oldest one
-    })
-
-    // Group by normalized name
-    const notesByName = new Map()
-    const duplicates = []
-
-    for (const note of allNotes) {
-      const normalizedName = note.name.trim().toLowerCase()
-      
-      if (!notesByName.has(normalizedName)) {
-        notesByName.set(normalizedName, [note])
-      } else {
-        notesByName.get(normalizedName).push(note)
-      }
-    }
-
-    // Find groups with multiple notes (duplicates)
-    for (const [normalizedName, notes] of notesByName.entries()) {
-      if (notes.length > 1) {
-        duplicates.push({
-          normalizedName,
-          notes: notes.sort((a, b) => a.createdAt.getTime() - b.createdAt.getTime()),
-        })
-      }
-    }
+    const duplicates = planFile
+      ? await loadPlanDuplicates(planFile)
+      : await findExactDuplicates()
 
     if (duplicates.length === 0) {
       console.log("✅ No duplicate notes found!")
@@ -96,7 +140,7 @@ async function mergeDuplicateNotes() {
     let errorCount = 0
 
     for (const dup of duplicates) {
-      const masterNote = dup.notes[0] // Oldest note
+      const masterNote = dup.notes[0] // Oldest note, or the plan's canonical
       const notesToMerge = dup.notes.slice(1) // All others
 
       console.log(`\n📦 Merging "${dup.normalizedName}"`)
@@ -156,10 +200,28 @@ async function mergeDuplicateNotes() {
             console.log(`        Consider reviewing these manually before migration`)
           }
 
-          // Delete the duplicate note
-          await prisma.perfumeNotes.delete({
-            where: { id: duplicateNote.id },
+          // Move the duplicate's perfume relations to the master, then delete the duplicate
+          // (its own relations go with it through the cascade)
+          const moved = await prisma.$transaction(async (tx) => {
+            const relations = await tx.perfumeNoteRelation.findMany({
+              where: { noteId: duplicateNote.id },
+            })
+            const { count } = await tx.perfumeNoteRelation.createMany({
+              data: relations.map(relation => ({
+                perfumeId: relation.perfumeId,
+                noteId: masterNote.id,
+                noteType: relation.noteType,
+              })),
+              skipDuplicates: true, // master already has this perfume/type
+            })
+            await tx.perfumeNotes.delete({
+              where: { id: duplicateNote.id },
+            })
+            return count
           })
+          if (moved > 0) {
+            console.log(`     Moved ${moved} perfume relation(s) to master`)
+          }
 
           mergedCount++
           console.log(`     ✅ Merged successfully`)
@@ -7,15 +7,24 @@ This script is called from TypeScript import scripts to standardize notes.
 
 Usage:
     python scripts/normalize-note-ai.py temp_note.json
+    python scripts/normalize-note-ai.py --serve                        # Long-lived NDJSON server on stdin/stdout
+    python scripts/normalize-note-ai.py temp_note.json --explain        # Print method/score as JSON
+    python scripts/normalize-note-ai.py temp_note.json --no-cache       # Skip the response cache
+    python scripts/normalize-note-ai.py temp_note.json --refresh-cache  # Re-ask the LLM, update cache
+    python scripts/normalize-note-ai.py --serve --structured-output    # Schema-constrained answers, strict parsing
+    python scripts/normalize-note-ai.py --serve --call-timeout 20 --hedge  # Bound and hedge slow LLM calls
+    python scripts/normalize-note-ai.py cluster --source notes.csv      # Catalog-wide duplicate merge plan
 """
 
 import os
 import re
 import sys
 import json
+import time
+import argparse
 import warnings
 from pathlib import Path
-from typing import List, TypedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, TypedDict
 from dotenv import load_dotenv
 
 # Suppress LangChain/Pydantic v1 warning on Python 3.14 (upstream compatibility)
@@ -24,34 +33,48 @@ warnings.filterwarnings("ignore", message=".*Pydantic V1.*Python 3.14.*", catego
 # Load environment variables
 load_dotenv()
 
-try:
-    from langgraph.graph import StateGraph, END
-    from langchain_openai import ChatOpenAI
-    from langchain_core.messages import HumanMessage
-except ImportError:
-    print("error", file=sys.stderr)
-    sys.exit(1)
+# LangGraph/LangChain are imported on first use (NoteNormalizationGraph.app, note_ai.backends),
+# so bad arguments and exact/alias/fuzzy matches return without loading them.
 
 # Get project root
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from note_ai.aliases import AliasStore
+from note_ai.backends import BACKENDS, LazyChatModel, prompt_messages
+from note_ai.cache import ResponseCache, prompt_version
+from note_ai.catalog import NotesCatalog
+from note_ai.clusters import (
+    DEFAULT_BANDS, DEFAULT_BAND_ROWS, DEFAULT_CLUSTER_THRESHOLD, DEFAULT_MAX_CLUSTER, CatalogClusterer, ClusterReport,
+    plan_group,
+)
+from note_ai.fuzzy import DEFAULT_THRESHOLD
+from note_ai.metrics import METRICS
+from note_ai.notes_index import ExistingNotesIndex
+from note_ai.prompts import DEFAULT_CONTEXT_TOKENS, Prompt, context_section, fit_context
+from note_ai.retrieval import merge_ranked
+from note_ai.sources import JSONL_SUFFIXES, describe_source, iter_input_notes, iter_source_notes
+from note_ai.scheduler import DEFAULT_CALL_TIMEOUT, DEFAULT_HEDGE_BUDGET, HedgePolicy, RequestScheduler, ScheduledLLM
+from note_ai.structured import compile_schema, parse_object, response_format
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 
-class NormalizeState(TypedDict):
+class NormalizeState(TypedDict, total=False):
     note: str
     existing_notes: list
+    index: ExistingNotesIndex  # prebuilt lookup over existing_notes
+    context_notes: list  # existing notes most similar to the note(s), for the prompt
     normalized: str
+    notes: list  # batch of notes → batched prompt, answers in results
+    results: list
+    structured: bool  # --structured-output: request the answer schema and parse strictly
+    cluster: list  # names of one near-duplicate cluster → canonical prompt, answer in canonical
+    canonical: Optional[dict]  # {"canonical": name, "distinct": [names]}, None if unparseable
 
 
-def _build_normalize_prompt(note: str, existing_notes: List[str]) -> str:
-    """Build the normalization prompt (same logic as original CrewAI tasks)."""
-    existing_preview = ", ".join(existing_notes[:50]) if existing_notes else "(none)"
-    return f"""You are a perfume note standardization expert. Normalize this perfume note to match database standards.
-
-Note: "{note}"
-Existing notes in database (for reference): {existing_preview}
-
-Rules:
+NORMALIZE_RULES = """Rules:
 - Prefer matching to existing notes when appropriate
 - Standardize common variations:
   * "vanilla bean", "vanilla extract" → "vanilla"
@@ -70,22 +93,61 @@ Examples:
 - "Ice Cream" → "ice cream"
 - "Jasmine Sambac" → "jasmine sambac"
 
-Return ONLY a single JSON object with this key (no markdown, no extra text):
+"""
+
+
+# Static prompt prefixes, built once; only the _build_*_prompt bodies change per call (see note_ai/prompts.py).
+NORMALIZE_PREFIX = f"""You are a perfume note standardization expert. Normalize the perfume note given below to match database standards.
+
+{NORMALIZE_RULES}Return ONLY a single JSON object with this key (no markdown, no extra text):
 {{ "normalized_note": "standardized note name" }}
 """
 
+NORMALIZE_BATCH_PREFIX = f"""You are a perfume note standardization expert. Normalize each of the perfume notes given below independently to match database standards.
+
+{NORMALIZE_RULES}
+Return ONLY a JSON array with one object per note, using the note number as "index" (no markdown, no extra text):
+[
+    {{ "index": 1, "normalized_note": "standardized note name" }}
+]
+"""
+
+CANONICAL_PREFIX = f"""You are a perfume note standardization expert. The perfume notes listed below were flagged as possible duplicates of each other. Choose the one name the others should be merged into, and list any that are really a different scent and must stay separate.
+
+{NORMALIZE_RULES}Return ONLY a single JSON object with these keys (no markdown, no extra text):
+{{ "canonical": "one of the listed names, copied exactly", "distinct": ["listed names that are a different note"] }}
+"""
+
 
-def _parse_normalize_response(text: str, fallback: str) -> str:
-    """Parse LLM response into normalized note string."""
+def _build_normalize_prompt(note: str, existing_notes: List[str]) -> Prompt:
+    """Build the normalization prompt (same logic as original CrewAI tasks)."""
+    return Prompt(NORMALIZE_PREFIX, f"""
+Note: "{note}"
+Existing notes in database (for reference): {context_section(existing_notes)}
+""")
+
+
+def _parse_normalize_response(text: str) -> Optional[str]:
+    """Parse the LLM's JSON answer into a normalized note string; None if it holds no answer."""
+    json_match = re.search(r'\{.*\}', str(text), re.DOTALL)
+    if not json_match:
+        return None
+    try:
+        data = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return None
+    normalized = data.get("normalized_note") if isinstance(data, dict) else None
+    if not isinstance(normalized, str) or not normalized.strip():
+        return None
+    return normalized.lower().strip()
+
+
+def _salvage_normalize_text(text: str, fallback: str) -> str:
+    """
+    Best effort for an answer _parse_normalize_response rejected: a bare note in free text,
+    else fallback. Only the current call uses it; it is never cached or learned.
+    """
     result_text = str(text).strip()
-    json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-    if json_match:
-        try:
-            data = json.loads(json_match.group())
-            normalized = data.get("normalized_note", fallback)
-            return normalized.lower().strip() if normalized else fallback
-        except json.JSONDecodeError:
-            pass
     result_text = re.sub(r'^normalized[_\s]*note[:\s]*', '', result_text, flags=re.IGNORECASE)
     result_text = re.sub(r'^note[:\s]*', '', result_text, flags=re.IGNORECASE)
     result_text = result_text.strip().strip('"').strip("'")
@@ -94,62 +156,737 @@ def _parse_normalize_response(text: str, fallback: str) -> str:
     return fallback
 
 
-def _normalize_node(state: NormalizeState, llm: ChatOpenAI) -> dict:
-    """LangGraph node: call LLM and parse normalized note."""
-    note = state["note"]
-    existing_notes = state.get("existing_notes") or []
+# --structured-output: the answer shape requested from the model (strict mode) and checked on return.
+NORMALIZE_SCHEMA = {
+    "type": "object",
+    "properties": {"normalized_note": {"type": "string"}},
+    "required": ["normalized_note"],
+    "additionalProperties": False,
+}
+_NORMALIZE_VALIDATOR = compile_schema(NORMALIZE_SCHEMA)
+
+
+def _parse_normalize_structured(text: str) -> Optional[str]:
+    """Strict parse of a schema-constrained answer; None if it does not match or is empty."""
+    data, _ = parse_object(text, _NORMALIZE_VALIDATOR)
+    if data is None or not data["normalized_note"].strip():
+        return None
+    return data["normalized_note"].lower().strip()
+
+
+def _build_normalize_batch_prompt(notes: List[str], existing_notes: List[str]) -> Prompt:
+    """Build one normalization prompt for several notes; the model answers with a JSON array keyed by index."""
+    numbered = "\n".join(f'{i}. "{note}"' for i, note in enumerate(notes, 1))
+    return Prompt(NORMALIZE_BATCH_PREFIX, f"""
+Notes:
+{numbered}
+Existing notes in database (for reference): {context_section(existing_notes)}
+""")
+
+
+def _parse_normalize_batch_response(text: str, count: int) -> List[Optional[str]]:
+    """
+    Parse a batch normalization response into one normalized note per input.
+
+    A slot is None when its item is missing, duplicated or not a non-empty string,
+    so the caller can retry that note individually.
+    """
+    results: List[Optional[str]] = [None] * count
+    json_match = re.search(r'\[.*\]', str(text), re.DOTALL)
+    if not json_match:
+        return results
+    try:
+        items = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return results
+    if not isinstance(items, list):
+        return results
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        if not isinstance(index, int) or isinstance(index, bool) or not 1 <= index <= count:
+            continue
+        if index in seen:
+            results[index - 1] = None
+            continue
+        seen.add(index)
+        normalized = item.get("normalized_note")
+        if isinstance(normalized, str) and normalized.strip():
+            results[index - 1] = normalized.lower().strip()
+    return results
+
+
+def _build_canonical_prompt(names: List[str]) -> Prompt:
+    """Build the prompt choosing the canonical name of one near-duplicate cluster."""
+    numbered = "\n".join(f'{i}. "{name}"' for i, name in enumerate(names, 1))
+    return Prompt(CANONICAL_PREFIX, f"""
+Names:
+{numbered}
+""")
+
+
+def _canonical_answer(data: dict, names: List[str]) -> Optional[dict]:
+    """Check a canonical answer against the cluster: the canonical must be one of the names, matched exactly or by case."""
+    by_fold = {name.strip().lower(): name for name in names}
+
+    def member(value) -> Optional[str]:
+        if not isinstance(value, str):
+            return None
+        return value if value in names else by_fold.get(value.strip().lower())
+
+    canonical = member(data.get("canonical"))
+    if canonical is None:
+        return None
+    distinct = data.get("distinct") or []
+    distinct = [m for m in map(member, distinct if isinstance(distinct, list) else []) if m and m != canonical]
+    return {"canonical": canonical, "distinct": list(dict.fromkeys(distinct))}
+
+
+def _parse_canonical_response(text: str, names: List[str]) -> Optional[dict]:
+    """Parse a canonical answer; None if it has no JSON object or names something outside the cluster."""
+    json_match = re.search(r'\{.*\}', str(text), re.DOTALL)
+    if not json_match:
+        return None
+    try:
+        data = json.loads(json_match.group())
+    except json.JSONDecodeError:
+        return None
+    return _canonical_answer(data, names) if isinstance(data, dict) else None
+
+
+CANONICAL_SCHEMA = {
+    "type": "object",
+    "properties": {"canonical": {"type": "string"}, "distinct": {"type": "array", "items": {"type": "string"}}},
+    "required": ["canonical", "distinct"],
+    "additionalProperties": False,
+}
+_CANONICAL_VALIDATOR = compile_schema(CANONICAL_SCHEMA)
+
+
+def _parse_canonical_structured(text: str, names: List[str]) -> Optional[dict]:
+    data, _ = parse_object(text, _CANONICAL_VALIDATOR)
+    return None if data is None else _canonical_answer(data, names)
+
+
+NORMALIZE_PROMPT_VERSION = prompt_version(_build_normalize_prompt("{note}", []).text)
+CANONICAL_PROMPT_VERSION = prompt_version(_build_canonical_prompt(["{name}"]).text)
+
+
+def _state_index(state: NormalizeState) -> ExistingNotesIndex:
+    index = state.get("index")
+    return index if index is not None else ExistingNotesIndex(state.get("existing_notes") or [])
+
+
+def _invoke_normalize(note: str, context_notes: List[str], llm: "ChatOpenAI",
+                      cache: Optional[ResponseCache], key: Optional[str],
+                      aliases: Optional[AliasStore] = None, structured: bool = False) -> Optional[str]:
+    """
+    Ask the LLM for one note. Only parsed answers are cached and learned. An unparsed one gives
+    the salvaged free text (or the note itself) for this call, or None with structured.
+    """
     note_lower = note.strip().lower()
-    if note_lower in [n.lower() for n in existing_notes]:
-        for existing in existing_notes:
-            if existing.lower() == note_lower:
-                return {"normalized": existing.lower()}
     try:
-        prompt = _build_normalize_prompt(note, existing_notes)
-        response = llm.invoke([HumanMessage(content=prompt)])
+        with METRICS.timer("prompt_build", "normalize"):
+            prompt = _build_normalize_prompt(note, context_notes)
+        response = _call_llm(llm, prompt, "normalize", NORMALIZE_SCHEMA if structured else None)
         content = response.content if hasattr(response, "content") else str(response)
-        normalized = _parse_normalize_response(content, note_lower)
+        with METRICS.timer("parse", "normalize"):
+            if structured:
+                normalized = _parse_normalize_structured(content)
+            else:
+                normalized = _parse_normalize_response(content)
+        METRICS.count("parse", "normalize")
+        if normalized is None:
+            METRICS.count("parse_failure", "normalize")
+            return None if structured else _salvage_normalize_text(content, note_lower)
+        if cache is not None:
+            cache.put(key, "normalize", getattr(llm, "model_name", ""), note, str(content))
+        _learn(aliases, note, normalized)
     except Exception:
+        METRICS.count("llm_error", "normalize")
         normalized = note_lower
-    return {"normalized": normalized}
+    return normalized
+
+
+def _learn(aliases: Optional[AliasStore], note: str, normalized: str):
+    """Remember an LLM normalization so later runs answer it without a call."""
+    if aliases is not None:
+        aliases.learn("normalize", note, {"normalized_note": normalized}, NORMALIZE_PROMPT_VERSION, "normalize")
+
+
+def _call_llm(llm: "ChatOpenAI", prompt: Prompt, kind: str, schema: Optional[dict] = None):
+    """
+    Invoke the model on one prompt, recording call latency and token usage under `kind`.
+
+    With a schema the answer is requested in strict structured-output mode and streamed only up
+    to the end of its JSON object.
+    """
+    with METRICS.timer("llm_call", kind):
+        if schema is None:
+            response = llm.invoke(prompt_messages(prompt))
+        else:
+            response = llm.stream_object(prompt_messages(prompt), response_format=response_format(kind, schema),
+                                         stream_usage=True)
+    METRICS.record_usage(kind, response, getattr(llm, "model_name", ""))
+    return response
+
+
+def _normalize_node(state: NormalizeState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                    aliases: Optional[AliasStore] = None) -> dict:
+    """LangGraph node: call LLM (unless cached) and parse normalized note."""
+    with METRICS.timer("node", "normalize"):
+        return _normalize_one(state, llm, cache, aliases)
+
+
+def _normalize_one(state: NormalizeState, llm: "ChatOpenAI", cache: Optional[ResponseCache],
+                   aliases: Optional[AliasStore] = None) -> dict:
+    note = state["note"]
+    existing_notes = state.get("existing_notes") or []
+    match = _state_index(state).lookup(note)
+    if match is not None:
+        return {"normalized": match}
+    key = None
+    if cache is not None:
+        key = ResponseCache.make_key(getattr(llm, "model_name", ""), "normalize", note, NORMALIZE_PROMPT_VERSION)
+        cached = cache.get(key)
+        if cached is not None and state.get("structured"):
+            # An answer cached before --structured-output that does not match the schema is a miss.
+            normalized = _parse_normalize_structured(cached)
+        else:
+            normalized = None if cached is None else _parse_normalize_response(cached)
+        if cached is not None and normalized is None:
+            cache.reject()
+        METRICS.count("cache_miss" if normalized is None else "cache_hit", "normalize")
+        if normalized is not None:
+            return {"normalized": normalized}
+    context_notes = state.get("context_notes", existing_notes)
+    return {"normalized": _invoke_normalize(note, context_notes, llm, cache, key, aliases,
+                                            bool(state.get("structured")))}
+
+
+def _normalize_batch_node(state: NormalizeState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None,
+                          aliases: Optional[AliasStore] = None) -> dict:
+    """
+    LangGraph node: normalize several notes with one batched prompt.
+
+    Index matches and cached answers are resolved first; notes whose batch item is
+    missing or malformed are retried one at a time with the normal prompt.
+    """
+    with METRICS.timer("node", "normalize_batch"):
+        return _normalize_many(state, llm, cache, aliases)
+
+
+def _normalize_many(state: NormalizeState, llm: "ChatOpenAI", cache: Optional[ResponseCache],
+                    aliases: Optional[AliasStore] = None) -> dict:
+    notes = state["notes"]
+    existing_notes = state.get("existing_notes") or []
+    context_notes = state.get("context_notes", existing_notes)
+    index = _state_index(state)
+    model = getattr(llm, "model_name", "")
+    results: List[Optional[str]] = [None] * len(notes)
+    keys: List[Optional[str]] = [None] * len(notes)
+    packed: List[int] = []
+    for i, note in enumerate(notes):
+        results[i] = index.lookup(note)
+        if results[i] is not None:
+            continue
+        if cache is not None:
+            keys[i] = ResponseCache.make_key(model, "normalize", note, NORMALIZE_PROMPT_VERSION)
+            cached = cache.get(keys[i])
+            results[i] = None if cached is None else _parse_normalize_response(cached)
+            if cached is not None and results[i] is None:
+                cache.reject()
+            METRICS.count("cache_miss" if results[i] is None else "cache_hit", "normalize")
+            if results[i] is not None:
+                continue
+        packed.append(i)
+    if len(packed) > 1:
+        try:
+            with METRICS.timer("prompt_build", "normalize_batch"):
+                prompt = _build_normalize_batch_prompt([notes[i] for i in packed], context_notes)
+            response = _call_llm(llm, prompt, "normalize_batch")
+            content = response.content if hasattr(response, "content") else str(response)
+            with METRICS.timer("parse", "normalize_batch"):
+                parsed = _parse_normalize_batch_response(content, len(packed))
+            for i, normalized in zip(packed, parsed):
+                if normalized is None:
+                    METRICS.count("parse_failure", "normalize_batch")
+                    continue
+                results[i] = normalized
+                if cache is not None:
+                    cache.put(keys[i], "normalize", model, notes[i], json.dumps({"normalized_note": normalized}))
+                _learn(aliases, notes[i], normalized)
+        except Exception:
+            METRICS.count("llm_error", "normalize_batch")
+    for i in packed:
+        if results[i] is None:
+            results[i] = _invoke_normalize(notes[i], context_notes, llm, cache, keys[i], aliases,
+                                           bool(state.get("structured")))
+    return {"results": results}
+
+
+def _canonical_node(state: NormalizeState, llm: "ChatOpenAI", cache: Optional[ResponseCache] = None) -> dict:
+    """LangGraph node: choose the canonical name of one duplicate cluster (unless cached)."""
+    with METRICS.timer("node", "canonical"):
+        names = list(state["cluster"])
+        structured = bool(state.get("structured"))
+        parse = _parse_canonical_structured if structured else _parse_canonical_response
+        model = getattr(llm, "model_name", "")
+        phrase = "\n".join(names)
+        key = None
+        if cache is not None:
+            key = ResponseCache.make_key(model, "canonical", phrase, CANONICAL_PROMPT_VERSION)
+            cached = cache.get(key)
+            answer = None if cached is None else parse(cached, names)
+            if cached is not None and answer is None:
+                cache.reject()
+            METRICS.count("cache_miss" if answer is None else "cache_hit", "canonical")
+            if answer is not None:
+                return {"canonical": answer}
+        try:
+            with METRICS.timer("prompt_build", "canonical"):
+                prompt = _build_canonical_prompt(names)
+            response = _call_llm(llm, prompt, "canonical", CANONICAL_SCHEMA if structured else None)
+            content = response.content if hasattr(response, "content") else str(response)
+            with METRICS.timer("parse", "canonical"):
+                answer = parse(content, names)
+            METRICS.count("parse", "canonical")
+        except Exception:
+            METRICS.count("llm_error", "canonical")
+            return {"canonical": None}
+        if answer is None:
+            METRICS.count("parse_failure", "canonical")
+        elif cache is not None:
+            cache.put(key, "canonical", model, phrase, str(content))
+        return {"canonical": answer}
 
 
 class NoteNormalizationGraph:
-    """LangGraph-based normalization: one node that runs the LLM and parses result."""
+    """
+    LangGraph-based normalization: a single-note node and a batched multi-note node.
+
+    A local tier runs in front of the graph: exact and alias hits from the existing-notes
+    index, then suffix-stripped and edit-distance matches scoring at least fuzzy_threshold,
+    then earlier LLM answers from the learned alias store. Only the rest reach the LLM, and
+    their answers are added to the store.
+
+    With structured_output, every request asks for a strict JSON schema and sends a single note;
+    an answer that does not match keeps the note as given, reported with method "unparseable".
+
+    choose_canonical serves the cluster subcommand: one prompt per near-duplicate cluster.
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini", cache: Optional[ResponseCache] = None,
+                 fuzzy_threshold: float = DEFAULT_THRESHOLD, scheduler: Optional[RequestScheduler] = None,
+                 backend: Optional[str] = None, aliases: Optional[AliasStore] = None,
+                 context_tokens: int = DEFAULT_CONTEXT_TOKENS, structured_output: bool = False):
+        # Retries are owned by the scheduler so they are paced and counted in one place.
+        self.scheduler = scheduler or RequestScheduler()
+        self.llm = ScheduledLLM(LazyChatModel(model, backend, self.scheduler.call_timeout), self.scheduler)
+        self.cache = cache
+        self.fuzzy_threshold = fuzzy_threshold
+        self.aliases = aliases
+        self.context_tokens = context_tokens
+        self.structured_output = structured_output
+        self._app = None
+        self._catalog: Optional[NotesCatalog] = None
+
+    @property
+    def app(self):
+        """The compiled graph, built (and LangGraph imported) only when a note needs the LLM."""
+        if self._app is None:
+            self._app = self._build_app()
+        return self._app
+
+    def _build_app(self):
+        from langgraph.graph import StateGraph, END
 
-    def __init__(self, model: str = "gpt-4o-mini"):
-        self.llm = ChatOpenAI(model=model, temperature=0.1)
         graph = StateGraph(NormalizeState)
-        graph.add_node("normalize", lambda s: _normalize_node(s, self.llm))
-        graph.set_entry_point("normalize")
+        graph.add_node("normalize", lambda s: _normalize_node(s, self.llm, self.cache, self.aliases))
+        graph.add_node("normalize_batch", lambda s: _normalize_batch_node(s, self.llm, self.cache, self.aliases))
+        graph.add_node("canonical", lambda s: _canonical_node(s, self.llm, self.cache))
+        graph.set_conditional_entry_point(
+            lambda s: "canonical" if s.get("cluster") else "normalize_batch" if s.get("notes") else "normalize")
         graph.add_edge("normalize", END)
-        self.app = graph.compile()
+        graph.add_edge("normalize_batch", END)
+        graph.add_edge("canonical", END)
+        return graph.compile()
+
+    def catalog_for(self, existing_notes: List[str]) -> NotesCatalog:
+        """Return the lookup structures for this existingNotes payload, rebuilding only when the payload changes."""
+        if self._catalog is None or existing_notes is not self._catalog.notes:
+            self._catalog = NotesCatalog(existing_notes)
+        return self._catalog
 
     def normalize_note(self, note: str, existing_notes: List[str]) -> str:
         """Normalize a note to match database standards. Returns lowercase standardized name."""
+        return self.normalize_note_scored(note, existing_notes)["normalized"]
+
+    def normalize_note_scored(self, note: str, existing_notes: List[str]) -> Dict:
+        """
+        Normalize a note and report how: {"normalized", "method", "score"}.
+
+        method is "exact", "alias", "suffix", "fuzzy", "learned", "llm" or "unparseable". For LLM answers the best
+        local candidate and its score are included as "candidate"/"candidate_score" so the
+        fuzzy threshold can be tuned.
+        """
         if not note or not note.strip():
-            return ""
+            return {"normalized": "", "method": None, "score": None}
         note_lower = note.strip().lower()
-        if note_lower in [n.lower() for n in existing_notes]:
-            for existing in existing_notes:
-                if existing.lower() == note_lower:
-                    return existing.lower()
+        catalog = self.catalog_for(existing_notes)
+        local = self._resolve_local(catalog, note)
+        if local["accepted"]:
+            return {"normalized": local["normalized"], "method": local["method"], "score": local["score"]}
+        learned = self._learned(note)
+        if learned is not None:
+            return learned
         initial: NormalizeState = {
             "note": note,
-            "existing_notes": list(existing_notes),
+            "existing_notes": existing_notes,
+            "index": catalog.index,
+            "context_notes": fit_context(catalog.retriever.top_k(note), self.context_tokens, "normalize")
+            if existing_notes else [],
             "normalized": "",
         }
+        if self.structured_output:
+            initial["structured"] = True
         final = self.app.invoke(initial)
-        return (final.get("normalized") or note_lower).strip()
+        if final.get("normalized") is None:
+            # The structured answer did not match the schema: keep the note as given.
+            return dict(self._llm_outcome(note_lower, local), method="unparseable")
+        return self._llm_outcome((final.get("normalized") or note_lower).strip(), local)
+
+    def normalize_notes(self, notes: List[str], existing_notes: List[str], batch_size: int = 20) -> List[str]:
+        """Normalize several notes, packing up to batch_size of them into each LLM request."""
+        return [r["normalized"] for r in self.normalize_notes_scored(notes, existing_notes, batch_size)]
+
+    def normalize_notes_scored(self, notes: List[str], existing_notes: List[str], batch_size: int = 20) -> List[Dict]:
+        """Batch form of normalize_note_scored; notes resolved locally never reach the prompt."""
+        results: List[Dict] = [{"normalized": "", "method": None, "score": None} for _ in notes]
+        catalog = self.catalog_for(existing_notes)
+        locals_: Dict[int, Dict] = {}
+        pending = []
+        for i, note in enumerate(notes):
+            if not note or not note.strip():
+                continue
+            local = self._resolve_local(catalog, note)
+            learned = None if local["accepted"] else self._learned(note)
+            if local["accepted"]:
+                results[i] = {"normalized": local["normalized"], "method": local["method"], "score": local["score"]}
+            elif learned is not None:
+                results[i] = learned
+            else:
+                locals_[i] = local
+                pending.append(i)
+        batch_size = 1 if self.structured_output else max(1, batch_size)
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            if len(chunk) == 1:
+                results[chunk[0]] = self.normalize_note_scored(notes[chunk[0]], existing_notes)
+                continue
+            chunk_notes = [notes[i] for i in chunk]
+            context = (fit_context(merge_ranked(catalog.retriever.top_k_many(chunk_notes)), self.context_tokens,
+                                   "normalize_batch") if existing_notes else [])
+            final = self.app.invoke({
+                "notes": chunk_notes,
+                "existing_notes": existing_notes,
+                "index": catalog.index,
+                "context_notes": context,
+                "results": [],
+            })
+            for i, normalized in zip(chunk, final.get("results") or []):
+                results[i] = self._llm_outcome((normalized or notes[i].strip().lower()).strip(), locals_[i])
+        return results
+
+    def choose_canonical(self, names: List[str]) -> Optional[Dict]:
+        """
+        Ask which of a cluster's names the others merge into: {"canonical": name, "distinct": [names]}.
+
+        distinct lists members the model judged to be different notes. None when the answer
+        could not be parsed or named something outside the cluster.
+        """
+        state: NormalizeState = {"cluster": list(names), "canonical": None}
+        if self.structured_output:
+            state["structured"] = True
+        return self.app.invoke(state).get("canonical")
+
+    def _resolve_local(self, catalog: NotesCatalog, note: str) -> Dict:
+        with METRICS.timer("local_match", "normalize"):
+            local = catalog.resolve(note, self.fuzzy_threshold)
+        METRICS.count("local_match", local["method"] if local["accepted"] else "miss")
+        return local
+
+    def _learned(self, note: str) -> Optional[Dict]:
+        if self.aliases is None:
+            return None
+        answer = self.aliases.lookup("normalize", note, NORMALIZE_PROMPT_VERSION)
+        METRICS.count("alias_miss" if answer is None else "alias_hit", "normalize")
+        if answer is None:
+            return None
+        return {"normalized": answer["normalized_note"], "method": "learned", "score": None}
+
+    @staticmethod
+    def _llm_outcome(normalized: str, local: Dict) -> Dict:
+        outcome = {"normalized": normalized, "method": "llm", "score": None}
+        if local.get("normalized") is not None:
+            outcome["candidate"] = local["normalized"]
+            outcome["candidate_score"] = local["score"]
+        return outcome
+
+
+def serve(crew: NoteNormalizationGraph, stdin=None, stdout=None, batch_size: int = 20):
+    """
+    Normalize a stream of requests with one warm graph.
+
+    Reads newline-delimited JSON requests from stdin and writes exactly one JSON line per
+    request to stdout, in order:
+        request:  {"id": 1, "note": "Rose Petals", "existingNotes": ["rose", ...]}
+        response: {"id": 1, "normalized": "rose", "method": "suffix", "score": 0.9}
+                  or {"id": 1, "error": "..."}
+    "method"/"score" (plus "candidate"/"candidate_score" for LLM answers) come from
+    normalize_note_scored. A request may carry "notes" (a list) instead of "note"; the reply
+    then has lists of normalized notes and match details in the same order, computed with
+    batched prompts of batch_size notes.
+    "id" is optional and echoed back. If "existingNotes" is omitted, the list from the
+    previous request is reused (along with its lookup index), so callers only need to send
+    the catalog once.
+    Runs until stdin is closed.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    existing_notes: List[str] = []
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        response = {}
+        try:
+            request = json.loads(line)
+            if "id" in request:
+                response["id"] = request["id"]
+            if "existingNotes" in request:
+                existing_notes = request.get("existingNotes") or []
+            note = request.get("note", "")
+            if isinstance(request.get("notes"), list):
+                notes = [str(n) for n in request["notes"]]
+                outcomes = crew.normalize_notes_scored(notes, existing_notes, batch_size)
+                response["normalized"] = [o["normalized"] for o in outcomes]
+                response["matches"] = [{k: v for k, v in o.items() if k != "normalized"} for o in outcomes]
+            elif not note or not str(note).strip():
+                response["error"] = "empty note"
+            else:
+                response.update(crew.normalize_note_scored(str(note), existing_notes))
+        except Exception as e:
+            response["error"] = str(e) or type(e).__name__
+        stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+        stdout.flush()
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """Keeps the CLI contract of printing only "error" to stderr on bad arguments."""
+
+    def error(self, message):
+        print("error", file=sys.stderr)
+        sys.exit(1)
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("error", file=sys.stderr)
+def _scheduler(args) -> RequestScheduler:
+    return RequestScheduler(call_timeout=args.call_timeout,
+                            hedge=HedgePolicy(budget=args.hedge_budget) if args.hedge else None)
+
+
+def _write_metrics(args, crew: Optional[NoteNormalizationGraph], cache: Optional[ResponseCache]):
+    """Dump METRICS to the --metrics / --prometheus paths, if given."""
+    scheduler = crew.scheduler.stats() if crew is not None else None
+    aliases = crew.aliases.stats() if crew is not None and crew.aliases is not None else None
+    if args.metrics:
+        METRICS.write_json(args.metrics, scheduler=scheduler, cache=cache.stats() if cache is not None else None,
+                           aliases=aliases)
+    if args.prometheus:
+        gauges = {}
+        if scheduler:
+            gauges = {
+                "llm_retries_total": scheduler["retries"],
+                "llm_call_timeouts_total": scheduler["call_timeouts"],
+                "llm_hedges_sent_total": scheduler.get("hedges_sent"),
+                "llm_hedges_won_total": scheduler.get("hedges_won"),
+            }
+        METRICS.write_prometheus(args.prometheus, **gauges)
+
+
+def build_merge_plan(report: ClusterReport, crew: Optional[NoteNormalizationGraph]) -> Dict:
+    """
+    Turn clusters into merge groups for scripts/merge-duplicate-notes.js --plan.
+
+    Rule clusters merge into their rule-chosen canonical. Ambiguous clusters ask crew which name
+    the others merge into, leaving out the members it calls distinct; without crew, or when the
+    answer is unusable, they go to "review" with oversized clusters and are not merged.
+    """
+    groups, review = [], []
+    for cluster in report.clusters:
+        names = [str(n["name"]) for n in cluster.notes]
+        if cluster.method == "rule":
+            canonical = cluster.notes[cluster.canonical]
+            groups.append(plan_group(canonical, [n for n in cluster.notes if n is not canonical], "rule",
+                                     cluster.score))
+            continue
+        answer = crew.choose_canonical(names) if crew is not None and cluster.method == "ambiguous" else None
+        if answer is None:
+            reason = cluster.method if crew is None or cluster.method == "oversized" else "unparseable"
+            review.append({"notes": [{"id": n["id"], "name": n["name"]} for n in cluster.notes],
+                           "reason": reason, "score": cluster.score})
+            continue
+        canonical = cluster.notes[names.index(answer["canonical"])]
+        duplicates = [n for n in cluster.notes if n is not canonical and str(n["name"]) not in answer["distinct"]]
+        if duplicates:
+            groups.append(plan_group(canonical, duplicates, "llm", cluster.score))
+    return {"groups": groups, "review": review}
+
+
+def _load_catalog(source: str) -> List[Dict]:
+    """{"id", "name"} rows of a notes table (DSN, SQLite, CSV) or of a JSON/JSONL export."""
+    if Path(source).suffix.lower() in (".json",) + JSONL_SUFFIXES:
+        rows = iter_input_notes(source)
+    else:
+        rows = iter_source_notes(source)
+    return [{"id": str(row["id"]), "name": str(row["name"])} for row in rows if row.get("name")]
+
+
+def cluster_main(argv: List[str]):
+    """`normalize-note-ai.py cluster`: find near-duplicate notes across the catalog and write a merge plan."""
+    parser = argparse.ArgumentParser(prog="normalize-note-ai.py cluster",
+                                     description="Cluster near-duplicate notes across the catalog into a merge plan")
+    parser.add_argument("--source", type=str,
+                        help="PostgreSQL DSN, SQLite file, CSV export or JSON/JSONL list of {id, name} "
+                             "(default: $DATABASE_URL)")
+    parser.add_argument("--output", type=str, help="Merge plan JSON (default: reports/note-merge-plan-<ts>.json)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CLUSTER_THRESHOLD,
+                        help="Minimum trigram cosine similarity (0-1) linking two names")
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS, help="MinHash LSH bands")
+    parser.add_argument("--band-rows", type=int, default=DEFAULT_BAND_ROWS, help="MinHash hashes per LSH band")
+    parser.add_argument("--max-cluster", type=int, default=DEFAULT_MAX_CLUSTER,
+                        help="Clusters with more notes than this go to review instead of being merged")
+    parser.add_argument("--no-llm", action="store_true",
+                        help="Do not ask the LLM about ambiguous clusters; list them for review instead")
+    parser.add_argument("--model", type=str, default="gpt-4o-mini", help="Model for ambiguous clusters")
+    parser.add_argument("--llm-backend", choices=BACKENDS,
+                        help="LLM backend (default: $NOTE_AI_LLM_BACKEND or openai); 'fake' runs offline")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Request a strict JSON schema and validate answers once")
+    parser.add_argument("--call-timeout", type=float, default=DEFAULT_CALL_TIMEOUT,
+                        help="Seconds one LLM call may take before it is abandoned and retried (0: no limit)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request when a call outlasts the observed p90 latency; first answer wins")
+    parser.add_argument("--hedge-budget", type=float, default=DEFAULT_HEDGE_BUDGET,
+                        help="With --hedge, maximum duplicate requests as a fraction of all requests")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the LLM response cache")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached responses but store fresh ones")
+    parser.add_argument("--metrics", type=str, metavar="PATH", help="Write per-stage timing/token metrics as JSON to PATH")
+    parser.add_argument("--prometheus", type=str, metavar="PATH",
+                        help="Write the same metrics in Prometheus text format to PATH")
+    args = parser.parse_args(argv)
+
+    source = args.source or os.getenv("DATABASE_URL")
+    if not source:
+        print("❌ cluster needs --source (PostgreSQL DSN, SQLite, CSV or JSON file) or DATABASE_URL")
+        sys.exit(1)
+    try:
+        notes = _load_catalog(source)
+        clusterer = CatalogClusterer(threshold=args.threshold, bands=max(1, args.bands),
+                                     band_rows=max(1, args.band_rows), max_cluster=max(2, args.max_cluster))
+    except (OSError, ValueError, RuntimeError, KeyError) as e:
+        print(f"❌ Could not load notes: {e}")
         sys.exit(1)
+    print(f"🔎 Clustering {len(notes)} notes from {describe_source(source)}")
+    report = clusterer.cluster(notes)
+    stats = report.stats
+
+    cache = None if args.no_cache or args.no_llm else ResponseCache(refresh=args.refresh_cache)
+    crew = None
+    try:
+        if not args.no_llm:
+            crew = NoteNormalizationGraph(model=args.model, cache=cache, backend=args.llm_backend,
+                                          structured_output=args.structured_output, scheduler=_scheduler(args))
+        with METRICS.timer("cluster", "llm"):
+            plan = build_merge_plan(report, crew)
+    finally:
+        _write_metrics(args, crew, cache)
+        if cache is not None:
+            cache.close()
+
+    output = Path(args.output) if args.output else (
+        project_root / "reports" / f"note-merge-plan-{time.strftime('%Y-%m-%dT%H-%M-%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "source": describe_source(source),
+                   "threshold": args.threshold, **plan, "stats": stats}, f, indent=2, ensure_ascii=False)
+
+    merged = sum(len(g["duplicates"]) for g in plan["groups"])
+    by_method = stats.get("by_method", {})
+    print(f"   {stats.get('clusters', 0)} clusters ({by_method.get('rule', 0)} by rule, "
+          f"{by_method.get('ambiguous', 0)} ambiguous, {by_method.get('oversized', 0)} oversized) "
+          f"in {stats.get('seconds', 0):.2f}s, {stats.get('candidate_pairs', 0)} candidate pairs")
+    print(f"   {len(plan['groups'])} merge groups ({merged} duplicates), {len(plan['review'])} clusters for review")
+    print(f"📄 Merge plan: {output}")
+    print(f"   Apply with: node scripts/merge-duplicate-notes.js --plan {output}")
 
-    input_file = sys.argv[1]
 
-    if not os.path.exists(input_file):
+def main():
+    if sys.argv[1:2] == ["cluster"]:
+        cluster_main(sys.argv[2:])
+        return
+    parser = _ArgumentParser(description="Normalize perfume notes with LangGraph")
+    parser.add_argument("input_file", nargs="?", help="JSON file with {note, existingNotes}")
+    parser.add_argument("--serve", action="store_true", help="Serve NDJSON requests on stdin/stdout")
+    parser.add_argument("--batch-size", type=int, default=20, help="Notes per LLM request for batch requests")
+    parser.add_argument("--context-tokens", type=int, default=DEFAULT_CONTEXT_TOKENS,
+                        help="Token budget for the existing-notes context in each prompt")
+    parser.add_argument("--structured-output", action="store_true",
+                        help="Request a strict JSON schema and validate answers once (one note per request)")
+    parser.add_argument("--call-timeout", type=float, default=DEFAULT_CALL_TIMEOUT,
+                        help="Seconds one LLM call may take before it is abandoned and retried (0: no limit)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request when a call outlasts the observed p90 latency; first answer wins")
+    parser.add_argument("--hedge-budget", type=float, default=DEFAULT_HEDGE_BUDGET,
+                        help="With --hedge, maximum duplicate requests as a fraction of all requests")
+    parser.add_argument("--fuzzy-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Minimum local match score (0-1) accepted without asking the LLM")
+    parser.add_argument("--explain", action="store_true",
+                        help="Print the match details as JSON instead of just the normalized note")
+    parser.add_argument("--llm-backend", choices=BACKENDS,
+                        help="LLM backend (default: $NOTE_AI_LLM_BACKEND or openai); 'fake' runs offline")
+    parser.add_argument("--metrics", type=str, metavar="PATH", help="Write per-stage timing/token metrics as JSON to PATH")
+    parser.add_argument("--prometheus", type=str, metavar="PATH",
+                        help="Write the same metrics in Prometheus text format to PATH")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the LLM response cache")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached responses but store fresh ones")
+    parser.add_argument("--no-aliases", action="store_true",
+                        help="Neither use nor extend the learned alias store")
+    args = parser.parse_args()
+
+    if args.serve:
+        cache = None if args.no_cache else ResponseCache(refresh=args.refresh_cache)
+        aliases = None if args.no_aliases else AliasStore()
+        crew = None
+        try:
+            crew = NoteNormalizationGraph(cache=cache, fuzzy_threshold=args.fuzzy_threshold,
+                                          backend=args.llm_backend, aliases=aliases,
+                                          context_tokens=args.context_tokens,
+                                          structured_output=args.structured_output, scheduler=_scheduler(args))
+            serve(crew, batch_size=args.batch_size)
+        finally:
+            _write_metrics(args, crew, cache)
+            if cache is not None:
+                cache.close()
+            if aliases is not None:
+                aliases.close()
+        return
+
+    input_file = args.input_file
+
+    if not input_file or not os.path.exists(input_file):
         print("error", file=sys.stderr)
         sys.exit(1)
 
@@ -164,9 +901,18 @@ def main():
             print("error", file=sys.stderr)
             sys.exit(1)
 
-        crew = NoteNormalizationGraph()
-        normalized = crew.normalize_note(note, existing_notes)
-        print(normalized)
+        cache = None if args.no_cache else ResponseCache(refresh=args.refresh_cache)
+        aliases = None if args.no_aliases else AliasStore()
+        crew = NoteNormalizationGraph(cache=cache, fuzzy_threshold=args.fuzzy_threshold,
+                                      backend=args.llm_backend, aliases=aliases, context_tokens=args.context_tokens,
+                                      structured_output=args.structured_output, scheduler=_scheduler(args))
+        outcome = crew.normalize_note_scored(note, existing_notes)
+        _write_metrics(args, crew, cache)
+        if cache is not None:
+            cache.close()
+        if aliases is not None:
+            aliases.close()
+        print(json.dumps(outcome, ensure_ascii=False) if args.explain else outcome["normalized"])
 
     except Exception:
         print("error", file=sys.stderr)
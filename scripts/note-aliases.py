@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Maintain the learned alias store used by clean-notes-ai.py and normalize-note-ai.py.
+
+Usage:
+    python scripts/note-aliases.py update                 # ingest new/changed reports/ai-note-extraction-*.json
+    python scripts/note-aliases.py update reports/ai-note-extraction-2026-01-02T10-00-00.jsonl
+    python scripts/note-aliases.py rebuild                # drop extraction entries, re-ingest every report
+    python scripts/note-aliases.py compact                # drop entries from old prompt versions, VACUUM
+    python scripts/note-aliases.py stats
+
+Only ingest reports whose recommendations you have reviewed: every extract/confirm entry is
+reused verbatim, without an LLM call, by later runs until its prompt changes. Reports are
+ingested oldest first, so a newer answer for the same phrase replaces an older one.
+Normalization entries are learned by normalize-note-ai.py itself; rebuild keeps them.
+"""
+
+import sys
+import json
+import argparse
+import importlib.util
+from pathlib import Path
+from typing import Dict, List
+
+project_root = Path(__file__).parent.parent
+scripts_dir = Path(__file__).parent
+sys.path.insert(0, str(scripts_dir))
+
+from note_ai.aliases import DEFAULT_ALIAS_PATH, AliasStore, extraction_entries
+from note_ai.results import iter_jsonl
+
+REPORT_GLOB = "ai-note-extraction-*.json"
+
+
+def _load_script(filename: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, scripts_dir / filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def current_prompt_versions() -> Dict[str, str]:
+    """Prompt version per alias kind, read from the pipeline scripts."""
+    extract = _load_script("clean-notes-ai.py", "clean_notes_ai")
+    normalize = _load_script("normalize-note-ai.py", "normalize_note_ai")
+    return {
+        "extract": extract.EXTRACT_PROMPT_VERSION,
+        "confirm": extract.CONFIRM_PROMPT_VERSION,
+        "normalize": normalize.NORMALIZE_PROMPT_VERSION,
+    }
+
+
+def _report_files(paths: List[str]) -> List[Path]:
+    if paths:
+        return [Path(p) for p in paths]
+    # Timestamped names sort chronologically; the .jsonl streams duplicate the .json reports.
+    return sorted(p for p in (project_root / "reports").glob(REPORT_GLOB) if not p.name.endswith(".metrics.json"))
+
+
+def _read_results(path: Path):
+    if path.suffix == ".jsonl":
+        return iter_jsonl(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ingest(store: AliasStore, paths: List[Path], versions: Dict[str, str], force: bool = False) -> int:
+    learned = 0
+    extraction_versions = {k: v for k, v in versions.items() if k in ("extract", "confirm")}
+    for path in paths:
+        if not force and not store.needs_ingest(path):
+            continue
+        n = store.learn_many(extraction_entries(_read_results(path), extraction_versions, path.name))
+        store.mark_ingested(path)
+        print(f"   • {path.name}: {n} entries")
+        learned += n
+    return learned
+
+
+def print_stats(store: AliasStore, versions: Dict[str, str]):
+    counts = store.counts()
+    if not counts:
+        print("   (empty)")
+    for kind, by_version in sorted(counts.items()):
+        current = by_version.get(versions.get(kind), 0)
+        stale = sum(by_version.values()) - current
+        print(f"   • {kind}: {current} current, {stale} from older prompt versions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and maintain the learned note alias store")
+    parser.add_argument("command", choices=("update", "rebuild", "compact", "stats"))
+    parser.add_argument("reports", nargs="*", help="Extraction reports (.json or .jsonl); default: reports/" + REPORT_GLOB)
+    parser.add_argument("--store", type=str, default=str(DEFAULT_ALIAS_PATH), help="Alias store path")
+    args = parser.parse_args()
+
+    reports = _report_files(args.reports)
+    missing = [p for p in reports if not p.exists()]
+    if missing:
+        print(f"❌ Report not found: {missing[0]}")
+        sys.exit(1)
+
+    versions = current_prompt_versions()
+    store = AliasStore(Path(args.store))
+    try:
+        if args.command == "rebuild":
+            store.clear(kinds=("extract", "confirm"))
+        if args.command in ("update", "rebuild"):
+            print(f"📥 Ingesting reports into {args.store}")
+            learned = ingest(store, reports, versions, force=args.command == "rebuild")
+            print(f"✅ {learned} entries learned")
+        elif args.command == "compact":
+            removed = store.compact(versions)
+            print(f"🧹 Removed {removed} stale entries from {args.store}")
+        print("\n📊 Alias store:")
+        print_stats(store, versions)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
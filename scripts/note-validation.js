@@ -1,6 +1,7 @@
 /**
  * Single source of truth for "is this a valid scent note for display?"
  * Used by: clean-notes.js (cleanup), app (getAllTags / scent quiz) so only confirmed notes are shown.
+ * Mirrored in scripts/note_ai/rules.py for the Python AI scripts; keep the lists in sync.
  *
  * Stopwords apply only to exact single-word matches. Multi-word notes are valid, e.g.:
  * cut grass, hot cocoa, gray musk, cold steel, old makeup, hot melted wax, grey iris.
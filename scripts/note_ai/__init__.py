@@ -0,0 +1,5 @@
+"""
+Shared helpers for the LangGraph note scripts (clean-notes-ai.py, normalize-note-ai.py).
+
+The scripts have hyphenated file names, so anything both of them need lives here.
+"""
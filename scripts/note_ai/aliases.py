@@ -0,0 +1,191 @@
+"""
+Learned alias store: answers the pipelines already produced, reused before any LLM call.
+
+Entries map (prompt kind, canonical phrase) to a settled answer:
+- "extract" / "confirm": the extraction result ({"extracted_notes", "should_delete", "reasoning"}),
+  ingested from reviewed reports/ai-note-extraction-*.json(l) files by scripts/note-aliases.py,
+- "normalize": {"normalized_note"}, learned by normalize-note-ai.py as the LLM answers.
+
+Every entry records the prompt version it was produced under; lookups only return entries
+whose version matches the current prompt, so editing a prompt retires its answers, and
+`compact` deletes them. Phrases are keyed by dedup.canonical_phrase, so "Rose." and "rose"
+share an entry. Unlike the response cache, entries do not depend on the model.
+
+Storage is a SQLite file opened with a memory-mapped read path; lookups are one primary-key
+probe and need neither LangChain nor the network.
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from .cache import project_root
+from .dedup import canonical_phrase
+
+DEFAULT_ALIAS_PATH = project_root / ".cache" / "note-ai" / "learned-aliases.sqlite3"
+ALIAS_KINDS = ("extract", "confirm", "normalize")
+MMAP_BYTES = 256 * 1024 * 1024
+ANSWER_FIELDS = ("extracted_notes", "should_delete", "reasoning")
+
+
+def extraction_entries(results: Iterable[Dict], prompt_versions: Dict[str, str],
+                       origin: str) -> Iterator[Tuple[str, str, Dict, str, str]]:
+    """
+    learn_many() entries for the reusable answers in an extraction results stream.
+
+    Only parsed LLM answers carry a prompt_version; rule and alias results, failures and
+    dedup copies (duplicate_of) are skipped. The prompt kind is recovered from the version.
+    """
+    kinds = {version: kind for kind, version in prompt_versions.items()}
+    for r in results:
+        kind = kinds.get(r.get("prompt_version"))
+        phrase = r.get("original_phrase")
+        if kind is None or not phrase or r.get("source") or r.get("status") == "error" or r.get("duplicate_of"):
+            continue
+        yield kind, phrase, {k: r.get(k) for k in ANSWER_FIELDS}, r["prompt_version"], origin
+
+
+class AliasStore:
+    """SQLite-backed (kind, canonical phrase) -> answer map with per-entry prompt versions."""
+
+    def __init__(self, path: Path = DEFAULT_ALIAS_PATH):
+        """Configure the store; the file is opened (and created) on first use."""
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use; the caller holds the lock."""
+        if self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size = {MMAP_BYTES}")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS aliases (
+                kind TEXT NOT NULL,
+                phrase TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, phrase)
+            ) WITHOUT ROWID"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingested (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        return self._conn
+
+    def lookup(self, kind: str, phrase: str, prompt_version: str) -> Optional[Dict]:
+        """The learned answer for phrase under the current prompt version, or None (a miss)."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT answer, prompt_version FROM aliases WHERE kind = ? AND phrase = ?",
+                (kind, canonical_phrase(phrase)),
+            ).fetchone()
+            if row is None or row[1] != prompt_version:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def learn(self, kind: str, phrase: str, answer: Dict, prompt_version: str, origin: str):
+        """Store (or replace) the answer for phrase; origin names where it came from."""
+        self.learn_many([(kind, phrase, answer, prompt_version, origin)])
+
+    def learn_many(self, entries: Iterable[Tuple[str, str, Dict, str, str]]) -> int:
+        """learn() for (kind, phrase, answer, prompt_version, origin) tuples in one transaction."""
+        now = time.time()
+        rows = [
+            (kind, canonical_phrase(phrase), json.dumps(answer, ensure_ascii=False), version, origin, now)
+            for kind, phrase, answer, version, origin in entries
+            if canonical_phrase(phrase)
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO aliases (kind, phrase, answer, prompt_version, origin, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            self.writes += len(rows)
+        return len(rows)
+
+    def needs_ingest(self, path: Path) -> bool:
+        """True if path was never ingested or has changed since."""
+        stat = Path(path).stat()
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT size, mtime FROM ingested WHERE path = ?", (str(path),)
+            ).fetchone()
+        return row is None or row[0] != stat.st_size or row[1] != stat.st_mtime
+
+    def mark_ingested(self, path: Path):
+        stat = Path(path).stat()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO ingested (path, size, mtime) VALUES (?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime),
+            )
+            conn.commit()
+
+    def clear(self, kinds: Iterable[str] = ALIAS_KINDS):
+        """Drop the entries of `kinds` and the record of ingested report files."""
+        kinds = tuple(kinds)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(f"DELETE FROM aliases WHERE kind IN ({','.join('?' * len(kinds))})", kinds)
+            conn.execute("DELETE FROM ingested")
+            conn.commit()
+
+    def compact(self, prompt_versions: Dict[str, str]) -> int:
+        """Delete entries of unknown kinds or stale prompt versions, then VACUUM; returns rows removed."""
+        with self._lock:
+            conn = self._connection()
+            removed = conn.execute(
+                f"DELETE FROM aliases WHERE kind NOT IN ({','.join('?' * len(prompt_versions))})",
+                tuple(prompt_versions),
+            ).rowcount
+            for kind, version in prompt_versions.items():
+                removed += conn.execute(
+                    "DELETE FROM aliases WHERE kind = ? AND prompt_version != ?", (kind, version)
+                ).rowcount
+            conn.commit()
+            conn.execute("VACUUM")
+        return removed
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Entries per kind, split by prompt version."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT kind, prompt_version, COUNT(*) FROM aliases GROUP BY kind, prompt_version"
+            ).fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, version, n in rows:
+            counts.setdefault(kind, {})[version] = n
+        return counts
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,449 @@
+"""
+Batched writes of extraction results to the notes database (clean-notes-ai.py --apply).
+
+Applies the same changes as scripts/apply-ai-recommendations.js, in the same process that
+produced the results and without per-note round trips:
+- extract results (extracted_notes, not should_delete): each extracted note is matched to an
+  existing note by exact name, then by duplicate_key() (normalizeForDuplicateDetection() in
+  scripts/note-utils.js), else created; the phrase note's relations are relinked to every target
+  (skipping ones the target already has) and the phrase note is deleted;
+- delete results (should_delete, no extracted_notes): the note and its relations are deleted.
+All extract results are applied before any delete result, as the JS script does. A phrase with no
+note of exactly that name is skipped, so rerunning over the same results after a failure picks
+up where it stopped. Results without a parsed answer (RETRY_STATUSES rows, and the default-mode
+parse fallbacks, which say should_delete) are never applied; they are counted as "unanswered".
+
+Note names and ids are read once up front; after that each batch of up to batch_size results is
+one transaction of a few set-based statements: one executemany insert of new notes (ON CONFLICT
+(name) DO NOTHING, then their ids are read back), one select of the relations involved, one
+executemany insert of relinked relations and one delete each of old relations and notes. A
+result whose notes overlap an earlier result's in the same batch (A -> B, then B -> C) starts a
+new batch, so every batch reads the relations its results left behind.
+
+The target is a PostgreSQL DSN (psycopg or psycopg2, as for --source; Prisma's ?schema= is
+honoured) or a SQLite file with the same two tables as a local stand-in. With dry_run nothing
+is written and each change goes to the diff instead; relation counts are read from the database
+as it stands.
+"""
+
+import re
+import time
+import uuid
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from .metrics import METRICS
+from .results import is_unanswered
+from .sources import (
+    NOTES_TABLE, SQLITE_SUFFIXES, _connect_postgres, _split_prisma_schema, describe_source, is_postgres_dsn,
+    postgres_driver,
+)
+
+DEFAULT_APPLY_BATCH = 500
+RELATIONS_TABLE = "PerfumeNoteRelation"
+NOTE_TYPE_ENUM = "PerfumeNoteType"
+
+# Ids per IN (...) list: well under SQLite's and PostgreSQL's bind-parameter limits.
+_IN_CHUNK = 500
+
+
+def duplicate_key(name: str) -> str:
+    """normalizeForDuplicateDetection() in scripts/note-utils.js: trimmed, lowercased, whitespace runs as "-"."""
+    return re.sub(r"\s+", "-", name.strip().lower())
+
+
+def new_id() -> str:
+    """Id for an inserted row, cuid-shaped; Prisma only fills @default(cuid()) for its own writes."""
+    return "c" + uuid.uuid4().hex[:24]
+
+
+def _phrase(result: Dict) -> str:
+    return result.get("original_phrase") or result.get("name") or ""
+
+
+def _note_names(value) -> List[str]:
+    notes = value if isinstance(value, list) else [value]
+    return [str(n).strip() for n in notes if n and str(n).strip()]
+
+
+def is_extract_action(result: Dict) -> bool:
+    return (not is_unanswered(result) and not result.get("should_delete")
+            and bool(_note_names(result.get("extracted_notes"))))
+
+
+def is_delete_action(result: Dict) -> bool:
+    return not is_unanswered(result) and bool(result.get("should_delete")) and not result.get("extracted_notes")
+
+
+def check_target(target: str) -> str:
+    """
+    Raise if `target` cannot be applied to (without connecting); returns it for log output.
+
+    For a DSN this imports the PostgreSQL driver, so a missing psycopg fails before the run
+    rather than after it.
+    """
+    if is_postgres_dsn(target):
+        postgres_driver()
+        return describe_source(target)
+    if Path(target).suffix.lower() not in SQLITE_SUFFIXES:
+        raise ValueError(
+            f"Unsupported apply target {target!r}; expected a postgres:// DSN or a "
+            f"{'/'.join(SQLITE_SUFFIXES)} file"
+        )
+    if not Path(target).exists():
+        raise FileNotFoundError(f"SQLite database not found: {target}")
+    return target
+
+
+class _Database:
+    """A PostgreSQL or SQLite connection plus the dialect bits the statements differ in."""
+
+    def __init__(self, target: str):
+        check_target(target)
+        if is_postgres_dsn(target):
+            dsn, schema = _split_prisma_schema(target)
+            self.conn = _connect_postgres(dsn)
+            self.param = "%s"
+            prefix = f'"{schema}".'
+            self.note_type = f'::{prefix}"{NOTE_TYPE_ENUM}"'
+        else:
+            self.conn = sqlite3.connect(target)
+            self.param = "?"
+            prefix = ""
+            self.note_type = ""
+        self.notes = f'{prefix}"{NOTES_TABLE}"'
+        self.relations = f'{prefix}"{RELATIONS_TABLE}"'
+
+    def params(self, n: int) -> str:
+        return ", ".join([self.param] * n)
+
+    def _run(self, sql: str, params: Sequence = (), many: bool = False, fetch: bool = False):
+        cur = self.conn.cursor()
+        try:
+            if many:
+                cur.executemany(sql, params)
+            else:
+                cur.execute(sql, params)
+            return cur.fetchall() if fetch else cur.rowcount
+        finally:
+            cur.close()
+
+    def query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        return self._run(sql, params, fetch=True)
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        return self._run(sql, params)
+
+    def executemany(self, sql: str, rows: List[tuple]):
+        if rows:
+            self._run(sql, rows, many=True)
+
+    def query_in(self, sql: str, ids: List[str]) -> List[tuple]:
+        """Run `sql` (one "{ids}" placeholder list) over `ids` in chunks; rows concatenated."""
+        rows = []
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            rows += self.query(sql.format(ids=self.params(len(chunk))), chunk)
+        return rows
+
+    def execute_in(self, sql: str, ids: List[str]) -> int:
+        count = 0
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            count += self.execute(sql.format(ids=self.params(len(chunk))), chunk)
+        return count
+
+    def close(self):
+        self.conn.close()
+
+
+class _Batch:
+    def __init__(self):
+        self.actions: List[Tuple[str, str, List[str]]] = []  # (phrase, source id, target ids)
+        self.new_notes: List[Tuple[str, str]] = []  # (id, name)
+        self.sources = set()
+        self.targets = set()
+
+
+class NoteApplier:
+    """
+    Applies extraction results to a notes database in batched transactions.
+
+    Connects on construction, so a bad target fails before anything is read. apply() goes over
+    `results` twice (extract results, then delete results), so it needs a list or JsonlResults.
+    """
+
+    def __init__(self, target: str, batch_size: int = DEFAULT_APPLY_BATCH, dry_run: bool = False,
+                 diff: Optional[TextIO] = None):
+        self.target = describe_source(target)
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+        self.diff = diff
+        self.db = _Database(target)
+        self._by_name: Dict[str, str] = {}
+        self._by_key: Dict[str, List[str]] = {}
+        self._names: Dict[str, str] = {}
+        self._batch = _Batch()
+        self.counts = dict.fromkeys(
+            ("extracted", "deleted", "notes_created", "relations_added", "relations_removed",
+             "missing", "skipped", "unanswered", "batches", "transactions"), 0
+        )
+        self.seconds = 0.0
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- name index ---------------------------------------------------------------------------
+
+    def _load_index(self):
+        with METRICS.timer("apply", "index"):
+            for note_id, name in self.db.query(f"SELECT id, name FROM {self.db.notes} ORDER BY id"):
+                self._add(note_id, name)
+
+    def _add(self, note_id: str, name: str):
+        self._names[note_id] = name
+        self._by_name.setdefault(name, note_id)
+        self._by_key.setdefault(duplicate_key(name), []).append(note_id)
+
+    def _remove(self, note_id: str):
+        name = self._names.pop(note_id)
+        if self._by_name.get(name) == note_id:
+            del self._by_name[name]
+        ids = self._by_key[duplicate_key(name)]
+        ids.remove(note_id)
+        if not ids:
+            del self._by_key[duplicate_key(name)]
+
+    def _lookup(self, name: str) -> Optional[str]:
+        """Exact name first, then the first note with the same duplicate_key (as findNoteByNormalizedMatch)."""
+        found = self._by_name.get(name)
+        if found is None:
+            ids = self._by_key.get(duplicate_key(name))
+            found = ids[0] if ids else None
+        return found
+
+    # --- planning -----------------------------------------------------------------------------
+
+    def _plan_extract(self, result: Dict):
+        phrase = _phrase(result)
+        source = self._by_name.get(phrase)
+        if source is None:
+            self.counts["missing"] += 1
+            return
+        names = _note_names(result.get("extracted_notes"))
+        found = [self._lookup(name) for name in names]
+        if source in found:
+            # Relinking a note to itself and then deleting it would drop its relations.
+            self.counts["skipped"] += 1
+            return
+        existing = {t for t in found if t is not None}
+        batch = self._batch
+        if (source in batch.targets or existing & batch.sources
+                or len(batch.actions) >= self.batch_size):
+            self._flush_extracts()
+            batch = self._batch
+        targets = []
+        for name, target in zip(names, found):
+            if target is None:
+                # Looked up again: an earlier name of this result may have just created it.
+                target = self._lookup(name)
+            if target is None:
+                target = new_id()
+                self._add(target, name)
+                batch.new_notes.append((target, name))
+            if target not in targets:
+                targets.append(target)
+        self._remove(source)
+        batch.actions.append((phrase, source, targets))
+        batch.sources.add(source)
+        batch.targets.update(targets)
+
+    # --- writing ------------------------------------------------------------------------------
+
+    def _commit(self):
+        if not self.dry_run:
+            self.db.conn.commit()
+            self.counts["transactions"] += 1
+        self.counts["batches"] += 1
+
+    def _insert_notes(self, batch: _Batch):
+        """Insert the batch's new notes; targets are re-pointed at any row that already had the name."""
+        db = self.db
+        db.executemany(
+            f"INSERT INTO {db.notes} (id, name) VALUES ({db.params(2)}) ON CONFLICT (name) DO NOTHING",
+            batch.new_notes,
+        )
+        actual = dict(db.query_in(f"SELECT name, id FROM {db.notes} WHERE name IN ({{ids}})",
+                                  [name for _, name in batch.new_notes]))
+        moved = {}
+        for note_id, name in batch.new_notes:
+            if actual.get(name) == note_id:
+                self.counts["notes_created"] += 1
+            elif name in actual:
+                moved[note_id] = actual[name]
+                self._remove(note_id)
+                self._add(actual[name], name)
+        if moved:
+            batch.actions = [(p, s, [moved.get(t, t) for t in ts]) for p, s, ts in batch.actions]
+            batch.targets = {moved.get(t, t) for t in batch.targets}
+            batch.new_notes = [(i, n) for i, n in batch.new_notes if i not in moved]
+
+    def _flush_extracts(self):
+        batch, self._batch = self._batch, _Batch()
+        if not batch.actions:
+            return
+        db = self.db
+        try:
+            with METRICS.timer("apply", "extract"):
+                if batch.new_notes and not self.dry_run:
+                    self._insert_notes(batch)
+                elif batch.new_notes:
+                    self.counts["notes_created"] += len(batch.new_notes)
+                new = {note_id for note_id, _ in batch.new_notes}
+                involved = list(batch.sources | {t for t in batch.targets if t not in new})
+                relations = db.query_in(
+                    f'SELECT "noteId", "perfumeId", "noteType" FROM {db.relations} WHERE "noteId" IN ({{ids}})',
+                    involved,
+                )
+                linked = {(perfume, note, note_type) for note, perfume, note_type in relations}
+                by_source: Dict[str, List[tuple]] = {}
+                for note, perfume, note_type in relations:
+                    if note in batch.sources:
+                        by_source.setdefault(note, []).append((perfume, note_type))
+                added = []
+                for phrase, source, targets in batch.actions:
+                    before = len(added)
+                    for perfume, note_type in by_source.get(source, ()):
+                        for target in targets:
+                            if (perfume, target, note_type) not in linked:
+                                linked.add((perfume, target, note_type))
+                                added.append((new_id(), perfume, target, note_type))
+                    self._write_extract_diff(phrase, source, targets, new, by_source, len(added) - before)
+                sources = list(batch.sources)
+                removed = sum(len(by_source.get(s, ())) for s in sources)
+                if not self.dry_run:
+                    db.executemany(
+                        f'INSERT INTO {db.relations} (id, "perfumeId", "noteId", "noteType") '
+                        f"VALUES ({db.param}, {db.param}, {db.param}, {db.param}{db.note_type}) "
+                        f'ON CONFLICT ("perfumeId", "noteId", "noteType") DO NOTHING',
+                        added,
+                    )
+                    removed = db.execute_in(f'DELETE FROM {db.relations} WHERE "noteId" IN ({{ids}})', sources)
+                    db.execute_in(f"DELETE FROM {db.notes} WHERE id IN ({{ids}})", sources)
+                self._commit()
+        except Exception as e:
+            if not self.dry_run:
+                db.conn.rollback()
+            raise RuntimeError(f"Batch {self.counts['batches'] + 1} failed and was rolled back: {e}") from e
+        self.counts["extracted"] += len(batch.actions)
+        self.counts["relations_added"] += len(added)
+        self.counts["relations_removed"] += removed
+
+    def _flush_deletes(self, batch: List[Tuple[str, str]]):
+        if not batch:
+            return
+        db = self.db
+        ids = [note_id for _, note_id in batch]
+        try:
+            with METRICS.timer("apply", "delete"):
+                if self.dry_run:
+                    counts = dict(db.query_in(
+                        f'SELECT "noteId", COUNT(*) FROM {db.relations} WHERE "noteId" IN ({{ids}}) GROUP BY "noteId"',
+                        ids,
+                    ))
+                    for phrase, note_id in batch:
+                        self._write_diff(f'- {NOTES_TABLE} "{phrase}" ({counts.get(note_id, 0)} relations)')
+                    removed = sum(counts.values())
+                else:
+                    # Explicit rather than relying on ON DELETE CASCADE, which a SQLite stand-in may lack.
+                    removed = db.execute_in(f'DELETE FROM {db.relations} WHERE "noteId" IN ({{ids}})', ids)
+                    db.execute_in(f"DELETE FROM {db.notes} WHERE id IN ({{ids}})", ids)
+                self._commit()
+        except Exception as e:
+            if not self.dry_run:
+                db.conn.rollback()
+            raise RuntimeError(f"Batch {self.counts['batches'] + 1} failed and was rolled back: {e}") from e
+        self.counts["deleted"] += len(batch)
+        self.counts["relations_removed"] += removed
+
+    # --- diff ---------------------------------------------------------------------------------
+
+    def _write_diff(self, line: str):
+        if self.diff is not None:
+            self.diff.write(line + "\n")
+
+    def _write_extract_diff(self, phrase: str, source: str, targets: List[str], new: set,
+                            by_source: Dict[str, List[tuple]], added: int):
+        if self.diff is None:
+            return
+        self._write_diff(f'- {NOTES_TABLE} "{phrase}" ({len(by_source.get(source, ()))} relations)')
+        for target in targets:
+            if target in new:
+                self._write_diff(f'+ {NOTES_TABLE} "{self._names[target]}"')
+        names = ", ".join(f'"{self._names[t]}"' for t in targets)
+        self._write_diff(f"~ {RELATIONS_TABLE} {added} added: \"{phrase}\" -> {names}")
+
+    # --- entry point --------------------------------------------------------------------------
+
+    def apply(self, results: Iterable[Dict]) -> Dict:
+        """Apply every extract result, then every delete result; returns stats()."""
+        started = time.perf_counter()
+        try:
+            self._load_index()
+            for result in results:
+                if is_unanswered(result):
+                    self.counts["unanswered"] += 1
+                elif is_extract_action(result):
+                    self._plan_extract(result)
+            self._flush_extracts()
+            deletes = []
+            for result in results:
+                if not is_delete_action(result):
+                    continue
+                phrase = _phrase(result)
+                note_id = self._by_name.get(phrase)
+                if note_id is None:
+                    self.counts["missing"] += 1
+                    continue
+                self._remove(note_id)
+                deletes.append((phrase, note_id))
+                if len(deletes) >= self.batch_size:
+                    self._flush_deletes(deletes)
+                    deletes = []
+            self._flush_deletes(deletes)
+        finally:
+            self.seconds += time.perf_counter() - started
+        return self.stats()
+
+    @property
+    def rows_written(self) -> int:
+        """Rows inserted or deleted (would be, for a dry run)."""
+        c = self.counts
+        return (c["notes_created"] + c["relations_added"] + c["relations_removed"]
+                + c["extracted"] + c["deleted"])
+
+    def stats(self) -> Dict:
+        rows = self.rows_written
+        return {
+            "target": self.target,
+            "dry_run": self.dry_run,
+            "batch_size": self.batch_size,
+            **self.counts,
+            "rows_written": rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(rows / self.seconds, 1) if self.seconds > 0 else None,
+        }
+
+    def duplicate_groups(self) -> List[List[str]]:
+        """
+        Names sharing one duplicate_key() in the table as applied (or, in dry run, as it would be):
+        the post-apply check of apply-ai-recommendations.js, answered from the in-memory index.
+        """
+        return [sorted(self._names[i] for i in ids) for ids in self._by_key.values() if len(ids) > 1]
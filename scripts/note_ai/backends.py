@@ -0,0 +1,111 @@
+"""
+Chat model selection for the note pipelines.
+
+The backend comes from --llm-backend or NOTE_AI_LLM_BACKEND:
+- "openai" (default): ChatOpenAI, with client-side retries off (RequestScheduler owns them) and
+  the scheduler's per-call timeout as the HTTP timeout, so abandoned requests are closed.
+- "fake": FakeChatModel, configured by NOTE_AI_FAKE_LATENCY, NOTE_AI_FAKE_FAULTS,
+  NOTE_AI_FAKE_SEED, NOTE_AI_FAKE_REPLAY, NOTE_AI_FAKE_RETRY_AFTER,
+  NOTE_AI_FAKE_PREFIX_CACHE_MIN and NOTE_AI_FAKE_STALL_SECONDS (see fake_llm.py for the spec formats).
+
+Setting NOTE_AI_LLM_RECORD to a path appends every real prompt/response pair to it, for
+later replay through the fake backend.
+
+LangChain and LangGraph are only imported once a graph or model is actually used, so
+invocations that finish on validation or a local match start without loading them.
+"""
+
+import os
+import importlib.util
+from typing import List, Optional, Union
+
+from .prompts import Prompt
+
+BACKENDS = ("openai", "fake")
+BACKEND_ENV = "NOTE_AI_LLM_BACKEND"
+
+
+def backend_name(backend: Optional[str] = None) -> str:
+    name = backend or os.getenv(BACKEND_ENV) or "openai"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return name
+
+
+def create_chat_model(model: str, backend: Optional[str] = None, timeout: Optional[float] = None):
+    """Build the chat model for `backend` (flag value, else environment, else "openai")."""
+    if backend_name(backend) == "fake":
+        from .fake_llm import FakeChatModel
+
+        return FakeChatModel(
+            model_name=model,
+            latency=os.getenv("NOTE_AI_FAKE_LATENCY", "none"),
+            faults=os.getenv("NOTE_AI_FAKE_FAULTS", ""),
+            seed=int(os.getenv("NOTE_AI_FAKE_SEED", "0")),
+            replay=os.getenv("NOTE_AI_FAKE_REPLAY") or None,
+            retry_after=float(os.getenv("NOTE_AI_FAKE_RETRY_AFTER", "0.05")),
+            prefix_cache_min_tokens=int(os.getenv("NOTE_AI_FAKE_PREFIX_CACHE_MIN", "1024")),
+            stall_seconds=float(os.getenv("NOTE_AI_FAKE_STALL_SECONDS", "30")),
+        )
+    from langchain_openai import ChatOpenAI
+
+    llm = ChatOpenAI(model=model, temperature=0.1, max_retries=0, timeout=timeout)
+    record = os.getenv("NOTE_AI_LLM_RECORD")
+    if record:
+        from .fake_llm import RecordingChatModel
+
+        llm = RecordingChatModel(llm, record)
+    return llm
+
+
+def missing_dependency(backend: Optional[str] = None) -> Optional[str]:
+    """First LLM-stack module that is not installed for `backend`, or None; nothing is imported."""
+    modules = ["langgraph", "langchain_core"]
+    if backend_name(backend) == "openai":
+        modules.append("langchain_openai")
+    for module in modules:
+        if importlib.util.find_spec(module) is None:
+            return module
+    return None
+
+
+def prompt_messages(prompt: Union[str, Prompt]) -> List:
+    """Chat messages for one call: a Prompt's static prefix as the system message, its body as the user message."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    if isinstance(prompt, Prompt):
+        return [SystemMessage(content=prompt.prefix), HumanMessage(content=prompt.body)]
+    return [HumanMessage(content=prompt)]
+
+
+class LazyChatModel:
+    """Chat model proxy that builds the real model on first call; model_name is known up front."""
+
+    def __init__(self, model: str, backend: Optional[str] = None, timeout: Optional[float] = None):
+        self.model_name = model
+        self.backend = backend
+        self.timeout = timeout
+        self._llm = None
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = create_chat_model(self.model_name, self.backend, self.timeout)
+        return self._llm
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def invoke(self, messages, **kwargs):
+        return self.llm.invoke(messages, **kwargs)
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.llm.ainvoke(messages, **kwargs)
+
+    def stream(self, messages, **kwargs):
+        return self.llm.stream(messages, **kwargs)
+
+    def astream(self, messages, **kwargs):
+        return self.llm.astream(messages, **kwargs)
@@ -0,0 +1,148 @@
+"""
+Persistent LLM response cache shared by the note extraction and normalization graphs.
+
+Entries are content-addressed: the key is a hash of the model, the prompt kind
+(extract / confirm / normalize), the normalized phrase and the prompt-template version.
+Changing a prompt template changes its version hash, so stale answers are never reused.
+Callers parse what get() returns and reject() entries they cannot use, so the hit/miss counts
+reflect answers actually reused. Storage is a local SQLite file with age and size eviction.
+"""
+
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+
+project_root = Path(__file__).resolve().parent.parent.parent
+
+DEFAULT_CACHE_PATH = project_root / ".cache" / "note-ai" / "llm-responses.sqlite3"
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+def normalize_phrase(phrase: str) -> str:
+    """Case- and whitespace-fold a phrase for use in cache keys."""
+    return " ".join(str(phrase).lower().split())
+
+
+def prompt_version(template: str) -> str:
+    """Short, stable hash of a rendered prompt template."""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """SQLite-backed cache of raw LLM response text."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        refresh: bool = False,
+    ):
+        """
+        Configure the cache; the file is opened (created, and expired entries evicted) on first use.
+
+        With refresh=True every lookup is a miss but new responses are still stored,
+        which overwrites the old entries.
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use; the caller holds the lock."""
+        if self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                model TEXT NOT NULL,
+                phrase TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)")
+        self._conn.commit()
+        self._evict(self._conn)
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, kind: str, phrase: str, template_version: str) -> str:
+        raw = "\x1f".join([model, kind, normalize_phrase(phrase), template_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response text for key, or None (counted as a miss)."""
+        if self.refresh:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            return row[0]
+
+    def reject(self):
+        """Recount the last hit as a miss: its text did not parse, so the caller asks the LLM again."""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+
+    def put(self, key: str, kind: str, model: str, phrase: str, response: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, model, phrase, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, normalize_phrase(phrase), response, now, now),
+            )
+            conn.commit()
+            self.writes += 1
+
+    def evict(self) -> int:
+        """Drop entries older than max_age, then least-recently-used entries above max_entries."""
+        with self._lock:
+            return self._evict(self._connection())
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        cutoff = time.time() - self.max_age_seconds
+        removed = conn.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,)).rowcount
+        count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            removed += conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            ).rowcount
+        conn.commit()
+        return removed
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,60 @@
+"""
+Lookup structures for one existing-notes payload, built lazily and shared across calls.
+"""
+
+from typing import Dict, List, Optional
+
+from .fuzzy import DEFAULT_THRESHOLD, FuzzyMatcher
+from .notes_index import ExistingNotesIndex
+from .retrieval import NoteRetriever
+
+
+class NotesCatalog:
+    """Exact/alias index, similarity retriever and fuzzy matcher over one list of existing notes."""
+
+    def __init__(self, existing_notes: List[str]):
+        self.notes = existing_notes
+        self._index: Optional[ExistingNotesIndex] = None
+        self._retriever: Optional[NoteRetriever] = None
+        self._fuzzy: Optional[FuzzyMatcher] = None
+
+    @property
+    def index(self) -> ExistingNotesIndex:
+        if self._index is None:
+            self._index = ExistingNotesIndex(self.notes)
+        return self._index
+
+    @property
+    def retriever(self) -> NoteRetriever:
+        if self._retriever is None:
+            self._retriever = NoteRetriever(self.notes)
+        return self._retriever
+
+    @property
+    def fuzzy(self) -> FuzzyMatcher:
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyMatcher(self.index, self.retriever)
+        return self._fuzzy
+
+    def resolve(self, note: str, threshold: float = DEFAULT_THRESHOLD) -> Dict:
+        """
+        Local normalization attempt. Always returns a dict with the best candidate and its score;
+        "accepted" says whether it clears the threshold (exact and alias hits always do).
+        """
+        found = self.index.lookup_exact(note)
+        if found is not None:
+            return {"normalized": found, "score": 1.0, "method": "exact", "accepted": True}
+        found = self.index.lookup(note)
+        if found is not None:
+            return {"normalized": found, "score": 1.0, "method": "alias", "accepted": True}
+        if not self.notes:
+            return {"normalized": None, "score": None, "method": None, "accepted": False}
+        match = self.fuzzy.match(note)
+        if match is None:
+            return {"normalized": None, "score": None, "method": None, "accepted": False}
+        return {
+            "normalized": match.normalized,
+            "score": match.score,
+            "method": match.method,
+            "accepted": match.score >= threshold,
+        }
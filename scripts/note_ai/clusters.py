@@ -0,0 +1,355 @@
+"""
+Catalog-wide near-duplicate clustering of note names (normalize-note-ai.py cluster).
+
+NoteNormalizationGraph fixes one incoming note at a time; this finds the near-duplicates
+already in the notes table ("Vanilla Bean" / "vanilla", "rose petals" / "Rose", "vanila")
+in one pass over every name, without comparing all n² pairs:
+
+1. Every name becomes a row of a character-trigram TF-IDF matrix (CSR arrays, the same
+   n-grams and weighting as retrieval.py), built with NumPy from a code-point array.
+2. Candidate pairs come from two blockers:
+   - MinHash LSH over each row's trigram set: bands x rows hashes. Names that agree on every hash of
+     some band share a bucket. Buckets larger than max_bucket (very common trigram sets) are
+     skipped and counted.
+   - the name's blocking key: the plural/punctuation-folded alias_key of the name with spaces
+     and the normalization prompt's strippable suffixes removed ("Rose Petals" -> "rose",
+     "Sandal Wood" -> "sandalwood").
+3. LSH candidates are scored by TF-IDF cosine similarity in one vectorized sparse dot product.
+   Pairs at or above the threshold become edges, and so does every blocking-key pair, scored 1.0
+   (same key before suffixes are stripped) or SUFFIX_PENALTY (same only once they are).
+4. Connected components of the edges are the clusters.
+
+A cluster whose members differ only in case, punctuation, spacing and plurals (one _compact_key,
+before any suffix is stripped) gets its canonical note by rule: an already-lowercase name, then
+the shortest. Others are ambiguous and go to the LLM: typos, word-order variants, and suffix-only
+matches, since "violet leaf" or "orange flower" may well be a different note from "violet" or
+"orange". Clusters larger than max_cluster are left for review rather than merged.
+
+NumPy is required here (unlike retrieval.py, there is no pure-Python path); it is imported
+when a clusterer is built.
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .fuzzy import SUFFIX_PENALTY, strip_suffixes
+from .metrics import METRICS
+from .notes_index import alias_key, fold_case
+from .retrieval import NGRAM_SIZE, _numpy
+
+DEFAULT_CLUSTER_THRESHOLD = 0.7
+DEFAULT_BANDS = 16
+DEFAULT_BAND_ROWS = 4
+DEFAULT_MAX_BUCKET = 50
+DEFAULT_MAX_CLUSTER = 25
+# Longer names are cut to this many characters for the n-gram matrix only.
+MAX_NAME_CHARS = 64
+
+_MERSENNE = (1 << 31) - 1
+# Elements per chunk in the MinHash and scoring passes; bounds their scratch memory (tens of MB).
+_CHUNK_ELEMENTS = 1 << 20
+
+
+def _require_numpy():
+    np = _numpy()
+    if np is None:
+        raise RuntimeError("Catalog clustering needs numpy: pip install numpy")
+    return np
+
+
+def _compact_key(name: str) -> str:
+    """alias_key without spaces: "Sandal Wood" == "sandalwood", "Lily-of-the-Valley" == "lily of the valley"."""
+    return alias_key(name).replace(" ", "")
+
+
+def blocking_key(name: str) -> str:
+    """_compact_key of the name with strippable suffixes removed: "Rose Petals" and "roses" both give "rose"."""
+    variants = strip_suffixes(name)
+    return _compact_key(variants[-1] if variants else name)
+
+
+def _canonical_rank(name: str) -> tuple:
+    """Sort key for the rule-chosen canonical: already normalized, shortest, then name."""
+    return (name != fold_case(name), len(name), name)
+
+
+@dataclass
+class NgramMatrix:
+    """L2-normalized trigram TF-IDF rows in CSR layout."""
+
+    indptr: "object"
+    indices: "object"
+    weights: "object"
+    vocab_size: int
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+
+def ngram_matrix(names: Sequence[str], n: int = NGRAM_SIZE) -> NgramMatrix:
+    """Trigram TF-IDF matrix of `names` (padded with one space each side, like char_ngrams)."""
+    np = _require_numpy()
+    padded = [f" {fold_case(name)[:MAX_NAME_CHARS]} " for name in names]
+    # All names as one flat code-point array (no per-row padding to the longest name).
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.fromiter((len(p) for p in padded), dtype=np.int64, count=len(padded))
+    span = len(codes) - n + 1
+    # Code points are < 2**21, so n of them pack losslessly into one uint64.
+    grams = codes[:span].copy()
+    for k in range(1, n):
+        grams = (grams << np.uint64(21)) | codes[k:span + k]
+    # Drop the n-grams that run past the end of a name into the next one.
+    valid = np.ones(span, dtype=bool)
+    ends = np.cumsum(lengths)
+    for k in range(1, n):
+        valid[ends[ends - k < span] - k] = False
+    rows = np.repeat(np.arange(len(names), dtype=np.int64), np.maximum(lengths - n + 1, 0))
+    vocab, gram_ids = np.unique(grams[valid], return_inverse=True)
+    del codes, grams, valid
+    vocab_size = len(vocab)
+    cells, tf = np.unique(rows * vocab_size + gram_ids.ravel(), return_counts=True)
+    row_of, indices = np.divmod(cells, vocab_size)
+    indptr = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_of, minlength=len(names)), out=indptr[1:])
+    df = np.bincount(indices, minlength=vocab_size)
+    idf = np.log((1.0 + len(names)) / (1.0 + df)) + 1.0
+    weights = (tf * idf[indices]).astype(np.float32)
+    norms = np.sqrt(np.add.reduceat(weights * weights, indptr[:-1]))
+    weights /= np.repeat(norms, np.diff(indptr))
+    return NgramMatrix(indptr, indices.astype(np.int32), weights, vocab_size)
+
+
+def minhash_signatures(matrix: NgramMatrix, num_hashes: int, seed: int = 0):
+    """(rows, num_hashes) MinHash signatures of each row's trigram set, computed in bounded chunks."""
+    np = _require_numpy()
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE, num_hashes, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE, num_hashes, dtype=np.uint64)
+    rows = len(matrix.indptr) - 1
+    signatures = np.empty((rows, num_hashes), dtype=np.uint32)
+    per_row = max(1, int(np.diff(matrix.indptr).mean())) if rows else 1
+    step = max(1, _CHUNK_ELEMENTS // (per_row * num_hashes))
+    for start in range(0, rows, step):
+        end = min(rows, start + step)
+        lo, hi = matrix.indptr[start], matrix.indptr[end]
+        ids = matrix.indices[lo:hi].astype(np.uint64)
+        hashed = ids[:, None] * a[None, :]
+        hashed += b[None, :]
+        hashed %= np.uint64(_MERSENNE)
+        signatures[start:end] = np.minimum.reduceat(hashed, matrix.indptr[start:end] - lo, axis=0)
+    return signatures
+
+
+def lsh_pairs(signatures, bands: int, band_rows: int, max_bucket: int = DEFAULT_MAX_BUCKET) -> Tuple[object, int]:
+    """
+    Candidate pairs (i < j, as an (k, 2) array) that share an LSH bucket in any band, plus
+    the number of buckets skipped for holding more than max_bucket rows.
+    """
+    np = _require_numpy()
+    rng = np.random.default_rng(len(signatures))
+    mix = rng.integers(1, 1 << 63, band_rows, dtype=np.uint64) | np.uint64(1)
+    found, skipped = [], 0
+    for band in range(bands):
+        block = signatures[:, band * band_rows:(band + 1) * band_rows].astype(np.uint64)
+        keys = (block * mix[None, :]).sum(axis=1, dtype=np.uint64)  # wraps mod 2**64
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        oversized = sizes > max_bucket
+        skipped += int(oversized.sum())
+        bucket_size = np.repeat(np.where(oversized, 1, sizes), sizes)
+        position = np.arange(len(keys)) - np.repeat(starts, sizes)
+        for offset in range(1, int(bucket_size.max(initial=1))):
+            left = np.flatnonzero(position + offset < bucket_size)
+            if not len(left):
+                break
+            found.append(np.stack([order[left], order[left + offset]], axis=1))
+    if not found:
+        return np.empty((0, 2), dtype=np.int64), skipped
+    pairs = np.sort(np.concatenate(found), axis=1).astype(np.int64)
+    first, second = np.divmod(np.unique(pairs[:, 0] * len(signatures) + pairs[:, 1]), len(signatures))
+    return np.stack([first, second], axis=1), skipped
+
+
+def _gather(matrix: NgramMatrix, rows):
+    """Flat positions of every entry of `rows` in matrix.indices, and which of `rows` each belongs to."""
+    np = _require_numpy()
+    starts = matrix.indptr[rows]
+    lengths = matrix.indptr[rows + 1] - starts
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, owner
+
+
+def cosine_scores(matrix: NgramMatrix, pairs):
+    """TF-IDF cosine similarity of each (i, j) pair: a sparse row dot product, vectorized per chunk."""
+    np = _require_numpy()
+    scores = np.zeros(len(pairs), dtype=np.float32)
+    per_row = max(1, int(np.diff(matrix.indptr).mean())) if len(matrix.indptr) > 1 else 1
+    step = max(1, _CHUNK_ELEMENTS // (2 * per_row))
+    vocab = np.int64(matrix.vocab_size)
+    for start in range(0, len(pairs), step):
+        chunk = pairs[start:start + step]
+        pos_a, owner_a = _gather(matrix, chunk[:, 0])
+        pos_b, owner_b = _gather(matrix, chunk[:, 1])
+        keys = np.concatenate([owner_a * vocab + matrix.indices[pos_a], owner_b * vocab + matrix.indices[pos_b]])
+        weights = np.concatenate([matrix.weights[pos_a], matrix.weights[pos_b]])
+        order = np.argsort(keys, kind="stable")
+        keys, weights = keys[order], weights[order]
+        # Trigram ids are unique within a row, so an equal neighbour is the same trigram in the other row.
+        shared = np.flatnonzero(keys[1:] == keys[:-1])
+        scores[start:start + len(chunk)] = np.bincount(
+            keys[shared] // vocab, weights=weights[shared] * weights[shared + 1], minlength=len(chunk)
+        )
+    return scores
+
+
+def key_pairs(keys: Sequence[str], names: Sequence[str]):
+    """Edges between names with the same blocking key (each linked to the group's first), with their scores."""
+    np = _require_numpy()
+    first: Dict[str, int] = {}
+    pairs, scores = [], []
+    for i, key in enumerate(keys):
+        if not key:
+            continue
+        j = first.setdefault(key, i)
+        if j != i:
+            pairs.append((j, i))
+            same = _compact_key(names[i]) == _compact_key(names[j])
+            scores.append(1.0 if same else SUFFIX_PENALTY)
+    return np.array(pairs, dtype=np.int64).reshape(-1, 2), np.array(scores, dtype=np.float32)
+
+
+def connected_components(count: int, pairs):
+    """Component label (its smallest member) for each of `count` nodes, by min-label propagation."""
+    np = _require_numpy()
+    labels = np.arange(count, dtype=np.int64)
+    if not len(pairs):
+        return labels
+    u, v = pairs[:, 0], pairs[:, 1]
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        before = labels.copy()
+        np.minimum.at(labels, u, low)
+        np.minimum.at(labels, v, low)
+        while True:  # pointer jumping: every node points at its label's label
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, before):
+            return labels
+
+
+@dataclass
+class NoteCluster:
+    notes: List[Dict]  # {"id", "name"}, in catalog order
+    score: float  # weakest edge that holds the cluster together
+    canonical: Optional[int] = None  # index into notes when chosen by rule
+    method: str = "ambiguous"  # "rule", "ambiguous" or "oversized"
+
+
+@dataclass
+class ClusterReport:
+    clusters: List[NoteCluster]
+    stats: Dict = field(default_factory=dict)
+
+
+class CatalogClusterer:
+    """Finds near-duplicate clusters in a full notes catalog; see the module docstring for the stages."""
+
+    def __init__(self, threshold: float = DEFAULT_CLUSTER_THRESHOLD, bands: int = DEFAULT_BANDS,
+                 band_rows: int = DEFAULT_BAND_ROWS, max_bucket: int = DEFAULT_MAX_BUCKET,
+                 max_cluster: int = DEFAULT_MAX_CLUSTER, seed: int = 0):
+        _require_numpy()
+        self.threshold = threshold
+        self.bands = bands
+        self.band_rows = band_rows
+        self.max_bucket = max_bucket
+        self.max_cluster = max_cluster
+        self.seed = seed
+
+    def cluster(self, notes: Sequence[Dict]) -> ClusterReport:
+        """Clusters of two or more of `notes` ({"id", "name"}); notes with blank names are ignored."""
+        np = _require_numpy()
+        started = time.perf_counter()
+        notes = [n for n in notes if str(n.get("name") or "").strip()]
+        names = [str(n["name"]) for n in notes]
+        stages: Dict[str, float] = {}
+        stats = {"notes": len(notes), "threshold": self.threshold, "bands": self.bands,
+                 "band_rows": self.band_rows, "stages_seconds": stages}
+        if len(notes) < 2:
+            return ClusterReport([], dict(stats, candidate_pairs=0, edges=0, clusters=0))
+
+        def timed(stage: str, fn, *args):
+            stage_started = time.perf_counter()
+            with METRICS.timer("cluster", stage):
+                result = fn(*args)
+            stages[stage] = round(time.perf_counter() - stage_started, 4)
+            return result
+
+        matrix = timed("ngram_matrix", ngram_matrix, names)
+        signatures = timed("minhash", minhash_signatures, matrix, self.bands * self.band_rows, self.seed)
+        candidates, skipped = timed("lsh", lsh_pairs, signatures, self.bands, self.band_rows, self.max_bucket)
+        scores = timed("score", cosine_scores, matrix, candidates)
+        keys = timed("blocking", lambda: [blocking_key(name) for name in names])
+        blocked, blocked_scores = timed("blocking_pairs", key_pairs, keys, names)
+        keep = scores >= self.threshold
+        edges = np.concatenate([candidates[keep], blocked])
+        edge_scores = np.concatenate([scores[keep], blocked_scores])
+        labels = timed("components", connected_components, len(notes), edges)
+
+        weakest = np.ones(len(notes), dtype=np.float32)
+        if len(edges):
+            np.minimum.at(weakest, labels[edges[:, 0]], edge_scores)
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        bounds = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1], True])
+        clusters = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end - start < 2:
+                continue
+            members = sorted(order[start:end].tolist())
+            score = round(float(weakest[sorted_labels[start]]), 4)
+            clusters.append(self._classify([notes[i] for i in members], score))
+        stats.update({
+            "candidate_pairs": int(len(candidates)),
+            "lsh_buckets_skipped": skipped,
+            "blocking_pairs": int(len(blocked)),
+            "edges": int(len(edges)),
+            "clusters": len(clusters),
+            "clustered_notes": sum(len(c.notes) for c in clusters),
+            "by_method": {m: sum(1 for c in clusters if c.method == m) for m in ("rule", "ambiguous", "oversized")},
+            "matrix_mb": round(matrix.nbytes / 2**20, 2),
+            "signatures_mb": round(signatures.nbytes / 2**20, 2),
+            "seconds": round(time.perf_counter() - started, 4),
+        })
+        return ClusterReport(clusters, stats)
+
+    def _classify(self, members: List[Dict], score: float) -> NoteCluster:
+        cluster = NoteCluster(members, score)
+        names = [str(m["name"]) for m in members]
+        if len(members) > self.max_cluster:
+            cluster.method = "oversized"
+        elif len({_compact_key(name) for name in names}) == 1 and _compact_key(names[0]):
+            cluster.canonical = min(range(len(members)), key=lambda i: _canonical_rank(names[i]))
+            cluster.method = "rule"
+        return cluster
+
+
+_SLUG = re.compile(r"\s+")
+
+
+def plan_group(canonical: Dict, duplicates: List[Dict], method: str, score: float) -> Dict:
+    """One merge-plan group as scripts/merge-duplicate-notes.js --plan reads it."""
+    return {
+        "key": _SLUG.sub("-", fold_case(canonical["name"])),
+        "canonical": {"id": canonical["id"], "name": canonical["name"]},
+        "duplicates": [{"id": d["id"], "name": d["name"]} for d in duplicates],
+        "method": method,
+        "score": score,
+    }
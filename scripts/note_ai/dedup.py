@@ -0,0 +1,85 @@
+"""
+Phrase deduplication with fan-out for clean-notes-ai.py.
+
+Imports often repeat a phrase under many note_ids, differing only in case, whitespace or
+decorative punctuation ("Rose.", " rose ", "ROSE!"). PhraseDeduper groups rows by a canonical
+key (folded phrase plus prompt kind), lets only the first row of each group through to the
+pipeline and, when that row's result reaches the sink, writes a copy for every other row in the
+group under its own note_id and original phrase. Rows whose group has already been answered are
+written straight away without being processed again. Copies carry "duplicate_of" (the note_id
+that was actually processed); --resume treats them like any other finished row.
+
+Separators that change what the phrase means to the rules (",", "/", "&", "+") are kept.
+"""
+
+import re
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List
+
+from .results import RETRY_STATUSES
+
+_DECORATIVE_PUNCTUATION = re.compile(r"[^\w\s,/&+]")
+
+
+def canonical_phrase(phrase: str) -> str:
+    """Case-, whitespace- and punctuation-folded phrase used to group duplicates."""
+    return " ".join(_DECORATIVE_PUNCTUATION.sub(" ", str(phrase).lower()).split())
+
+
+class PhraseDeduper:
+    """
+    Sits between the input stream and the results sink.
+
+    key(row) gives the group key; phrase(row) the row's original phrase. Rows must already
+    carry their final "id" (used as note_id in results).
+    """
+
+    def __init__(self, sink: Callable[[Dict], None], key: Callable[[Dict], Hashable],
+                 phrase: Callable[[Dict], str]):
+        self._sink = sink
+        self._key = key
+        self._phrase = phrase
+        self._pending: Dict[Hashable, List[Dict]] = {}
+        self._representative: Dict[str, Hashable] = {}
+        # Answered groups, kept without per-row fields so later duplicates can be written at once.
+        self._settled: Dict[Hashable, Dict] = {}
+        self.rows = 0
+        self.unique = 0
+        self.fanned_out = 0
+
+    def iter_unique(self, rows: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield the first row of each group; hold back or answer the rest."""
+        for row in rows:
+            self.rows += 1
+            key = self._key(row)
+            if key in self._settled:
+                self._fan_out(self._settled[key], row)
+            elif key in self._pending:
+                self._pending[key].append(row)
+            else:
+                self._pending[key] = []
+                self._representative[str(row["id"])] = key
+                self.unique += 1
+                yield row
+
+    def sink(self, result: Dict):
+        """Write a processed result, then one copy per duplicate row of its group."""
+        self._sink(result)
+        key = self._representative.pop(str(result.get("note_id")), None)
+        if key is None:
+            return
+        template = {k: v for k, v in result.items() if k not in ("note_id", "original_phrase")}
+        template["duplicate_of"] = result.get("note_id")
+        # A failed group is not remembered: later duplicates get a fresh attempt.
+        if result.get("status") not in RETRY_STATUSES:
+            self._settled[key] = template
+        for row in self._pending.pop(key, []):
+            self._fan_out(template, row)
+
+    def _fan_out(self, template: Dict, row: Dict):
+        self.fanned_out += 1
+        self._sink(dict(template, original_phrase=self._phrase(row), note_id=row["id"]))
+
+    @property
+    def ratio(self) -> float:
+        """Input rows per unique group (1.0 when nothing was deduplicated)."""
+        return self.rows / self.unique if self.unique else 1.0
@@ -0,0 +1,360 @@
+"""
+Deterministic offline chat model for benchmarks and CI runs without network access.
+
+FakeChatModel answers the extraction, confirmation and normalization prompts with
+plausible JSON (or replays recorded responses), after a sampled latency, and can inject
+429s, timeouts, malformed JSON and stalls (an answer held back for stall_seconds, like a
+stuck connection). Every random draw is seeded by the prompt text and how
+many times that prompt has been seen, so a run gives the same answers and faults whatever
+order concurrent requests finish in.
+
+stream/astream split the same responses into chunks for structured-output mode.
+
+Latency specs: "none", "fixed:0.05", "uniform:0.02,0.2", "lognormal:<median>,<sigma>"
+(seconds). Fault specs: "429=0.02,timeout=0.01,malformed=0.01,stall=0.01" (probability per call).
+
+Prompt-prefix caching is simulated the way OpenAI reports it: once a system message has been
+seen, later calls with the same one report its tokens as cached (input_token_details.cache_read),
+rounded down to 128-token steps and only if it is at least prefix_cache_min_tokens long.
+"""
+
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from .scheduler import estimate_tokens
+
+FAULT_KINDS = ("429", "timeout", "malformed", "stall")
+PREFIX_CACHE_MIN_TOKENS = 1024
+PREFIX_CACHE_STEP = 128
+# Characters per chunk when a response is streamed.
+STREAM_CHUNK_CHARS = 16
+
+# Connectors the synthesizer splits multi-note phrases on.
+_SPLIT_REGEX = re.compile(r"\s*(?:,|/|&|\band\b|\bwith\b|\bof\b|\bin\b)\s*", re.IGNORECASE)
+_NUMBERED_REGEX = re.compile(r'^(\d+)\. "(.*)"$', re.MULTILINE)
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """Per-call latency distribution parsed from a spec string."""
+
+    def __init__(self, spec: str = "none"):
+        self.spec = spec or "none"
+        kind, _, params = self.spec.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()]
+        if kind == "none":
+            values = []
+        elif kind == "fixed" and len(values) == 1:
+            pass
+        elif kind in ("uniform", "lognormal") and len(values) == 2:
+            pass
+        else:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.values[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.values)
+        if self.kind == "lognormal":
+            median, sigma = self.values
+            return median * rng.lognormvariate(0.0, sigma)
+        return 0.0
+
+
+def parse_faults(spec: str) -> Dict[str, float]:
+    """Parse "429=0.02,timeout=0.01" into {"429": 0.02, "timeout": 0.01}."""
+    faults: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        kind, _, rate = part.partition("=")
+        kind = kind.strip()
+        if kind not in FAULT_KINDS:
+            raise ValueError(f"Unknown fault kind {kind!r}; expected one of {', '.join(FAULT_KINDS)}")
+        faults[kind] = float(rate)
+    return faults
+
+
+class FakeResponse:
+    """The parts of an AIMessage the pipelines read."""
+
+    def __init__(self, content: str, prompt_tokens: int, model_name: str, cached_tokens: int = 0):
+        self.content = content
+        completion_tokens = estimate_tokens(content)
+        self.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "input_token_details": {"cache_read": cached_tokens},
+        }
+        self.response_metadata = {"model_name": model_name}
+
+
+class FakeChunk:
+    """One streamed piece of a FakeResponse; only the final, content-free chunk carries usage."""
+
+    def __init__(self, content: str, usage_metadata: Optional[Dict] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+
+class _FakeHttpResponse:
+    def __init__(self, retry_after: float):
+        self.status_code = 429
+        self.headers = {"retry-after": str(retry_after)}
+
+
+class FakeRateLimitError(Exception):
+    """Injected 429; carries status_code and a retry-after header like the OpenAI client's error."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("Rate limit reached (injected by fake backend)")
+        self.response = _FakeHttpResponse(retry_after)
+
+
+class FakeTimeoutError(TimeoutError):
+    """Injected request timeout."""
+
+
+def _split_phrase(phrase: str) -> list:
+    parts = [p.strip(" .'\"").lower() for p in _SPLIT_REGEX.split(phrase)]
+    return [p for p in parts if 2 <= len(p) <= 50 and len(p.split()) <= 5]
+
+
+def _extract_item(phrase: str) -> dict:
+    notes = _split_phrase(phrase)
+    if notes:
+        # Phrases that split into many parts report low confidence, so cascades have work to do.
+        confidence = 0.9 if len(notes) <= 2 else 0.5
+        return {"extracted_notes": notes, "should_delete": False, "reasoning": "synthetic extraction",
+                "confidence": confidence}
+    return {"extracted_notes": None, "should_delete": True, "reasoning": "synthetic: no notes found", "confidence": 0.8}
+
+
+def synthesize_response(prompt: str) -> str:
+    """Answer a pipeline prompt with deterministic, well-formed JSON of the expected shape."""
+    if "valid perfume/scent note?" in prompt:
+        phrase = re.search(r'Phrase: "(.*)"', prompt).group(1)
+        if len(_split_phrase(phrase)) == 1:
+            return json.dumps({"valid": True, "extracted_notes": None, "should_delete": False,
+                               "reasoning": "synthetic confirmation", "confidence": 0.9})
+        return json.dumps({"valid": False, **_extract_item(phrase)})
+    numbered = _NUMBERED_REGEX.findall(prompt)
+    if "\nPhrases:\n" in prompt:
+        return json.dumps([{"index": int(i), **_extract_item(p)} for i, p in numbered])
+    if "\nNotes:\n" in prompt:
+        return json.dumps([{"index": int(i), "normalized_note": p.strip().lower()} for i, p in numbered])
+    if "\nNames:\n" in prompt:
+        names = [p for _, p in numbered]
+        return json.dumps({"canonical": min(names, key=len) if names else "", "distinct": []})
+    phrase = re.search(r'^Phrase: "(.*)"$', prompt, re.MULTILINE)
+    if phrase:
+        return json.dumps(_extract_item(phrase.group(1)))
+    note = re.search(r'^Note: "(.*)"$', prompt, re.MULTILINE)
+    if note:
+        return json.dumps({"normalized_note": note.group(1).strip().lower()})
+    return json.dumps({"reasoning": "synthetic: unrecognised prompt"})
+
+
+class FakeChatModel:
+    """
+    Drop-in for ChatOpenAI's invoke/ainvoke in the note pipelines.
+
+    replay is a JSONL file of {"prompt_sha256", "response"} lines (as written by
+    RecordingChatModel); prompts missing from it are synthesized.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "fake",
+        latency: str = "none",
+        faults: str = "",
+        seed: int = 0,
+        replay: Optional[str] = None,
+        retry_after: float = 0.05,
+        prefix_cache_min_tokens: int = PREFIX_CACHE_MIN_TOKENS,
+        stall_seconds: float = 30.0,
+    ):
+        self.model_name = model_name
+        self.stall_seconds = stall_seconds
+        self.prefix_cache_min_tokens = prefix_cache_min_tokens
+        self._prefixes = set()
+        self.latency = LatencyModel(latency)
+        self.faults = parse_faults(faults)
+        self.seed = seed
+        self.retry_after = retry_after
+        self.replayed: Dict[str, str] = {}
+        if replay:
+            with open(replay, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.replayed[entry["prompt_sha256"]] = entry["response"]
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.injected = {kind: 0 for kind in FAULT_KINDS}
+
+    def _cached_tokens(self, messages) -> int:
+        """Prompt tokens a provider would serve from its prefix cache; the caller holds the lock."""
+        if not messages or getattr(messages[0], "type", None) != "system":
+            return 0
+        prefix = str(messages[0].content)
+        if prefix not in self._prefixes:
+            self._prefixes.add(prefix)
+            return 0
+        tokens = estimate_tokens(prefix)
+        return tokens - tokens % PREFIX_CACHE_STEP if tokens >= self.prefix_cache_min_tokens else 0
+
+    def _plan(self, messages):
+        """Pick latency, fault and response for one call: (delay, fault_kind, prompt, digest, cached_tokens)."""
+        prompt = "".join(str(getattr(m, "content", m)) for m in messages)
+        digest = prompt_hash(prompt)
+        with self._lock:
+            attempt = self._seen.get(digest, 0)
+            self._seen[digest] = attempt + 1
+            self.calls += 1
+            cached = self._cached_tokens(messages)
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+        delay = self.latency.sample(rng)
+        draw = rng.random()
+        fault = None
+        for kind in FAULT_KINDS:
+            rate = self.faults.get(kind, 0.0)
+            if draw < rate:
+                fault = kind
+                break
+            draw -= rate
+        if fault == "stall":
+            delay += self.stall_seconds
+        return delay, fault, prompt, digest, cached
+
+    def _finish(self, fault: Optional[str], prompt: str, digest: str, cached: int = 0) -> FakeResponse:
+        if fault is not None:
+            with self._lock:
+                self.injected[fault] += 1
+        if fault == "429":
+            raise FakeRateLimitError(self.retry_after)
+        if fault == "timeout":
+            raise FakeTimeoutError("Request timed out (injected by fake backend)")
+        content = self.replayed.get(digest)
+        if content is None:
+            content = synthesize_response(prompt)
+        if fault == "malformed":
+            content = content[: len(content) // 2]
+        response = FakeResponse(content, estimate_tokens(prompt), self.model_name, cached)
+        with self._lock:
+            self.prompt_tokens += response.usage_metadata["input_tokens"]
+            self.completion_tokens += response.usage_metadata["output_tokens"]
+        return response
+
+    def invoke(self, messages, **kwargs) -> FakeResponse:
+        delay, fault, prompt, digest, cached = self._plan(messages)
+        if delay > 0:
+            time.sleep(delay)
+        return self._finish(fault, prompt, digest, cached)
+
+    async def ainvoke(self, messages, **kwargs) -> FakeResponse:
+        delay, fault, prompt, digest, cached = self._plan(messages)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._finish(fault, prompt, digest, cached)
+
+    @staticmethod
+    def _chunks(response: FakeResponse) -> Iterator[FakeChunk]:
+        """Content in STREAM_CHUNK_CHARS pieces, then a content-free usage chunk (as with stream_usage)."""
+        content = response.content
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            yield FakeChunk(content[start:start + STREAM_CHUNK_CHARS])
+        yield FakeChunk("", response.usage_metadata)
+
+    def stream(self, messages, **kwargs) -> Iterator[FakeChunk]:
+        delay, fault, prompt, digest, cached = self._plan(messages)
+        if delay > 0:
+            time.sleep(delay)
+        yield from self._chunks(self._finish(fault, prompt, digest, cached))
+
+    async def astream(self, messages, **kwargs) -> AsyncIterator[FakeChunk]:
+        delay, fault, prompt, digest, cached = self._plan(messages)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        for chunk in self._chunks(self._finish(fault, prompt, digest, cached)):
+            yield chunk
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "injected": dict(self.injected),
+        }
+
+
+class RecordingChatModel:
+    """Wraps a real chat model and appends every prompt/response pair to a replay file."""
+
+    def __init__(self, llm, path: str):
+        self.llm = llm
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _record(self, messages, response):
+        prompt = "".join(str(getattr(m, "content", m)) for m in messages)
+        content = response.content if hasattr(response, "content") else str(response)
+        line = json.dumps({"prompt_sha256": prompt_hash(prompt), "response": str(content)}, ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def invoke(self, messages, **kwargs):
+        response = self.llm.invoke(messages, **kwargs)
+        self._record(messages, response)
+        return response
+
+    async def ainvoke(self, messages, **kwargs):
+        response = await self.llm.ainvoke(messages, **kwargs)
+        self._record(messages, response)
+        return response
+
+    def stream(self, messages, **kwargs):
+        """Pass the stream through; what was read is recorded when it ends or is closed early."""
+        parts = []
+        try:
+            for chunk in self.llm.stream(messages, **kwargs):
+                parts.append(str(getattr(chunk, "content", "") or ""))
+                yield chunk
+        except GeneratorExit:
+            self._record(messages, "".join(parts))
+            raise
+        self._record(messages, "".join(parts))
+
+    async def astream(self, messages, **kwargs):
+        parts = []
+        try:
+            async for chunk in self.llm.astream(messages, **kwargs):
+                parts.append(str(getattr(chunk, "content", "") or ""))
+                yield chunk
+        except GeneratorExit:
+            self._record(messages, "".join(parts))
+            raise
+        self._record(messages, "".join(parts))
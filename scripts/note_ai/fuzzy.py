@@ -0,0 +1,155 @@
+"""
+Local similarity tier for note normalization.
+
+Finds the closest existing note for obvious variants ("Rose Petals", "sandalwood oil",
+"vanila") without an LLM call. Candidates come from the trigram retriever and are verified
+with a bounded edit distance. The suffix-stripping rules from the normalization prompt
+("oil", "petals", "flower", "leaf", "extract", ...) are tried as well. Every match carries
+a score in [0, 1] so callers can tune the acceptance threshold.
+
+Suffixes that name a form of the same material ("rose petals", "vanilla bean", "coconut oil")
+score above DEFAULT_THRESHOLD. The prompt also strips "flower", "leaf" and "essence"
+("rose flower", "patchouli leaf"), but this tier deliberately does not: "violet leaf" and
+"orange flower" are different scents from "violet" and "orange", so those matches are only
+reported as candidates and left to the LLM. For multi-word names the edits must
+fall inside one word, within that word's own edit budget ("green pea" is not "green tea").
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .notes_index import ExistingNotesIndex, fold_case
+from .retrieval import NoteRetriever
+
+DEFAULT_THRESHOLD = 0.85
+CANDIDATES = 10
+
+# Trailing words the normalization prompt strips ("rose petals" → "rose", "sandalwood oil" → "sandalwood").
+STRIPPABLE_SUFFIXES = frozenset([
+    'oil', 'oils', 'petal', 'petals', 'flower', 'flowers', 'leaf', 'leaves',
+    'extract', 'absolute', 'bean', 'beans', 'essence',
+])
+# Suffixes stripped with confidence. Unlike the prompt, "flower(s)", "leaf"/"leaves" and "essence"
+# are not among them (see the module docstring).
+VARIATION_SUFFIXES = frozenset(['oil', 'oils', 'petal', 'petals', 'extract', 'absolute', 'bean', 'beans'])
+# Matches reached only by stripping variation suffixes are scored down by this factor.
+SUFFIX_PENALTY = 0.9
+# Matches that needed another suffix stripped; below DEFAULT_THRESHOLD, so never auto-accepted.
+DESCRIPTIVE_SUFFIX_PENALTY = 0.8
+
+
+@dataclass
+class FuzzyMatch:
+    normalized: str
+    score: float
+    method: str  # "suffix" or "fuzzy"
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Edit distance between a and b, or None as soon as it must exceed max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def max_edits(length: int) -> int:
+    """Edits allowed for a name of this length; short names must match exactly."""
+    if length <= 4:
+        return 0
+    return 1 if length <= 8 else 2
+
+
+def strip_suffixes(note: str) -> List[str]:
+    """Variants of note with strippable trailing words removed, shortest last."""
+    return [variant for variant, _ in suffix_variants(note)]
+
+
+def suffix_variants(note: str) -> List[Tuple[str, float]]:
+    """strip_suffixes with each variant's score weight; stripping a descriptive word lowers it for good."""
+    words = fold_case(note).split(' ')
+    variants = []
+    weight = SUFFIX_PENALTY
+    while len(words) > 1 and words[-1] in STRIPPABLE_SUFFIXES:
+        if words[-1] not in VARIATION_SUFFIXES:
+            weight = DESCRIPTIVE_SUFFIX_PENALTY
+        words = words[:-1]
+        variants.append((' '.join(words), weight))
+    return variants
+
+
+def word_edit_distance(a: str, b: str) -> Optional[int]:
+    """
+    Edit distance between multi-word names that differ in exactly one word, or None.
+
+    The differing word must be within max_edits of its own length, so a short word never
+    takes an edit ("green pea" / "green tea") and a typo cannot span a word boundary.
+    """
+    words_a, words_b = a.split(' '), b.split(' ')
+    if len(words_a) != len(words_b):
+        return None
+    differing = [(x, y) for x, y in zip(words_a, words_b) if x != y]
+    if not differing:
+        return 0
+    if len(differing) > 1:
+        return None
+    x, y = differing[0]
+    limit = max_edits(min(len(x), len(y)))
+    return bounded_levenshtein(x, y, limit) if limit else None
+
+
+class FuzzyMatcher:
+    """Best local normalization for a note against one existing-notes payload."""
+
+    def __init__(self, index: ExistingNotesIndex, retriever: NoteRetriever):
+        self.index = index
+        self.retriever = retriever
+
+    def match(self, note: str) -> Optional[FuzzyMatch]:
+        """
+        Best candidate by score, whether or not it clears a threshold (None if nothing is close).
+
+        Exact/alias hits are the caller's job via the index; this only covers the
+        suffix-stripped and edit-distance tiers.
+        """
+        best: Optional[FuzzyMatch] = None
+        variants = [(fold_case(note), 1.0, "fuzzy")]
+        variants += [(v, weight, "suffix") for v, weight in suffix_variants(note)]
+        for variant, weight, method in variants:
+            if method == "suffix":
+                found = self.index.lookup(variant)
+                if found is not None:
+                    candidate = FuzzyMatch(found, weight, method)
+                    best = candidate if best is None or candidate.score > best.score else best
+                    continue
+            candidate = self._closest(variant, weight, method)
+            if candidate is not None and (best is None or candidate.score > best.score):
+                best = candidate
+        return best
+
+    def _closest(self, text: str, weight: float, method: str) -> Optional[FuzzyMatch]:
+        limit = max_edits(len(text))
+        if limit == 0:
+            return None
+        best: Optional[FuzzyMatch] = None
+        for existing in self.retriever.top_k(text, CANDIDATES):
+            folded = fold_case(existing)
+            if ' ' in text or ' ' in folded:
+                distance = word_edit_distance(text, folded)
+            else:
+                distance = bounded_levenshtein(text, folded, limit)
+            if distance is None:
+                continue
+            score = weight * (1.0 - distance / max(len(text), len(folded)))
+            if best is None or score > best.score:
+                best = FuzzyMatch(existing.strip().lower(), round(score, 4), method)
+        return best
@@ -0,0 +1,139 @@
+"""
+Run manifest for incremental clean-notes-ai.py runs.
+
+Every finished result is recorded under a key built from the hashed phrase (case- and
+whitespace-folded), the candidate reason, the model and the prompt-template version. The next
+run looks each input row up before anything else: a row whose key is recorded gets the earlier
+result carried forward under its own note_id ("reused_from" names the results stream that
+produced it), and only new or changed rows go on to dedup, rules and the LLM. Editing a prompt,
+switching models or a note changing its reason therefore recomputes the affected rows.
+
+Failed and unparseable results are never recorded, so they are retried. Neither are results
+answered locally ("source": "rule" or "alias"): they cost nothing to recompute and depend on
+rules.py and the alias table, which are not part of the key, so an edit there must take effect
+on the next run. With full=True nothing is reused but every result is recorded again, which
+refreshes the manifest. Storage is a local SQLite file; writes are committed in batches.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from .cache import normalize_phrase, project_root
+from .results import is_unanswered
+
+DEFAULT_MANIFEST_PATH = project_root / ".cache" / "note-ai" / "run-manifest.sqlite3"
+COMMIT_EVERY = 500
+# Per-row fields that are not part of the carried-forward answer.
+_ROW_FIELDS = ("note_id", "original_phrase", "duplicate_of", "reused_from")
+
+
+def is_recordable(result: Dict) -> bool:
+    """A model answer worth carrying forward: parsed, and not produced by the local rules or aliases."""
+    return not is_unanswered(result) and not result.get("source")
+
+
+def manifest_key(phrase: str, reason: str, model: str, prompt_version: str) -> str:
+    raw = "\x1f".join([normalize_phrase(phrase), reason or "", model, prompt_version])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class RunManifest:
+    """
+    Sits between the input stream and the results sink, like dedup.PhraseDeduper.
+
+    key(row) gives the manifest key and phrase(row) the original phrase; rows must already
+    carry their final "id". origin is recorded with each result (the run's stream name).
+    """
+
+    def __init__(self, sink: Callable[[Dict], None], key: Callable[[Dict], str], phrase: Callable[[Dict], str],
+                 origin: str, path: Path = DEFAULT_MANIFEST_PATH, full: bool = False):
+        """Configure the manifest; the file is opened (and created) on first use."""
+        self.path = Path(path)
+        self.full = full
+        self._sink = sink
+        self._key = key
+        self._phrase = phrase
+        self._origin = origin
+        self._pending: Dict[str, str] = {}
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.reused = 0
+        self.recomputed = 0
+        self.recorded = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use; the caller holds the lock."""
+        if self._conn is not None:
+            return self._conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Shard processes share the file; give a concurrent batch commit time to finish.
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS manifest (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID"""
+        )
+        self._conn.commit()
+        return self._conn
+
+    def _lookup(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT result, origin FROM manifest WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        # Entries recorded before local results were excluded are recomputed, not reused.
+        return dict(result, reused_from=row[1]) if is_recordable(result) else None
+
+    def iter_changed(self, rows: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield the rows that need processing; write the earlier result for the rest."""
+        for row in rows:
+            key = self._key(row)
+            previous = None if self.full else self._lookup(key)
+            if previous is not None:
+                self.reused += 1
+                self._sink(dict(previous, original_phrase=self._phrase(row), note_id=row["id"]))
+                continue
+            self.recomputed += 1
+            self._pending[str(row["id"])] = key
+            yield row
+
+    def sink(self, result: Dict):
+        """Write a processed result and record it under its row's key."""
+        self._sink(result)
+        key = self._pending.pop(str(result.get("note_id")), None)
+        if key is None or not is_recordable(result):
+            return
+        answer = {k: v for k, v in result.items() if k not in _ROW_FIELDS}
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO manifest (key, result, origin, updated_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(answer, ensure_ascii=False), self._origin, time.time()),
+            )
+            self.recorded += 1
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    def stats(self) -> dict:
+        return {"reused": self.reused, "recomputed": self.recomputed, "recorded": self.recorded, "full": self.full}
+
+    def close(self):
+        """Commit outstanding records and close the file."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,201 @@
+"""
+Per-stage timing, token and event metrics for the note pipelines.
+
+A single process-wide registry (METRICS) collects
+- latency histograms per (stage, kind), e.g. ("llm_call", "extract"), ("parse", "confirm"),
+  ("report_write", "md"), ("node", "extract_batch"),
+- prompt/completion token counts per prompt kind, read from the response's usage metadata,
+  including how many prompt tokens the provider served from its prompt-prefix cache,
+- event counters per (event, kind), e.g. ("parse_failure", "extract"), ("rule_hit", "extract"),
+- an estimated cost from the token counts and PRICING_PER_MILLION.
+
+Runs dump it as JSON next to their reports, and optionally in Prometheus text format.
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Upper bounds in seconds; the last bucket is +Inf.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# USD per 1M (input, output, cached input) tokens; models not listed get no cost estimate.
+PRICING_PER_MILLION = {
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4o": (2.50, 10.00, 1.25),
+}
+
+
+def token_usage(response) -> Tuple[int, int, int]:
+    """
+    (prompt_tokens, completion_tokens, cached_prompt_tokens) from a chat response, or zeros if
+    it reports none. Cached tokens are part of prompt_tokens.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if isinstance(usage, dict) and usage:
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0), int(cached or 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    return (int(token_usage.get("prompt_tokens") or 0), int(token_usage.get("completion_tokens") or 0),
+            int(cached or 0))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (max for the +Inf bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 6),
+            "mean_seconds": round(self.sum / self.count, 6) if self.count else None,
+            "max_seconds": round(self.max, 6),
+            "p50_le_seconds": self.quantile(0.5),
+            "p95_le_seconds": self.quantile(0.95),
+            "buckets": {str(b): n for b, n in zip(list(BUCKETS) + ["+Inf"], self.counts)},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms: Dict[Tuple[str, str], Histogram] = {}
+            self.counters: Dict[Tuple[str, str], int] = {}
+            self.tokens: Dict[str, Dict[str, int]] = {}
+            self.cost_usd = 0.0
+            self.unpriced_models = set()
+
+    def observe(self, stage: str, kind: str, seconds: float):
+        with self._lock:
+            self.histograms.setdefault((stage, kind), Histogram()).observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, kind: str = ""):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, kind, time.perf_counter() - started)
+
+    def count(self, event: str, kind: str = "", n: int = 1):
+        with self._lock:
+            self.counters[(event, kind)] = self.counters.get((event, kind), 0) + n
+
+    def record_usage(self, kind: str, response, model: str = ""):
+        """Add a response's token usage to `kind` and to the cost estimate for `model`."""
+        prompt_tokens, completion_tokens, cached_tokens = token_usage(response)
+        price = PRICING_PER_MILLION.get(model)
+        with self._lock:
+            totals = self.tokens.setdefault(
+                kind, {"requests": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0}
+            )
+            totals["requests"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["cached_prompt_tokens"] += cached_tokens
+            totals["completion_tokens"] += completion_tokens
+            if price is None:
+                self.unpriced_models.add(model)
+            else:
+                uncached = prompt_tokens - cached_tokens
+                self.cost_usd += (uncached * price[0] + cached_tokens * price[2] + completion_tokens * price[1]) / 1_000_000
+
+    def snapshot(self, **sections) -> Dict:
+        """All metrics as a JSON-ready dict; keyword sections (e.g. scheduler=..., cache=...) are added as-is."""
+        with self._lock:
+            stages: Dict[str, Dict] = {}
+            for (stage, kind), histogram in sorted(self.histograms.items()):
+                stages.setdefault(stage, {})[kind or "all"] = histogram.to_dict()
+            events: Dict[str, Dict] = {}
+            for (event, kind), n in sorted(self.counters.items()):
+                events.setdefault(event, {})[kind or "all"] = n
+            data = {
+                "stages": stages,
+                "tokens": {kind: dict(totals) for kind, totals in sorted(self.tokens.items())},
+                "events": events,
+                "estimated_cost_usd": round(self.cost_usd, 6),
+                "unpriced_models": sorted(self.unpriced_models),
+            }
+        data.update(sections)
+        return data
+
+    def write_json(self, path: Path, **sections):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(**sections), f, indent=2)
+
+    def prometheus_text(self, **gauges) -> str:
+        """Prometheus text exposition; extra numeric gauges are emitted as note_ai_<name>."""
+        lines = [
+            "# HELP note_ai_stage_seconds Time spent per pipeline stage.",
+            "# TYPE note_ai_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, kind), h in sorted(self.histograms.items()):
+                labels = f'stage="{stage}",kind="{kind}"'
+                cumulative = 0
+                for bound, n in zip(list(BUCKETS) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'note_ai_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"note_ai_stage_seconds_sum{{{labels}}} {h.sum}")
+                lines.append(f"note_ai_stage_seconds_count{{{labels}}} {h.count}")
+            lines.append("# HELP note_ai_tokens_total LLM tokens by prompt kind.")
+            lines.append("# TYPE note_ai_tokens_total counter")
+            for kind, totals in sorted(self.tokens.items()):
+                lines.append(f'note_ai_tokens_total{{kind="{kind}",type="prompt"}} {totals["prompt_tokens"]}')
+                lines.append(f'note_ai_tokens_total{{kind="{kind}",type="cached_prompt"}} {totals["cached_prompt_tokens"]}')
+                lines.append(f'note_ai_tokens_total{{kind="{kind}",type="completion"}} {totals["completion_tokens"]}')
+            lines.append("# HELP note_ai_events_total Pipeline events (cache hits, parse failures, ...).")
+            lines.append("# TYPE note_ai_events_total counter")
+            for (event, kind), n in sorted(self.counters.items()):
+                lines.append(f'note_ai_events_total{{event="{event}",kind="{kind}"}} {n}')
+            lines.append("# TYPE note_ai_estimated_cost_usd gauge")
+            lines.append(f"note_ai_estimated_cost_usd {self.cost_usd}")
+        for name, value in sorted(gauges.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE note_ai_{name} gauge")
+                lines.append(f"note_ai_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path, **gauges):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text(**gauges))
+
+
+METRICS = Metrics()
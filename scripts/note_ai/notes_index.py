@@ -0,0 +1,65 @@
+"""
+Hash index over the existing notes catalog for O(1) exact and near-exact lookups.
+
+Build one ExistingNotesIndex per existingNotes payload and reuse it for every note
+normalized against that payload.
+"""
+
+import re
+from typing import Dict, Iterable, Optional
+
+_WHITESPACE = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+
+def fold_case(name: str) -> str:
+    """Case- and whitespace-fold a note name."""
+    return _WHITESPACE.sub(' ', str(name).strip().lower())
+
+
+def singularize(word: str) -> str:
+    """Conservative English singular form; only used to build matching keys, never shown."""
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 4 and word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def alias_key(name: str) -> str:
+    """Punctuation-folded, singularized key: "Ylang-Ylang" == "ylang ylang", "Roses" == "rose"."""
+    words = _PUNCTUATION.sub(' ', fold_case(name)).split()
+    return ' '.join(singularize(w) for w in words)
+
+
+class ExistingNotesIndex:
+    """Exact (case/whitespace-folded) and alias (plural/punctuation-folded) lookups into a note list."""
+
+    def __init__(self, existing_notes: Iterable[str]):
+        self.exact: Dict[str, str] = {}
+        self.aliases: Dict[str, str] = {}
+        for existing in existing_notes:
+            if not isinstance(existing, str) or not existing.strip():
+                continue
+            canonical = existing.strip().lower()
+            # First occurrence wins, like the linear scans this replaces.
+            self.exact.setdefault(fold_case(existing), canonical)
+            key = alias_key(existing)
+            if key:
+                self.aliases.setdefault(key, canonical)
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def lookup_exact(self, note: str) -> Optional[str]:
+        return self.exact.get(fold_case(note))
+
+    def lookup(self, note: str) -> Optional[str]:
+        """Exact match first, then the plural/singular and punctuation-folded alias."""
+        found = self.lookup_exact(note)
+        if found is not None:
+            return found
+        key = alias_key(note)
+        return self.aliases.get(key) if key else None
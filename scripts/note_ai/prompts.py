@@ -0,0 +1,69 @@
+"""
+Prompt layout for provider-side prompt-prefix caching.
+
+Providers such as OpenAI reuse the work done for a prompt prefix they have seen recently. Those
+input tokens are billed at a discount and time-to-first-token drops, but only for a
+byte-identical prefix (OpenAI: at least 1024 tokens, matched in 128-token steps). Every prompt
+is therefore split in two:
+- a static prefix (role, rules, examples, answer format), built once when the script is imported
+  and sent unchanged as the system message;
+- a variable body (the phrase or phrases and the existing-notes context), sent last as the user
+  message.
+
+The context section is held to a token budget (fit_context) so a large catalog cannot crowd out
+the prompt. Cached prompt tokens are read back from the responses by metrics.record_usage.
+
+The current prefixes are about 200-570 tokens, under CACHE_MIN_PREFIX_TOKENS, so there is no
+caching gain at this size: the layout only pays off once the rules and examples grow past it.
+Padding a prefix to reach the minimum would bill the padding on every cold call for a discount on
+the warm ones, so it is not done; cacheable() lets the scripts say so in their summaries.
+"""
+
+from typing import List, NamedTuple
+
+from .metrics import METRICS
+from .retrieval import DEFAULT_TOP_K
+from .scheduler import estimate_tokens
+
+DEFAULT_CONTEXT_TOKENS = 256
+# Shortest prefix OpenAI caches.
+CACHE_MIN_PREFIX_TOKENS = 1024
+
+
+class Prompt(NamedTuple):
+    prefix: str  # static: identical for every call of this prompt kind
+    body: str  # variable: phrase(s) and context
+
+    @property
+    def text(self) -> str:
+        """The prompt as one string (prompt versions, token estimates)."""
+        return self.prefix + self.body
+
+
+def cacheable(prefix: str) -> bool:
+    """True if prefix is long enough for the provider to cache it."""
+    return estimate_tokens(prefix) >= CACHE_MIN_PREFIX_TOKENS
+
+
+def fit_context(notes: List[str], budget_tokens: int = DEFAULT_CONTEXT_TOKENS, kind: str = "") -> List[str]:
+    """
+    The leading notes (most relevant first) whose context section fits in budget_tokens.
+
+    Notes that do not fit are dropped and counted as ("context_trimmed", kind).
+    """
+    kept: List[str] = []
+    used = 0
+    for note in notes:
+        cost = estimate_tokens(f"{note}, ")
+        if used + cost > budget_tokens:
+            break
+        kept.append(note)
+        used += cost
+    if len(kept) < len(notes):
+        METRICS.count("context_trimmed", kind, len(notes) - len(kept))
+    return kept
+
+
+def context_section(notes: List[str]) -> str:
+    """The existing-notes preview used in prompt bodies."""
+    return ", ".join(notes[:DEFAULT_TOP_K]) if notes else "(none)"
@@ -0,0 +1,108 @@
+"""
+Streaming JSONL storage for extraction results.
+
+Each finished phrase is appended as one JSON line and flushed straight away, so a crash or
+Ctrl-C only loses in-flight work. The JSON and Markdown reports are built from the file
+afterwards without loading every result at once.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, Set
+
+# Results that were not answered (a failed call, or with --structured-output an answer that did
+# not match the schema): kept for review, never carried forward, retried on --resume.
+RETRY_STATUSES = frozenset({"error", "unparseable"})
+# Reasonings of the default-mode parse fallbacks. Those results keep should_delete: true for the
+# report, as the original parser did, but carry no answer and must never be applied.
+UNPARSED_REASONINGS = frozenset({"Could not parse LLM response", "Could not parse confirmation response"})
+
+
+def is_unanswered(result: Dict) -> bool:
+    """True for a result with no parsed model answer: a RETRY_STATUSES row or a parse fallback."""
+    return result.get("status") in RETRY_STATUSES or result.get("reasoning") in UNPARSED_REASONINGS
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict]:
+    """Yield one dict per line; a truncated last line (interrupted write) is skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def completed_note_ids(path: Path) -> Set[str]:
+    """note_ids already present in a results stream (empty if the file does not exist)."""
+    if not Path(path).exists():
+        return set()
+    return {str(r.get("note_id")) for r in iter_jsonl(path) if r.get("note_id") is not None}
+
+
+def drop_failed(path: Path) -> int:
+    """Rewrite a results stream without its RETRY_STATUSES rows; returns how many were dropped."""
+    path = Path(path)
+    if not path.exists():
+        return 0
+    dropped = 0
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for r in iter_jsonl(path):
+            if r.get("status") in RETRY_STATUSES:
+                dropped += 1
+            else:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    if dropped:
+        tmp.replace(path)
+    else:
+        tmp.unlink()
+    return dropped
+
+
+class JsonlResults:
+    """Re-iterable view of a results stream; every iteration re-reads the file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter_jsonl(self.path)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class JsonlResultWriter:
+    """Append-only results stream; each result is flushed to disk as soon as it is written."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        ends_mid_line = False
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, "rb") as f:
+                f.seek(-1, 2)
+                ends_mid_line = f.read(1) != b"\n"
+        self._file = open(self.path, "a", encoding="utf-8")
+        if ends_mid_line:
+            # Start a fresh line after a write that was cut off.
+            self._file.write("\n")
+        self.written = 0
+
+    def write(self, result: Dict):
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.written += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
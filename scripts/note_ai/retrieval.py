@@ -0,0 +1,147 @@
+"""
+Character n-gram TF-IDF retrieval over the existing notes catalog.
+
+Prompts used to get the first 50 database notes as context; NoteRetriever picks the
+notes most similar to each phrase instead. The matrix is stored as an n-gram → notes
+inverted index (CSR layout) so it stays small for large catalogs. NumPy is used when
+installed for vectorized batch scoring; otherwise a pure-Python path gives the same ranking.
+"""
+
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence
+
+NGRAM_SIZE = 3
+DEFAULT_TOP_K = 50
+
+_numpy_module = False  # not looked up yet
+
+
+def _numpy():
+    """NumPy if installed, else None; imported on first use so callers that never build a retriever skip it."""
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy
+        except ImportError:  # optional dependency
+            numpy = None
+        _numpy_module = numpy
+    return _numpy_module
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Counter:
+    padded = f" {' '.join(str(text).lower().split())} "
+    if len(padded) <= n:
+        return Counter([padded])
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class NoteRetriever:
+    """Top-k most similar existing notes for a phrase (cosine similarity of n-gram TF-IDF vectors)."""
+
+    def __init__(self, existing_notes: Sequence[str], n: int = NGRAM_SIZE):
+        self.n = n
+        self.notes: List[str] = []
+        seen = set()
+        for note in existing_notes:
+            if isinstance(note, str) and note.strip() and note.lower() not in seen:
+                seen.add(note.lower())
+                self.notes.append(note)
+
+        rows = [char_ngrams(note, n) for note in self.notes]
+        df: Counter = Counter()
+        for grams in rows:
+            df.update(grams.keys())
+        total = len(self.notes)
+        self.vocab: Dict[str, int] = {g: i for i, g in enumerate(df)}
+        self.idf = [0.0] * len(self.vocab)
+        for g, i in self.vocab.items():
+            self.idf[i] = math.log((1 + total) / (1 + df[g])) + 1.0
+
+        # Transposed, L2-normalized TF-IDF matrix: postings[gram] = [(note_index, weight), ...]
+        postings = defaultdict(list)
+        for row, grams in enumerate(rows):
+            weights = {self.vocab[g]: tf * self.idf[self.vocab[g]] for g, tf in grams.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for col, w in weights.items():
+                postings[col].append((row, w / norm))
+
+        self._postings = postings
+        self._np = np = _numpy()
+        if np is not None:
+            self._indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            for col in range(len(self.vocab)):
+                self._indptr[col + 1] = self._indptr[col] + len(postings.get(col, ()))
+            self._rows = np.fromiter(
+                (r for col in range(len(self.vocab)) for r, _ in postings.get(col, ())),
+                dtype=np.int32, count=int(self._indptr[-1]),
+            )
+            self._weights = np.fromiter(
+                (w for col in range(len(self.vocab)) for _, w in postings.get(col, ())),
+                dtype=np.float32, count=int(self._indptr[-1]),
+            )
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+    def _query_vector(self, text: str) -> Dict[int, float]:
+        grams = char_ngrams(text, self.n)
+        weights = {self.vocab[g]: tf * self.idf[self.vocab[g]] for g, tf in grams.items() if g in self.vocab}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {col: w / norm for col, w in weights.items()}
+
+    def top_k(self, text: str, k: int = DEFAULT_TOP_K) -> List[str]:
+        return self.top_k_many([text], k)[0]
+
+    def top_k_many(self, texts: Sequence[str], k: int = DEFAULT_TOP_K) -> List[List[str]]:
+        """Ranked notes for each text; texts are scored together in one vectorized pass when NumPy is available."""
+        if not self.notes or not texts:
+            return [[] for _ in texts]
+        k = min(k, len(self.notes))
+        if self._np is not None:
+            return self._top_k_numpy(texts, k)
+        ranked = []
+        for text in texts:
+            scores: Dict[int, float] = defaultdict(float)
+            for col, qw in self._query_vector(text).items():
+                for row, w in self._postings[col]:
+                    scores[row] += qw * w
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            ranked.append([self.notes[row] for row, _ in best])
+        return ranked
+
+    def _top_k_numpy(self, texts: Sequence[str], k: int) -> List[List[str]]:
+        np = self._np
+        scores = np.zeros((len(texts), len(self.notes)), dtype=np.float32)
+        query_rows, note_rows, values = [], [], []
+        for qi, text in enumerate(texts):
+            for col, qw in self._query_vector(text).items():
+                start, end = self._indptr[col], self._indptr[col + 1]
+                note_rows.append(self._rows[start:end])
+                values.append(self._weights[start:end] * qw)
+                query_rows.append(np.full(end - start, qi, dtype=np.int32))
+        if note_rows:
+            np.add.at(scores, (np.concatenate(query_rows), np.concatenate(note_rows)), np.concatenate(values))
+        ranked = []
+        for qi in range(len(texts)):
+            row = scores[qi]
+            candidates = np.nonzero(row)[0]
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-row[candidates], k - 1)[:k]]
+            order = sorted(candidates.tolist(), key=lambda i: (-float(row[i]), i))
+            ranked.append([self.notes[i] for i in order])
+        return ranked
+
+
+def merge_ranked(ranked_lists: Sequence[List[str]], k: int = DEFAULT_TOP_K) -> List[str]:
+    """Round-robin merge of several ranked lists (one per phrase in a batch), without duplicates."""
+    merged: List[str] = []
+    seen = set()
+    for depth in range(max((len(r) for r in ranked_lists), default=0)):
+        for ranked in ranked_lists:
+            if depth < len(ranked) and ranked[depth] not in seen:
+                seen.add(ranked[depth])
+                merged.append(ranked[depth])
+                if len(merged) >= k:
+                    return merged
+    return merged
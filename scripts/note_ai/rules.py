@@ -0,0 +1,131 @@
+"""
+Deterministic rules that settle obvious phrases without an LLM call.
+
+The word lists and patterns mirror scripts/note-validation.js (STOPWORDS,
+PLACEHOLDER_PHRASES, TRAILING_FRAGMENT_REGEX, KNOWN_BAD_PATTERNS); keep the two in sync.
+apply_rules() returns a result in the same shape as the LLM parsers, tagged
+"source": "rule", or None when the phrase still needs the model.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+STOPWORDS = frozenset([
+    'and', 'of', 'with', 'the', 'a', 'an', 'or', 'but', 'in', 'on', 'at', 'to',
+    'for', 'from', 'by', 'as', 'is', 'was', 'are', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'should', 'could',
+    'may', 'might', 'must', 'can',
+    'null', 'cut', 'grey', 'gray', 'hot', 'cold', 'ups', 'fedex', 'usps', 'yes', 'no',
+    'other', 'various', 'etc', 'new', 'old', 'same', 'different', 'many', 'some', 'more',
+    'most', 'all', 'any', 'each', 'every', 'both', 'such', 'what', 'which', 'who',
+])
+
+PLACEHOLDER_PHRASES = frozenset([
+    'few', 'no name', 'new name', 'unknown', 'unnamed', 'untitled', 'tbd', 'todo', 'n/a', 'none',
+    'to be determined', 'not applicable', 'placeholder', 'test', 'example', 'sample', 'delete me',
+    'test update note', 'test note', 'update note', 'null', 'nul',
+])
+
+TRAILING_FRAGMENT_REGEX = re.compile(
+    r'\s+(of|in|with|to|for|and|or|from|by|as|at|on|that|which|who|when|where|a|an|the)$', re.IGNORECASE
+)
+
+KNOWN_BAD_PATTERNS = [
+    re.compile(r'^two\s+differences?\s*1$', re.IGNORECASE),
+    re.compile(r'^limited\s+time\s+only$', re.IGNORECASE),
+    re.compile(r'\s+but\s+not\s+in$', re.IGNORECASE),
+    re.compile(r'^\d+\s*ml\b', re.IGNORECASE),
+    re.compile(r'^test\s+', re.IGNORECASE),
+]
+
+VALID_WORD_COUNT = (1, 5)
+VALID_LENGTH = (2, 50)
+
+# Rewrites taken from the extraction prompt rules.
+_LEADING_BASE = re.compile(r'^base\s+', re.IGNORECASE)
+_TRAILING_MORE = re.compile(r'\s*(?:&|\band)\s+more\.?$', re.IGNORECASE)
+_TRAILING_PUNCT = re.compile(r'[\s.,;:!]+$')
+_SLASH = re.compile(r'\s*/\s*')
+_WHITESPACE = re.compile(r'\s+')
+
+# Rewritten parts longer than this are left to the LLM.
+MAX_RULE_NOTE_WORDS = 3
+
+
+def normalize_for_validation(name: str) -> str:
+    if not isinstance(name, str):
+        return ''
+    return _WHITESPACE.sub(' ', name.strip().lower())
+
+
+def is_displayable_scent_note(name: str) -> bool:
+    """Python port of isDisplayableScentNote() in scripts/note-validation.js."""
+    n = normalize_for_validation(name)
+    if not n:
+        return False
+    if n in STOPWORDS or n in PLACEHOLDER_PHRASES:
+        return False
+    if TRAILING_FRAGMENT_REGEX.search(n):
+        return False
+    if any(p.search(n) for p in KNOWN_BAD_PATTERNS):
+        return False
+    words = n.split(' ')
+    if not VALID_WORD_COUNT[0] <= len(words) <= VALID_WORD_COUNT[1]:
+        return False
+    return VALID_LENGTH[0] <= len(n) <= VALID_LENGTH[1]
+
+
+def _is_noise(n: str) -> bool:
+    return n in PLACEHOLDER_PHRASES or any(p.search(n) for p in KNOWN_BAD_PATTERNS)
+
+
+def _is_simple_note(part: str) -> bool:
+    """A short, valid note with no stopword inside it (those still need the model to read)."""
+    n = normalize_for_validation(part)
+    words = n.split(' ')
+    return (
+        is_displayable_scent_note(n)
+        and len(words) <= MAX_RULE_NOTE_WORDS
+        and not any(w in STOPWORDS for w in words)
+    )
+
+
+def _rule_result(extracted_notes: Optional[List[str]], reasoning: str) -> Dict:
+    return {
+        "extracted_notes": extracted_notes,
+        "should_delete": extracted_notes is None,
+        "reasoning": f"Rule: {reasoning}",
+        "source": "rule",
+    }
+
+
+def apply_rules(phrase: str) -> Optional[Dict]:
+    """Settle a phrase with the mechanical rules, or return None if the LLM is needed."""
+    n = normalize_for_validation(phrase)
+    if not n:
+        return _rule_result(None, "empty phrase")
+    if _is_noise(n):
+        return _rule_result(None, "placeholder or noise phrase")
+    if ' ' not in n and n in STOPWORDS:
+        return _rule_result(None, "standalone stopword")
+
+    text = _TRAILING_PUNCT.sub('', _WHITESPACE.sub(' ', phrase.strip()))
+    steps = []
+    if _LEADING_BASE.search(text):
+        text = _LEADING_BASE.sub('', text)
+        steps.append('removed "base" prefix')
+    if _TRAILING_MORE.search(text):
+        text = _TRAILING_MORE.sub('', text)
+        steps.append('removed "& more" suffix')
+    parts = [p for p in _SLASH.split(text) if p]
+    if len(parts) > 1:
+        steps.append('split on "/"')
+    if not steps:
+        return None
+
+    kept = [p for p in parts if not _is_noise(normalize_for_validation(p))]
+    if not kept:
+        return _rule_result(None, "only placeholder parts")
+    if not all(_is_simple_note(p) for p in kept):
+        return None
+    return _rule_result(kept, ", ".join(steps))
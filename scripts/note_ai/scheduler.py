@@ -0,0 +1,493 @@
+"""
+Rate-limit-aware request scheduling shared by the extraction and normalization graphs.
+
+Every LLM call goes through a RequestScheduler, which
+- paces requests with token buckets for requests/minute and tokens/minute,
+- retries transient failures (429, 5xx, timeouts, connection errors) with exponential
+  backoff and jitter, honouring retry-after headers from rate-limit responses,
+- bounds every attempt with a per-call timeout, so a stuck request fails (and is retried)
+  instead of holding its caller,
+- optionally hedges: an attempt still unanswered after the observed p90 latency gets a
+  duplicate request, the first answer wins, and duplicates are capped at a fraction of all
+  requests (HedgePolicy),
+- gives up once a per-request deadline has passed, and
+- adapts async concurrency: halved on every rate-limit response, grown back by one after
+  a run of successes.
+
+ScheduledLLM wraps a chat model so graph nodes keep calling invoke/ainvoke unchanged; the
+stream_object variants used by structured-output mode are scheduled the same way.
+"""
+
+import time
+import queue
+import random
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 200_000
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_DEADLINE_SECONDS = 300.0
+DEFAULT_CALL_TIMEOUT = 60.0  # seconds one attempt may take before it counts as a timeout
+DEFAULT_HEDGE_QUANTILE = 0.9
+DEFAULT_HEDGE_BUDGET = 0.05  # duplicate requests allowed per request sent
+# Completion tokens reserved per request before the real usage is known.
+ESTIMATED_COMPLETION_TOKENS = 200
+
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    """A request could not be completed (including retries) before its deadline."""
+
+
+class CallTimeout(TimeoutError):
+    """One attempt got no response within the per-call timeout; retried like other timeouts."""
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Seconds requested by a retry-after / retry-after-ms header on the error's response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, DeadlineExceeded):
+        return False
+    code = status_code(error)
+    if code is not None:
+        return code in TRANSIENT_STATUS
+    name = type(error).__name__
+    return isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name
+
+
+class TokenBucket:
+    """Debt-based token bucket: reserve() always succeeds and returns how long to wait first."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class HedgePolicy:
+    """
+    When to send a duplicate of a slow request.
+
+    delay() is the `quantile` of recent successful call latencies, once `min_samples` have been
+    seen. acquire() allows a duplicate only while duplicates stay within `budget` per request.
+    """
+
+    WINDOW = 256  # recent latencies the quantile is taken over
+    REFRESH_EVERY = 16  # observations between quantile recomputations
+
+    def __init__(self, quantile: float = DEFAULT_HEDGE_QUANTILE, budget: float = DEFAULT_HEDGE_BUDGET,
+                 min_samples: int = 20):
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=self.WINDOW)
+        self._delay: Optional[float] = None
+        self._unsorted = 0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.sent = 0
+        self.won = 0
+        self.over_budget = 0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._unsorted += 1
+            if len(self._latencies) >= self.min_samples and (self._delay is None or self._unsorted >= self.REFRESH_EVERY):
+                ordered = sorted(self._latencies)
+                self._delay = ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+                self._unsorted = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for a response before hedging, or None while there is too little data."""
+        with self._lock:
+            self.requests += 1
+            return self._delay
+
+    def acquire(self) -> bool:
+        """Reserve one duplicate request if the spend cap allows it."""
+        with self._lock:
+            if self.sent + 1 > self.budget * self.requests:
+                self.over_budget += 1
+                return False
+            self.sent += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.won += 1
+
+    def stats(self) -> dict:
+        return {
+            "hedges_sent": self.sent,
+            "hedges_won": self.won,
+            "hedges_over_budget": self.over_budget,
+            "hedge_budget": self.budget,
+            "hedge_delay_seconds": round(self._delay, 4) if self._delay is not None else None,
+        }
+
+
+class RequestScheduler:
+    """Paces, retries and bounds LLM calls; one instance is shared by every call in a process."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = DEFAULT_RPM,
+        tokens_per_minute: float = DEFAULT_TPM,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+        max_concurrency: int = 1,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT,
+        hedge: Optional[HedgePolicy] = None,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.deadline_seconds = deadline_seconds
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout or None
+        self.hedge = hedge
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency_limit = self.max_concurrency
+        self._in_flight = 0
+        self._success_streak = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._condition = None  # asyncio.Condition, created inside the running loop
+        self._condition_loop = None
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.call_timeouts = 0
+
+    # --- pacing -------------------------------------------------------------------------
+
+    def _reserve(self, prompt_tokens: int) -> float:
+        with self._lock:
+            wait = max(
+                self.requests.reserve(1),
+                self.tokens.reserve(prompt_tokens + ESTIMATED_COMPLETION_TOKENS),
+            )
+            return max(wait, self._paused_until - time.monotonic())
+
+    def _try_reserve(self, prompt_tokens: int) -> bool:
+        """Take one request and its tokens from the buckets only if that needs no wait (hedges)."""
+        amount = prompt_tokens + ESTIMATED_COMPLETION_TOKENS
+        with self._lock:
+            if time.monotonic() < self._paused_until:
+                return False
+            if self.requests.reserve(0) > 0 or self.tokens.reserve(0) > 0:
+                return False
+            if self.requests.tokens < 1 or self.tokens.tokens < min(amount, self.tokens.capacity):
+                return False
+            self.requests.reserve(1)
+            self.tokens.reserve(amount)
+            return True
+
+    def _settle_tokens(self, reserved: int, response):
+        """Correct the token bucket with real usage once the response is known."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        used = usage.get("total_tokens") if isinstance(usage, dict) else None
+        if used:
+            with self._lock:
+                self.tokens.refund(reserved - used)
+
+    # --- outcomes -----------------------------------------------------------------------
+
+    def _on_success(self):
+        with self._lock:
+            self.calls += 1
+            self._success_streak += 1
+            if self._success_streak >= 10 and self.concurrency_limit < self.max_concurrency:
+                self.concurrency_limit += 1
+                self._success_streak = 0
+
+    def _on_failure(self, error: Exception, attempt: int, started: float) -> float:
+        """Return the delay before the next attempt, or re-raise if the error is final."""
+        with self._lock:
+            self.calls += 1
+            self._success_streak = 0
+            if not is_transient(error) or attempt >= self.max_retries:
+                self.failures += 1
+                raise error
+            delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay = random.uniform(delay / 2, delay)
+            if is_rate_limit(error):
+                self.rate_limited += 1
+                self.concurrency_limit = max(1, self.concurrency_limit // 2)
+                hinted = retry_after_seconds(error)
+                if hinted is not None:
+                    delay = max(delay, hinted)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            if time.monotonic() + delay - started > self.deadline_seconds:
+                self.failures += 1
+                raise DeadlineExceeded(f"Gave up after {attempt + 1} attempts: {error}") from error
+            self.retries += 1
+            return delay
+
+    # --- one attempt: per-call timeout and hedging -------------------------------------
+
+    def _hedge_delay(self) -> Optional[float]:
+        return self.hedge.delay() if self.hedge is not None else None
+
+    def _send_hedge(self, prompt_tokens: int) -> bool:
+        return self._try_reserve(prompt_tokens) and self.hedge.acquire()
+
+    def _answered(self, hedged: bool, seconds: float):
+        if self.hedge is not None:
+            self.hedge.observe(seconds)
+            if hedged:
+                self.hedge.record_win()
+
+    def _timed_out(self) -> CallTimeout:
+        with self._lock:
+            self.call_timeouts += 1
+        return CallTimeout(f"No response within {self.call_timeout:g}s")
+
+    def _attempt(self, fn: Callable, prompt_tokens: int):
+        """
+        Run fn() once, bounded by call_timeout and hedged per the policy.
+
+        Each request runs on a daemon thread: an abandoned one cannot be cancelled, but it does
+        not hold up the caller or interpreter exit. The first successful response wins; if every
+        request fails, the last error is raised.
+        """
+        if self.call_timeout is None and self.hedge is None:
+            return fn()
+        answers = queue.SimpleQueue()
+
+        def start(hedged: bool):
+            def run():
+                began = time.monotonic()
+                try:
+                    answers.put((hedged, began, fn(), None))
+                except Exception as e:
+                    answers.put((hedged, began, None, e))
+
+            threading.Thread(target=run, daemon=True, name="llm-hedge" if hedged else "llm-call").start()
+
+        started = time.monotonic()
+        deadline = started + self.call_timeout if self.call_timeout is not None else None
+        hedge_delay = self._hedge_delay()
+        hedge_at = started + hedge_delay if hedge_delay is not None else None
+        start(False)
+        running, error = 1, None
+        while running:
+            limits = [t for t in (deadline, hedge_at) if t is not None]
+            try:
+                hedged, began, response, failure = answers.get(
+                    timeout=max(0.0, min(limits) - time.monotonic()) if limits else None
+                )
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise self._timed_out() from None
+                hedge_at = None
+                if self._send_hedge(prompt_tokens):
+                    start(True)
+                    running += 1
+                continue
+            running -= 1
+            if failure is None:
+                self._answered(hedged, time.monotonic() - began)
+                return response
+            error = failure
+        raise error
+
+    async def _aattempt(self, coro_fn: Callable, prompt_tokens: int):
+        """Async variant of _attempt; requests that lose or time out are cancelled."""
+        import asyncio
+
+        if self.call_timeout is None and self.hedge is None:
+            return await coro_fn()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.call_timeout if self.call_timeout is not None else None
+        hedge_delay = self._hedge_delay()
+        hedge_at = started + hedge_delay if hedge_delay is not None else None
+        began = {asyncio.ensure_future(coro_fn()): (False, started)}
+        pending, error = set(began), None
+        try:
+            while pending:
+                limits = [t for t in (deadline, hedge_at) if t is not None]
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, min(limits) - loop.time()) if limits else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    if deadline is not None and loop.time() >= deadline:
+                        raise self._timed_out()
+                    hedge_at = None
+                    if self._send_hedge(prompt_tokens):
+                        task = asyncio.ensure_future(coro_fn())
+                        began[task] = (True, loop.time())
+                        pending.add(task)
+                    continue
+                for task in done:
+                    if task.exception() is None:
+                        hedged, at = began[task]
+                        self._answered(hedged, loop.time() - at)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # --- sync / async entry points ------------------------------------------------------
+
+    def call(self, fn: Callable, prompt: str = ""):
+        """Run fn() under pacing and retries (blocking)."""
+        reserved = estimate_tokens(prompt) + ESTIMATED_COMPLETION_TOKENS
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            wait = self._reserve(reserved - ESTIMATED_COMPLETION_TOKENS)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = self._attempt(fn, reserved - ESTIMATED_COMPLETION_TOKENS)
+            except Exception as e:
+                time.sleep(self._on_failure(e, attempt, started))
+                attempt += 1
+                continue
+            self._on_success()
+            self._settle_tokens(reserved, response)
+            return response
+
+    async def acall(self, coro_fn: Callable, prompt: str = ""):
+        """Run await coro_fn() under pacing, retries and the adaptive concurrency limit."""
+        import asyncio  # deferred: blocking-only callers never need it
+
+        reserved = estimate_tokens(prompt) + ESTIMATED_COMPLETION_TOKENS
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            await self._acquire_slot()
+            error = None
+            try:
+                wait = self._reserve(reserved - ESTIMATED_COMPLETION_TOKENS)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                response = await self._aattempt(coro_fn, reserved - ESTIMATED_COMPLETION_TOKENS)
+            except Exception as e:
+                error = e
+            finally:
+                await self._release_slot()
+            if error is None:
+                self._on_success()
+                self._settle_tokens(reserved, response)
+                return response
+            await asyncio.sleep(self._on_failure(error, attempt, started))
+            attempt += 1
+
+    async def _acquire_slot(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._condition_loop is not loop:
+            # asyncio primitives belong to one event loop; each asyncio.run() gets a fresh one.
+            self._condition = asyncio.Condition()
+            self._condition_loop = loop
+            self._in_flight = 0
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.concurrency_limit)
+            self._in_flight += 1
+
+    async def _release_slot(self):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        stats = {
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "concurrency_limit": self.concurrency_limit,
+            "call_timeout": self.call_timeout,
+            "call_timeouts": self.call_timeouts,
+        }
+        if self.hedge is not None:
+            stats.update(self.hedge.stats())
+        return stats
+
+
+class ScheduledLLM:
+    """Chat model proxy whose invoke/ainvoke go through a RequestScheduler."""
+
+    def __init__(self, llm, scheduler: RequestScheduler):
+        self.llm = llm
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    @staticmethod
+    def _prompt_text(messages) -> str:
+        return "".join(str(getattr(m, "content", m)) for m in messages)
+
+    def invoke(self, messages, **kwargs):
+        return self.scheduler.call(lambda: self.llm.invoke(messages, **kwargs), self._prompt_text(messages))
+
+    async def ainvoke(self, messages, **kwargs):
+        return await self.scheduler.acall(lambda: self.llm.ainvoke(messages, **kwargs), self._prompt_text(messages))
+
+    def stream_object(self, messages, **kwargs):
+        """Like invoke, but streamed and read only up to the end of the first JSON object (structured output)."""
+        from .structured import collect_object
+
+        prompt = self._prompt_text(messages)
+        return self.scheduler.call(lambda: collect_object(self.llm.stream(messages, **kwargs), prompt), prompt)
+
+    async def astream_object(self, messages, **kwargs):
+        from .structured import acollect_object
+
+        prompt = self._prompt_text(messages)
+        return await self.scheduler.acall(lambda: acollect_object(self.llm.astream(messages, **kwargs), prompt), prompt)
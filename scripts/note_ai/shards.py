@@ -0,0 +1,56 @@
+"""
+Deterministic partitioning of extraction runs across processes or machines.
+
+A row belongs to shard hash(note_id) mod N, using a keyed hash that does not change between
+Python processes (unlike hash()), so every worker given the same input and the same N agrees
+on a disjoint slice without coordinating. Shard outputs are ordinary results streams;
+merge_streams() concatenates them back into one.
+"""
+
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .results import iter_jsonl
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse "i/N" (0 <= i < N) into (i, N)."""
+    index, sep, count = spec.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"Invalid shard {spec!r}; expected i/N, e.g. 0/4") from None
+    if not sep or count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {spec!r}; expected i/N with 0 <= i < N")
+    return index, count
+
+
+def shard_of(note_id, count: int) -> int:
+    digest = hashlib.blake2b(str(note_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def in_shard(rows: Iterable[Dict], index: int, count: int) -> Iterator[Dict]:
+    """Rows whose note_id ("id") falls in shard index of count."""
+    for row in rows:
+        if shard_of(row["id"], count) == index:
+            yield row
+
+
+def shard_path(stream_path: Path, index: int, count: int) -> Path:
+    """Results stream for one shard of a run: <stem>.shard-<i>-of-<N>.jsonl next to the run's stream."""
+    stream_path = Path(stream_path)
+    return stream_path.with_name(f"{stream_path.stem}.shard-{index}-of-{count}.jsonl")
+
+
+def merge_streams(paths: List[Path]) -> Iterator[Dict]:
+    """Results from every shard stream in turn; a note_id seen in an earlier stream is skipped."""
+    seen = set()
+    for path in paths:
+        for result in iter_jsonl(path):
+            note_id = str(result.get("note_id"))
+            if note_id in seen:
+                continue
+            seen.add(note_id)
+            yield result
@@ -0,0 +1,184 @@
+"""
+Streaming note sources for clean-notes-ai.py.
+
+- iter_input_notes(path): rows of an --input file. A .json array is loaded whole (as before);
+  .jsonl/.ndjson files are read one line at a time, so huge inputs never sit in memory.
+- iter_source_notes(source, page_size): PerfumeNotes rows for --all, from a PostgreSQL DSN
+  (postgres://... or postgresql://...), a SQLite file or a CSV export with id,name columns.
+  Database reads use keyset pagination (WHERE id > last ORDER BY id LIMIT page_size), so
+  memory is bounded by one page and later pages cost the same as the first.
+- iter_candidates(rows): keeps the rows worth sending to the LLM, with the same checks and
+  reasons as scripts/extract-ambiguous-notes.js.
+
+psycopg (3) or psycopg2 is only imported for a PostgreSQL source.
+"""
+
+import re
+import csv
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .metrics import METRICS
+from .rules import is_displayable_scent_note
+
+DEFAULT_PAGE_SIZE = 1000
+NOTES_TABLE = "PerfumeNotes"
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# isAmbiguous() in scripts/extract-ambiguous-notes.js
+AMBIGUOUS_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"soaked in", r"hints? of", r"touch of", r"along with", r"the fabulous", r"petites",
+        r"\d+s$", r"spritzes", r"inhale", r"and.*and", r",.*,",
+    )
+]
+# mightHaveExtractableNotes() in scripts/extract-ambiguous-notes.js
+EXTRACTABLE_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (r"soaked in", r"hints? of", r"touch of", r"scent of", r"notes? of", r"\w+\s+\w+\s+\w+")
+]
+
+
+def candidate_reason(name: str) -> Optional[str]:
+    """Why a note should go to AI extraction, or None if it does not need it."""
+    if any(p.search(name) for p in AMBIGUOUS_PATTERNS):
+        return "Complex phrase requiring AI extraction"
+    if not is_displayable_scent_note(name) and any(p.search(name) for p in EXTRACTABLE_PATTERNS):
+        return "Marked invalid but might have extractable notes"
+    return None
+
+
+def iter_candidates(rows: Iterable[Dict]) -> Iterator[Dict]:
+    """{"id", "name", "reason"} for every row that needs AI extraction."""
+    for row in rows:
+        name = row.get("name") or ""
+        reason = candidate_reason(name)
+        METRICS.count("source_row", "candidate" if reason else "skipped")
+        if reason:
+            yield {"id": row["id"], "name": name, "reason": reason}
+
+
+def iter_input_notes(path: str) -> Iterator[Dict]:
+    """Rows of an --input file; JSONL/NDJSON is streamed, a JSON array is loaded in one go."""
+    if Path(path).suffix.lower() not in JSONL_SUFFIXES:
+        with METRICS.timer("load_input", "json"), open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        yield from rows
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_no}: invalid JSON ({e.msg})") from None
+            # A bare string line is shorthand for {"name": ...}.
+            yield {"name": row} if isinstance(row, str) else row
+
+
+def is_postgres_dsn(source: str) -> bool:
+    return source.startswith(("postgres://", "postgresql://"))
+
+
+def describe_source(source: str) -> str:
+    """The source for log output, with any DSN password masked."""
+    return re.sub(r"(://[^:/@]+:)[^@]*@", r"\1***@", source) if is_postgres_dsn(source) else source
+
+
+def postgres_driver():
+    """psycopg (3), else psycopg2; RuntimeError with the install hint if neither is installed."""
+    try:
+        import psycopg
+    except ImportError:
+        try:
+            import psycopg2 as psycopg
+        except ImportError:
+            raise RuntimeError(
+                "PostgreSQL sources and apply targets need psycopg: pip install -r scripts/requirements-ai.txt"
+            ) from None
+    return psycopg
+
+
+def _connect_postgres(dsn: str):
+    return postgres_driver().connect(dsn)
+
+
+def _iter_keyset(conn, query: str, page_size: int) -> Iterator[Dict]:
+    """Run `query` (params: last id, limit) page by page until a short page; closes `conn` at the end."""
+    last_id = ""
+    try:
+        while True:
+            with METRICS.timer("load_input", "page"):
+                cur = conn.cursor()
+                try:
+                    cur.execute(query, (last_id, page_size))
+                    page = cur.fetchall()
+                finally:
+                    cur.close()
+            for note_id, name in page:
+                yield {"id": note_id, "name": name}
+            if len(page) < page_size:
+                return
+            last_id = page[-1][0]
+    finally:
+        conn.close()
+
+
+def _split_prisma_schema(dsn: str) -> Tuple[str, str]:
+    """Strip Prisma's ?schema= parameter (libpq rejects it); returns (dsn, schema)."""
+    parts = urlsplit(dsn)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    schema = next((v for k, v in query if k == "schema"), "public")
+    rest = urlencode([(k, v) for k, v in query if k != "schema"])
+    return urlunsplit(parts._replace(query=rest)), schema
+
+
+def iter_postgres_notes(dsn: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+    dsn, schema = _split_prisma_schema(dsn)
+    # Connect before returning the iterator so a bad DSN fails before any processing starts.
+    conn = _connect_postgres(dsn)
+    query = f'SELECT id, name FROM "{schema}"."{NOTES_TABLE}" WHERE id > %s ORDER BY id LIMIT %s'
+    return _iter_keyset(conn, query, page_size)
+
+
+def iter_sqlite_notes(path: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+    if not Path(path).exists():
+        raise FileNotFoundError(f"SQLite notes export not found: {path}")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    query = f'SELECT id, name FROM "{NOTES_TABLE}" WHERE id > ? ORDER BY id LIMIT ?'
+    return _iter_keyset(conn, query, page_size)
+
+
+def iter_csv_notes(path: str) -> Iterator[Dict]:
+    if not Path(path).exists():
+        raise FileNotFoundError(f"CSV notes export not found: {path}")
+    return _iter_csv(path)
+
+
+def _iter_csv(path: str) -> Iterator[Dict]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            yield {"id": row["id"], "name": row["name"]}
+
+
+def iter_source_notes(source: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict]:
+    """All PerfumeNotes rows ({"id", "name"}) from a PostgreSQL DSN, SQLite file or CSV export."""
+    if is_postgres_dsn(source):
+        return iter_postgres_notes(source, page_size)
+    suffix = Path(source).suffix.lower()
+    if suffix in SQLITE_SUFFIXES:
+        return iter_sqlite_notes(source, page_size)
+    if suffix == ".csv":
+        return iter_csv_notes(source)
+    raise ValueError(
+        f"Unsupported notes source {source!r}; expected a postgres:// DSN or a "
+        f"{'/'.join(SQLITE_SUFFIXES)}/.csv file"
+    )
@@ -0,0 +1,215 @@
+"""
+Structured-output mode: schema-constrained model answers and a strict validator for them.
+
+With --structured-output the pipelines send an OpenAI "json_schema" response format (strict
+mode) with every request and validate the answer once against a precompiled schema instead of
+regex-searching it and falling back to defaults. A response that is not exactly one object of
+the expected shape is reported as unparseable rather than guessed at.
+
+Responses are read as a stream and the read stops once the first JSON object has closed;
+JsonObjectScanner finds that point in one pass over the text, respecting strings and escapes.
+The schema subset supported by compile_schema is what strict mode accepts for these answers:
+type (a name or a list of names), properties, required, additionalProperties: false and items.
+"""
+
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Tuple
+
+from .metrics import METRICS
+from .scheduler import estimate_tokens
+
+Validator = Callable[[Any], Optional[str]]
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+}
+
+
+def response_format(name: str, schema: Dict) -> Dict:
+    """OpenAI response_format requesting strict, schema-constrained JSON."""
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def compile_schema(schema: Dict, path: str = "$") -> Validator:
+    """Compile a schema into a validator that returns the first error found, or None."""
+    types = schema.get("type") or ()
+    types = (types,) if isinstance(types, str) else tuple(types)
+    type_checks = tuple(_TYPE_CHECKS[t] for t in types)
+    properties = {name: compile_schema(sub, f"{path}.{name}") for name, sub in schema.get("properties", {}).items()}
+    required = tuple(schema.get("required", ()))
+    closed = schema.get("additionalProperties") is False
+    items = compile_schema(schema["items"], f"{path}[]") if "items" in schema else None
+    expected = " or ".join(types)
+
+    def validate(value: Any) -> Optional[str]:
+        if type_checks and not any(check(value) for check in type_checks):
+            return f"{path}: expected {expected}"
+        if isinstance(value, dict):
+            for name in required:
+                if name not in value:
+                    return f"{path}: missing {name!r}"
+            if closed:
+                extra = value.keys() - properties.keys()
+                if extra:
+                    return f"{path}: unexpected {sorted(extra)[0]!r}"
+            for name, check in properties.items():
+                if name in value:
+                    error = check(value[name])
+                    if error:
+                        return error
+        elif isinstance(value, list) and items is not None:
+            for item in value:
+                error = items(item)
+                if error:
+                    return error
+        return None
+
+    return validate
+
+
+class JsonObjectScanner:
+    """Finds the first complete top-level JSON object in text that arrives in pieces."""
+
+    def __init__(self):
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.started = False
+        self.done = False
+
+    def feed(self, text: str) -> bool:
+        """Add the next piece; True once the first object has closed (anything after it is ignored)."""
+        if self.done:
+            return True
+        start = 0
+        if not self.started:
+            start = text.find("{")
+            if start < 0:
+                return False
+            self.started = True
+        depth, in_string, escaped = self._depth, self._in_string, self._escaped
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    self._parts.append(text[start:i + 1])
+                    self.done = True
+                    return True
+        self._parts.append(text[start:])
+        self._depth, self._in_string, self._escaped = depth, in_string, escaped
+        return False
+
+    @property
+    def text(self) -> Optional[str]:
+        """The object's text once it has closed, else None."""
+        return "".join(self._parts) if self.done else None
+
+
+def parse_object(text: str, validate: Validator) -> Tuple[Optional[Dict], Optional[str]]:
+    """(data, None) for a response holding one object that passes validate, else (None, reason)."""
+    scanner = JsonObjectScanner()
+    scanner.feed(str(text))
+    if scanner.text is None:
+        return None, "no complete JSON object"
+    try:
+        data = json.loads(scanner.text)
+    except json.JSONDecodeError as e:
+        return None, f"invalid JSON: {e.msg}"
+    error = validate(data)
+    return (None, error) if error else (data, None)
+
+
+class StreamedResponse:
+    """The parts of an AIMessage the pipelines read, for a stream cut off after its first JSON object."""
+
+    def __init__(self, content: str, usage_metadata: Optional[Dict], response_metadata: Optional[Dict] = None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+        self.response_metadata = response_metadata or {}
+
+
+def _chunk_text(chunk) -> str:
+    return str(getattr(chunk, "content", chunk) or "")
+
+
+class _ObjectReader:
+    """
+    Stream bookkeeping shared by collect_object and acollect_object.
+
+    Once the object has closed, only content-free chunks are read on: the provider's usage chunk
+    follows the last content chunk, and any further text is cut off unread.
+    """
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.scanner = JsonObjectScanner()
+        self.raw = []
+        self.usage = None
+
+    def take(self, chunk) -> bool:
+        """Read one chunk; True when the stream should be closed."""
+        self.usage = getattr(chunk, "usage_metadata", None) or self.usage
+        text = _chunk_text(chunk)
+        if self.scanner.done:
+            if text.strip():
+                METRICS.count("stream_cutoff")
+                return True
+            return self.usage is not None
+        self.raw.append(text)
+        return self.scanner.feed(text) and self.usage is not None
+
+    def response(self) -> StreamedResponse:
+        content = self.scanner.text if self.scanner.done else "".join(self.raw)
+        usage = self.usage
+        if usage is None:
+            # The stream was cut off before its usage chunk; settle on an estimate.
+            prompt_tokens, output_tokens = estimate_tokens(self.prompt), estimate_tokens(content)
+            usage = {"input_tokens": prompt_tokens, "output_tokens": output_tokens,
+                     "total_tokens": prompt_tokens + output_tokens}
+        return StreamedResponse(content, usage)
+
+
+def collect_object(chunks: Iterable, prompt: str = "") -> StreamedResponse:
+    """Read a response stream up to the end of its first JSON object, then close it."""
+    reader = _ObjectReader(prompt)
+    try:
+        for chunk in chunks:
+            if reader.take(chunk):
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    return reader.response()
+
+
+async def acollect_object(chunks: AsyncIterator, prompt: str = "") -> StreamedResponse:
+    reader = _ObjectReader(prompt)
+    try:
+        async for chunk in chunks:
+            if reader.take(chunk):
+                break
+    finally:
+        aclose = getattr(chunks, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return reader.response()
@@ -0,0 +1,36 @@
+"""
+Offline tests for scripts/note_ai. Run from the repository root:
+
+    python -m pytest -q scripts/note_ai/tests
+
+LLM calls go to the fake backend (note_ai/fake_llm.py); no API key or network is needed.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+def load_script(filename: str):
+    """Import one of the hyphenated entry scripts (clean-notes-ai.py, normalize-note-ai.py) as a module."""
+    name = filename.replace("-", "_").removesuffix(".py")
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, SCRIPTS_DIR / filename)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(monkeypatch, tmp_path):
+    """Every test talks to the fake LLM, from a scratch working directory."""
+    monkeypatch.setenv("NOTE_AI_LLM_BACKEND", "fake")
+    for var in ("NOTE_AI_FAKE_LATENCY", "NOTE_AI_FAKE_FAULTS", "NOTE_AI_FAKE_REPLAY", "NOTE_AI_LLM_RECORD"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.chdir(tmp_path)
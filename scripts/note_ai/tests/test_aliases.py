@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from conftest import load_script
+from note_ai.aliases import AliasStore, extraction_entries
+from note_ai.cache import ResponseCache
+from note_ai.fake_llm import prompt_hash
+
+normalize = load_script("normalize-note-ai.py")
+VERSION = normalize.NORMALIZE_PROMPT_VERSION
+
+
+@pytest.fixture
+def store(tmp_path):
+    aliases = AliasStore(tmp_path / "aliases.sqlite3")
+    yield aliases
+    aliases.close()
+
+
+def test_lookup_by_canonical_phrase_and_version(store):
+    store.learn("normalize", "Rose.", {"normalized_note": "rose"}, "v1", "test")
+    assert store.lookup("normalize", " rose ", "v1") == {"normalized_note": "rose"}
+    assert store.lookup("normalize", "rose", "v2") is None
+    assert store.lookup("extract", "rose", "v1") is None
+    assert store.stats() == {"hits": 1, "misses": 2, "writes": 1}
+    assert store.compact({"normalize": "v2"}) == 1
+    assert store.counts() == {}
+
+
+def test_only_parsed_llm_answers_are_ingested():
+    answer = {"extracted_notes": ["rose"], "should_delete": False, "reasoning": "r"}
+    results = [
+        dict(answer, original_phrase="rose oil", prompt_version="e1"),
+        dict(answer, original_phrase="rose", prompt_version="e1", source="rule"),
+        dict(answer, original_phrase="Rose oil", prompt_version="e1", duplicate_of="1"),
+        dict(answer, original_phrase="oud", prompt_version="e1", status="error"),
+        dict(answer, original_phrase="amber"),  # no prompt version: not a parsed LLM answer
+    ]
+    entries = list(extraction_entries(results, {"extract": "e1"}, "report.jsonl"))
+    assert [(kind, phrase) for kind, phrase, *_ in entries] == [("extract", "rose oil")]
+
+
+@pytest.mark.parametrize("answer", ["Sorry, I can't help with that (error 42).", "I cannot help with that"])
+def test_unparsed_normalize_answer_is_neither_cached_nor_learned(tmp_path, monkeypatch, store, answer):
+    prompt = normalize._build_normalize_prompt("Vanila Bean", [])
+    replay = tmp_path / "replay.jsonl"
+    replay.write_text(json.dumps({"prompt_sha256": prompt_hash(prompt.text), "response": answer}) + "\n")
+    monkeypatch.setenv("NOTE_AI_FAKE_REPLAY", str(replay))
+    cache = ResponseCache(tmp_path / "responses.sqlite3")
+    crew = normalize.NoteNormalizationGraph(cache=cache, aliases=store)
+
+    outcome = crew.normalize_note_scored("Vanila Bean", [])
+    assert outcome["method"] == "llm"
+    assert store.lookup("normalize", "Vanila Bean", VERSION) is None
+    assert cache.writes == 0
+
+    # The next run asks the model again instead of answering from a stored guess.
+    crew.normalize_note_scored("Vanila Bean", [])
+    assert crew.llm.llm.stats()["calls"] == 2
+    cache.close()
+
+
+def test_malformed_batch_answers_are_not_learned(monkeypatch, store):
+    monkeypatch.setenv("NOTE_AI_FAKE_FAULTS", "malformed=1")
+    crew = normalize.NoteNormalizationGraph(aliases=store)
+    outcomes = crew.normalize_notes_scored(["Vanila Bean", "Amber Musk"], [], batch_size=2)
+    assert [o["normalized"] for o in outcomes] == ["vanila bean", "amber musk"]
+    assert store.writes == 0
+
+
+def test_parsed_answers_are_learned_and_reused(store):
+    crew = normalize.NoteNormalizationGraph(aliases=store)
+    assert crew.normalize_note_scored("Amber Musk", [])["method"] == "llm"
+    assert store.lookup("normalize", "amber musk", VERSION) == {"normalized_note": "amber musk"}
+    assert crew.normalize_note_scored("Amber Musk", []) == {"normalized": "amber musk", "method": "learned",
+                                                              "score": None}
+    assert crew.llm.llm.stats()["calls"] == 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('{"normalized_note": "Rose "}', "rose"),
+    ('{"normalized_note": ""}', None),
+    ('{"note": "rose"}', None),
+    ('["rose"]', None),
+    ("Normalized note: Sandalwood", None),
+    ('{"normalized_note": ', None),
+])
+def test_normalize_parser_accepts_only_json_answers(text, expected):
+    assert normalize._parse_normalize_response(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Normalized note: Sandalwood", "sandalwood"),
+    ('"ylang-ylang"', "ylang-ylang"),
+    ("rose 2", "fallback"),
+])
+def test_salvaged_free_text(text, expected):
+    assert normalize._salvage_normalize_text(text, "fallback") == expected
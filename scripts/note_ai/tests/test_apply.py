@@ -0,0 +1,131 @@
+import io
+import sqlite3
+
+import pytest
+
+from note_ai.apply import NoteApplier, check_target, duplicate_key
+
+SCHEMA = """
+CREATE TABLE "PerfumeNotes" (id TEXT PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE "PerfumeNoteRelation" (
+    id TEXT PRIMARY KEY, "perfumeId" TEXT NOT NULL, "noteId" TEXT NOT NULL, "noteType" TEXT NOT NULL,
+    UNIQUE ("perfumeId", "noteId", "noteType")
+);
+"""
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / "notes.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany('INSERT INTO "PerfumeNotes" VALUES (?, ?)', [
+        ("n1", "rose and oud"), ("n2", "Rose"), ("n3", "with every inhale"), ("n4", "hints of amber"),
+    ])
+    conn.executemany('INSERT INTO "PerfumeNoteRelation" VALUES (?, ?, ?, ?)', [
+        ("r1", "p1", "n1", "HEART"), ("r2", "p2", "n1", "OPEN"), ("r3", "p1", "n2", "HEART"), ("r4", "p3", "n3", "BASE"),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _state(path):
+    conn = sqlite3.connect(path)
+    try:
+        names = {name: note_id for note_id, name in conn.execute('SELECT id, name FROM "PerfumeNotes"')}
+        relations = set(conn.execute('SELECT "perfumeId", "noteId", "noteType" FROM "PerfumeNoteRelation"'))
+    finally:
+        conn.close()
+    return names, relations
+
+
+def _extract(phrase, notes):
+    return {"original_phrase": phrase, "extracted_notes": notes, "should_delete": False, "reasoning": "x"}
+
+
+def _delete(phrase):
+    return {"original_phrase": phrase, "extracted_notes": None, "should_delete": True, "reasoning": "x"}
+
+
+def test_extract_relinks_to_existing_and_new_notes(database):
+    with NoteApplier(str(database)) as applier:
+        stats = applier.apply([_extract("rose and oud", ["rose", "oud"])])
+    names, relations = _state(database)
+    assert "rose and oud" not in names
+    assert "oud" in names and "rose" not in names  # "rose" matched "Rose" by duplicate key
+    rose, oud = names["Rose"], names["oud"]
+    assert {("p1", rose, "HEART"), ("p2", rose, "OPEN"), ("p1", oud, "HEART"), ("p2", oud, "OPEN")} <= relations
+    assert not any(note_id == "n1" for _, note_id, _ in relations)
+    assert stats["extracted"] == 1 and stats["notes_created"] == 1
+    assert stats["relations_added"] == 3  # p1/Rose/HEART already existed
+    assert stats["relations_removed"] == 2
+
+
+def test_delete_removes_note_and_relations(database):
+    with NoteApplier(str(database)) as applier:
+        stats = applier.apply([_delete("with every inhale"), _delete("not in the table")])
+    names, relations = _state(database)
+    assert "with every inhale" not in names
+    assert not any(note_id == "n3" for _, note_id, _ in relations)
+    assert stats["deleted"] == 1 and stats["missing"] == 1
+
+
+def test_results_without_an_answer_are_never_applied(database):
+    results = [
+        {"original_phrase": "hints of amber", "extracted_notes": None, "should_delete": True,
+         "reasoning": "Could not parse LLM response"},
+        {"original_phrase": "with every inhale", "extracted_notes": None, "should_delete": True,
+         "reasoning": "Could not parse confirmation response"},
+        {"original_phrase": "rose and oud", "extracted_notes": None, "should_delete": False, "status": "error",
+         "reasoning": "boom"},
+    ]
+    before = _state(database)
+    with NoteApplier(str(database)) as applier:
+        stats = applier.apply(results)
+    assert _state(database) == before
+    assert stats["unanswered"] == 3 and stats["rows_written"] == 0
+
+
+def test_rerun_is_idempotent(database):
+    results = [_extract("rose and oud", ["rose", "oud"]), _delete("with every inhale")]
+    with NoteApplier(str(database)) as applier:
+        applier.apply(results)
+    after = _state(database)
+    with NoteApplier(str(database)) as applier:
+        stats = applier.apply(results)
+    assert _state(database) == after
+    assert stats["missing"] == 2 and stats["rows_written"] == 0
+
+
+def test_dry_run_writes_the_diff_only(database):
+    before = _state(database)
+    diff = io.StringIO()
+    with NoteApplier(str(database), dry_run=True, diff=diff) as applier:
+        applier.apply([_extract("rose and oud", ["oud"]), _delete("with every inhale")])
+    assert _state(database) == before
+    lines = diff.getvalue().splitlines()
+    assert '- PerfumeNotes "rose and oud" (2 relations)' in lines
+    assert '- PerfumeNotes "with every inhale" (1 relations)' in lines
+    assert any(line.startswith('+ PerfumeNotes "oud"') for line in lines)
+
+
+def test_duplicate_groups_after_apply(database):
+    with NoteApplier(str(database)) as applier:
+        applier.apply([_extract("hints of amber", ["amber"]), _extract("rose and oud", ["ROSE ", "oud"])])
+        assert applier.duplicate_groups() == []
+    conn = sqlite3.connect(database)
+    conn.execute('INSERT INTO "PerfumeNotes" VALUES (\'n9\', \'rose\')')
+    conn.commit()
+    conn.close()
+    with NoteApplier(str(database)) as applier:
+        applier.apply([])
+        assert applier.duplicate_groups() == [["Rose", "rose"]]
+
+
+def test_check_target():
+    assert duplicate_key("  Lily of  the Valley ") == "lily-of-the-valley"
+    with pytest.raises(ValueError):
+        check_target("notes.csv")
+    with pytest.raises(FileNotFoundError):
+        check_target("missing.sqlite3")
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from conftest import load_script
+
+extract = load_script("clean-notes-ai.py")
+normalize = load_script("normalize-note-ai.py")
+
+ITEMS = [("rose and oud", "compound"), ("hints of amber", "compound"), ("cedar, vetiver", "compound")]
+
+
+def test_extraction_batch_keeps_good_items_only():
+    items = [
+        {"index": 1, "extracted_notes": ["rose"], "should_delete": False, "reasoning": "ok"},
+        {"index": 2, "extracted_notes": "rose", "should_delete": False},  # notes not a list
+        {"index": 3, "extracted_notes": None, "should_delete": True},
+        {"index": 3, "extracted_notes": None, "should_delete": False},  # duplicate index
+        {"index": True, "extracted_notes": None, "should_delete": True},  # bool is not an index
+        {"index": 9, "extracted_notes": None, "should_delete": True},  # out of range
+        "junk",
+    ]
+    results = extract._parse_extraction_batch_response("here: " + json.dumps(items), 4)
+    assert results[0] == {"extracted_notes": ["rose"], "should_delete": False, "reasoning": "ok"}
+    assert results[1:] == [None, None, None]
+
+
+@pytest.mark.parametrize("text", ["nothing", "[1, 2", '{"index": 1}'])
+def test_extraction_batch_unreadable(text):
+    assert extract._parse_extraction_batch_response(text, 2) == [None, None]
+
+
+def test_normalize_batch_parse():
+    batch = '[{"index": 2, "normalized_note": "Musk"}, {"index": 1, "normalized_note": ""}]'
+    assert normalize._parse_normalize_batch_response(batch, 3) == [None, "musk", None]
+    assert normalize._parse_normalize_batch_response("none", 2) == [None, None]
+
+
+def test_batch_matches_single_prompts():
+    crew = extract.NoteExtractionGraph(rules=False)
+    batched = crew.extract_batch(ITEMS, [])
+    singles = [crew.extract_notes(phrase, [], reason=reason) for phrase, reason in ITEMS]
+    assert [r["extracted_notes"] for r in batched] == [r["extracted_notes"] for r in singles]
+    assert crew.llm.llm.stats()["calls"] == 1 + len(ITEMS)
+
+
+def test_malformed_batch_falls_back_to_single_prompts(monkeypatch):
+    monkeypatch.setenv("NOTE_AI_FAKE_FAULTS", "malformed=0.5")
+    crew = extract.NoteExtractionGraph(rules=False)
+    results = crew.extract_batch(ITEMS, [])
+    assert len(results) == len(ITEMS)
+    assert all("should_delete" in r for r in results)
+    # A failed batch costs one retry per phrase, never a lost phrase.
+    assert crew.llm.llm.stats()["calls"] <= 1 + len(ITEMS)
@@ -0,0 +1,45 @@
+import argparse
+
+import pytest
+
+from conftest import load_script
+
+bench = load_script("benchmark-note-ai.py")
+
+
+def bench_args(**overrides):
+    values = dict(concurrency=1, batch_size=1, retry_after=0.0, call_timeout=5.0, hedge=False, hedge_budget=0.05)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_synthetic_data_is_seeded():
+    assert bench.synthetic_ambiguous_notes(30, seed=3) == bench.synthetic_ambiguous_notes(30, seed=3)
+    assert len(bench.synthetic_ambiguous_notes(30, seed=3)) == 30
+
+
+@pytest.mark.parametrize("runner, overrides", [
+    ("run_extract", {}),
+    ("run_extract", {"batch_size": 5}),
+    ("run_extract", {"concurrency": 4}),
+    ("run_normalize", {"batch_size": 5}),
+])
+def test_runs_report_throughput_and_faults(monkeypatch, runner, overrides):
+    monkeypatch.setenv("NOTE_AI_FAKE_FAULTS", "429=0.2")
+    monkeypatch.setenv("NOTE_AI_FAKE_RETRY_AFTER", "0")
+    rows = bench.synthetic_ambiguous_notes(20, seed=1)
+    result = getattr(bench, runner)(bench_args(**overrides), rows, bench.synthetic_catalog(50, seed=1))
+    assert result["phrases"] == 20
+    assert result["llm_calls"] > 0
+    assert result["injected_faults"]["429"] == result["scheduler"]["retries"] > 0
+    assert set(result["latency_ms"]) == {"p50", "p95", "p99"}
+
+
+def test_compare_flags_regressions_only():
+    def run(rate, p95):
+        return {"pipeline": "extract", "size": 100, "phrases_per_sec": rate, "latency_ms": {"p95": p95}}
+
+    baseline = [run(100, 10)]
+    assert bench.compare([run(90, 11)], baseline, 0.2) == []
+    assert len(bench.compare([run(70, 13)], baseline, 0.2)) == 2
+    assert bench.compare([dict(run(1, 99), size=5)], baseline, 0.2) == []
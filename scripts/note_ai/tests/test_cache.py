@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from conftest import load_script
+from note_ai.cache import ResponseCache
+
+extract = load_script("clean-notes-ai.py")
+normalize = load_script("normalize-note-ai.py")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    responses = ResponseCache(tmp_path / "responses.sqlite3")
+    yield responses
+    responses.close()
+
+
+def test_key_folds_case_and_whitespace():
+    key = ResponseCache.make_key("m", "extract", "Rose  and Oud", "v1")
+    assert ResponseCache.make_key("m", "extract", " rose and oud", "v1") == key
+    assert ResponseCache.make_key("m", "confirm", "rose and oud", "v1") != key
+    assert ResponseCache.make_key("other", "extract", "rose and oud", "v1") != key
+    assert ResponseCache.make_key("m", "extract", "rose and oud", "v2") != key
+
+
+def test_get_put_and_refresh(cache, tmp_path):
+    key = ResponseCache.make_key("m", "extract", "rose", "v1")
+    assert cache.get(key) is None
+    cache.put(key, "extract", "m", "rose", "answer")
+    assert cache.get(key) == "answer"
+    assert cache.stats() == {"hits": 1, "misses": 1, "writes": 1}
+
+    refreshing = ResponseCache(tmp_path / "responses.sqlite3", refresh=True)
+    assert refreshing.get(key) is None
+    refreshing.close()
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "responses.sqlite3", max_entries=2)
+    for phrase in ("a", "b", "c"):
+        cache.put(phrase, "extract", "m", phrase, phrase)
+        time.sleep(0.01)
+    cache.get("a")
+    assert cache.evict() == 1
+    assert [cache.get(k) for k in ("a", "b", "c")] == ["a", None, "c"]
+    cache.close()
+
+
+def test_unparseable_extraction_entry_is_a_miss_and_replaced(cache):
+    crew = extract.NoteExtractionGraph(cache=cache, rules=False)
+    key = ResponseCache.make_key(crew.llm.model_name, "extract", "rose and oud", extract.EXTRACT_PROMPT_VERSION)
+    cache.put(key, "extract", crew.llm.model_name, "rose and oud", "Sorry, something went wrong")
+
+    result = crew.extract_notes("rose and oud", [], reason="compound")
+    assert result["extracted_notes"] == ["rose", "oud"]
+    assert crew.llm.llm.stats()["calls"] == 1
+    assert cache.stats() == {"hits": 0, "misses": 1, "writes": 2}
+
+    crew.extract_notes("rose and oud", [], reason="compound")
+    assert crew.llm.llm.stats()["calls"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_unparseable_normalize_entry_is_a_miss(cache, batch):
+    crew = normalize.NoteNormalizationGraph(cache=cache)
+    notes = ["Amber Musk", "Oud Smoke"]
+    for note in notes:
+        key = ResponseCache.make_key(crew.llm.model_name, "normalize", note, normalize.NORMALIZE_PROMPT_VERSION)
+        cache.put(key, "normalize", crew.llm.model_name, note, "no idea")
+    if batch:
+        outcomes = crew.normalize_notes_scored(notes, [], batch_size=2)
+    else:
+        outcomes = [crew.normalize_note_scored(note, []) for note in notes]
+    assert [o["normalized"] for o in outcomes] == ["amber musk", "oud smoke"]
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from conftest import load_script
+from note_ai.clusters import CatalogClusterer, blocking_key
+
+
+def _notes(*names):
+    return [{"id": f"n{i}", "name": name} for i, name in enumerate(names)]
+
+
+def _clusters(notes):
+    return {frozenset(n["name"] for n in c.notes): c for c in CatalogClusterer().cluster(notes).clusters}
+
+
+def test_blocking_key_folds_case_spacing_plurals_and_suffixes():
+    assert blocking_key("Sandal Wood") == blocking_key("sandalwood oil") == "sandalwood"
+    assert blocking_key("Roses") == blocking_key("rose petals") == "rose"
+
+
+def test_spelling_variants_merge_by_rule():
+    clusters = _clusters(_notes("sandalwood", "Sandal Wood", "Roses", "rose", "amber"))
+    sandalwood = clusters[frozenset({"sandalwood", "Sandal Wood"})]
+    assert sandalwood.method == "rule"
+    assert sandalwood.notes[sandalwood.canonical]["name"] == "sandalwood"
+    assert clusters[frozenset({"Roses", "rose"})].method == "rule"
+    assert len(clusters) == 2
+
+
+@pytest.mark.parametrize("names", [("violet", "violet leaf"), ("fig", "fig leaf"), ("orange", "orange flower"),
+                                   ("vanilla", "vanilla bean")])
+def test_suffix_only_matches_are_never_rule_merged(names):
+    (cluster,) = _clusters(_notes(*names)).values()
+    assert cluster.method == "ambiguous"
+    assert cluster.canonical is None
+
+
+def test_typos_are_ambiguous_and_unrelated_notes_stay_apart():
+    clusters = _clusters(_notes("bergamot", "bergamotte", "black pepper", "pink pepper", "amber", "musk", "oud",
+                                "jasmine", "iris", "neroli", "cedar", "tonka"))
+    assert clusters[frozenset({"bergamot", "bergamotte"})].method == "ambiguous"
+    assert not any("pink pepper" in names for names in clusters)
+
+
+def test_oversized_clusters_go_to_review():
+    clusterer = CatalogClusterer(max_cluster=2)
+    assert [c.method for c in clusterer.cluster(_notes("vanilla", "Vanilla")).clusters] == ["rule"]
+    many = _notes("rose", "Rose", "ROSE", "Roses")
+    assert [c.method for c in clusterer.cluster(many).clusters] == ["oversized"]
+
+
+def test_merge_plan_routes_clusters():
+    normalize = load_script("normalize-note-ai.py")
+    report = CatalogClusterer().cluster(_notes("sandalwood", "Sandal Wood", "violet", "violet leaf"))
+
+    plan = normalize.build_merge_plan(report, None)
+    assert [(g["canonical"]["name"], g["method"]) for g in plan["groups"]] == [("sandalwood", "rule")]
+    assert [(r["reason"], [n["name"] for n in r["notes"]]) for r in plan["review"]] == [
+        ("ambiguous", ["violet", "violet leaf"])]
+
+    # The fake model keeps the shortest name and calls nothing distinct.
+    plan = normalize.build_merge_plan(report, normalize.NoteNormalizationGraph())
+    assert [(g["canonical"]["name"], g["method"], [d["name"] for d in g["duplicates"]]) for g in plan["groups"]] == [
+        ("sandalwood", "rule", ["Sandal Wood"]), ("violet", "llm", ["violet leaf"])]
+    assert plan["review"] == []
+
+
+def test_canonical_answers_must_name_a_cluster_member():
+    normalize = load_script("normalize-note-ai.py")
+    names = ["violet", "violet leaf"]
+    assert normalize._parse_canonical_response('{"canonical": "Violet", "distinct": ["violet leaf"]}', names) == {
+        "canonical": "violet", "distinct": ["violet leaf"]}
+    assert normalize._parse_canonical_response('{"canonical": "violets", "distinct": []}', names) is None
+    assert normalize._parse_canonical_response("violet", names) is None
@@ -0,0 +1,44 @@
+from conftest import load_script
+from note_ai.dedup import PhraseDeduper, canonical_phrase
+
+
+def test_canonical_phrase_keeps_meaningful_separators():
+    assert canonical_phrase("  ROSE! ") == canonical_phrase("rose.") == "rose"
+    assert canonical_phrase("rose/oud") != canonical_phrase("rose oud")
+
+
+def deduper(written):
+    return PhraseDeduper(written.append, key=lambda r: canonical_phrase(r["name"]), phrase=lambda r: r["name"])
+
+
+def test_fan_out_to_pending_and_later_duplicates():
+    written = []
+    dedup = deduper(written)
+    rows = iter([{"id": "1", "name": "Rose."}, {"id": "2", "name": "rose"}, {"id": "3", "name": "Amber"}])
+    first = next(dedup.iter_unique(rows))
+    dedup.sink({"note_id": first["id"], "original_phrase": "Rose.", "extracted_notes": ["rose"]})
+    remaining = list(dedup.iter_unique(iter([{"id": "4", "name": "ROSE"}, {"id": "5", "name": "Amber"}])))
+
+    assert [r["id"] for r in remaining] == ["5"]
+    copies = {r["note_id"]: r for r in written if r.get("duplicate_of")}
+    assert set(copies) == {"4"}
+    assert copies["4"] == {"note_id": "4", "original_phrase": "ROSE", "extracted_notes": ["rose"], "duplicate_of": "1"}
+    assert (dedup.unique, dedup.fanned_out) == (2, 1)
+
+
+def test_pending_duplicates_share_a_failed_answer_but_later_ones_retry():
+    written = []
+    dedup = deduper(written)
+    unique = list(dedup.iter_unique(iter([{"id": "1", "name": "oud"}, {"id": "2", "name": "Oud"}])))
+    assert [r["id"] for r in unique] == ["1"]
+    dedup.sink({"note_id": "1", "original_phrase": "oud", "status": "error"})
+    assert [r["note_id"] for r in written] == ["1", "2"]
+
+    retried = list(dedup.iter_unique(iter([{"id": "3", "name": "OUD"}])))
+    assert [r["id"] for r in retried] == ["3"]
+
+
+def test_confirm_and_extract_rows_are_separate_groups():
+    key = load_script("clean-notes-ai.py")._dedup_key
+    assert key({"name": "Rose!", "reason": "compound"}) == key({"name": "rose", "reason": "other"})
+    assert key({"name": "rose", "reason": "Confirm valid scent note"}) != key({"name": "rose", "reason": "compound"})
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+
+from note_ai.backends import create_chat_model, prompt_messages
+from note_ai.fake_llm import (
+    FakeChatModel, FakeRateLimitError, FakeTimeoutError, LatencyModel, RecordingChatModel, parse_faults, prompt_hash,
+)
+from note_ai.prompts import Prompt
+
+NOTE_PROMPT = Prompt("Normalize the perfume note given below.\n", '\nNote: "Vanilla Bean"\n')
+
+
+def test_parse_specs():
+    assert parse_faults("429=0.02, timeout=0.01,") == {"429": 0.02, "timeout": 0.01}
+    with pytest.raises(ValueError):
+        parse_faults("teapot=0.1")
+    assert LatencyModel("fixed:0.05").kind == "fixed"
+    for spec in ("fixed", "uniform:1", "gamma:1,2"):
+        with pytest.raises(ValueError):
+            LatencyModel(spec)
+
+
+def test_synthesized_answer_and_usage():
+    llm = FakeChatModel()
+    response = llm.invoke(prompt_messages(NOTE_PROMPT))
+    assert json.loads(response.content) == {"normalized_note": "vanilla bean"}
+    assert response.usage_metadata["input_tokens"] > 0
+    assert llm.stats()["calls"] == 1
+
+
+@pytest.mark.parametrize("kind, error", [("429", FakeRateLimitError), ("timeout", FakeTimeoutError)])
+def test_injected_errors(kind, error):
+    llm = FakeChatModel(faults=f"{kind}=1", retry_after=0.3)
+    with pytest.raises(error) as raised:
+        llm.invoke(prompt_messages(NOTE_PROMPT))
+    if kind == "429":
+        assert raised.value.status_code == 429
+        assert raised.value.response.headers["retry-after"] == "0.3"
+    assert llm.stats()["injected"][kind] == 1
+
+
+def test_malformed_answer_is_cut_short():
+    response = FakeChatModel(faults="malformed=1").invoke(prompt_messages(NOTE_PROMPT))
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(response.content)
+
+
+def test_stall_holds_the_answer_back():
+    llm = FakeChatModel(faults="stall=1", stall_seconds=30)
+    delay, fault, *_ = llm._plan(prompt_messages(NOTE_PROMPT))
+    assert (fault, delay) == ("stall", 30)
+
+
+def test_faults_depend_on_seed_and_attempt_not_timing():
+    def outcomes(seed):
+        llm = FakeChatModel(faults="429=0.5", seed=seed)
+        return [llm._plan(prompt_messages(NOTE_PROMPT))[1] for _ in range(20)]
+
+    assert outcomes(1) == outcomes(1)
+    assert outcomes(1) != outcomes(2)
+    assert set(outcomes(1)) == {"429", None}
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / "replay.jsonl"
+    recorder = RecordingChatModel(FakeChatModel(faults="malformed=1"), str(path))
+    recorded = recorder.invoke(prompt_messages(NOTE_PROMPT)).content
+    entry = json.loads(path.read_text())
+    assert entry == {"prompt_sha256": prompt_hash(NOTE_PROMPT.text), "response": recorded}
+
+    replayed = FakeChatModel(replay=str(path))
+    assert replayed.invoke(prompt_messages(NOTE_PROMPT)).content == recorded
+    other = Prompt(NOTE_PROMPT.prefix, '\nNote: "Amber"\n')
+    assert json.loads(replayed.invoke(prompt_messages(other)).content) == {"normalized_note": "amber"}
+
+
+def test_stream_matches_invoke():
+    llm = FakeChatModel()
+    chunks = list(llm.stream(prompt_messages(NOTE_PROMPT)))
+    assert "".join(c.content for c in chunks) == llm.invoke(prompt_messages(NOTE_PROMPT)).content
+    assert chunks[-1].usage_metadata is not None
+
+    async def collect():
+        return "".join([c.content async for c in llm.astream(prompt_messages(NOTE_PROMPT))])
+
+    assert asyncio.run(collect()) == "".join(c.content for c in chunks)
+
+
+def test_prefix_cache_reports_only_long_repeated_prefixes():
+    short = FakeChatModel()
+    short.invoke(prompt_messages(NOTE_PROMPT))
+    assert short.invoke(prompt_messages(NOTE_PROMPT)).usage_metadata["input_token_details"]["cache_read"] == 0
+
+    long_prompt = Prompt("x" * 4 * 1100, NOTE_PROMPT.body)
+    llm = FakeChatModel()
+    assert llm.invoke(prompt_messages(long_prompt)).usage_metadata["input_token_details"]["cache_read"] == 0
+    assert llm.invoke(prompt_messages(long_prompt)).usage_metadata["input_token_details"]["cache_read"] == 1024
+
+
+def test_backend_reads_environment(monkeypatch):
+    monkeypatch.setenv("NOTE_AI_FAKE_FAULTS", "timeout=1")
+    monkeypatch.setenv("NOTE_AI_FAKE_SEED", "7")
+    llm = create_chat_model("fake-model")
+    assert isinstance(llm, FakeChatModel)
+    assert (llm.model_name, llm.seed, llm.faults) == ("fake-model", 7, {"timeout": 1.0})
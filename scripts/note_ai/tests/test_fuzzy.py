@@ -0,0 +1,67 @@
+import pytest
+
+from conftest import load_script
+from note_ai.catalog import NotesCatalog
+from note_ai.fuzzy import DEFAULT_THRESHOLD, strip_suffixes, suffix_variants, word_edit_distance
+
+EXISTING = ["violet", "fig", "orange", "green tea", "vanilla", "coconut", "sandalwood", "black pepper", "rose"]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return NotesCatalog(EXISTING)
+
+
+@pytest.mark.parametrize("note, expected", [
+    ("Vanilla Bean", "vanilla"),
+    ("Rose Petals", "rose"),
+    ("coconut oil", "coconut"),
+    ("sandalwood absolute", "sandalwood"),
+    ("vanila", "vanilla"),
+    ("black peper", "black pepper"),
+])
+def test_plain_variants_are_accepted_locally(catalog, note, expected):
+    local = catalog.resolve(note)
+    assert local["accepted"]
+    assert local["normalized"] == expected
+
+
+@pytest.mark.parametrize("note, candidate", [
+    ("violet leaf", "violet"),
+    ("fig leaf", "fig"),
+    ("orange flower", "orange"),
+    ("rose flower", "rose"),
+])
+def test_descriptive_suffixes_are_only_candidates(catalog, note, candidate):
+    local = catalog.resolve(note)
+    assert not local["accepted"]
+    assert local["normalized"] == candidate
+    assert local["score"] < DEFAULT_THRESHOLD
+
+
+def test_one_edit_in_a_short_word_is_not_a_typo(catalog):
+    assert not catalog.resolve("green pea")["accepted"]
+
+
+def test_suffix_variants_weights():
+    assert strip_suffixes("Vanilla Bean Extract") == ["vanilla bean", "vanilla"]
+    assert [w for _, w in suffix_variants("vanilla bean extract")] == [0.9, 0.9]
+    # Once a descriptive word is stripped, every shorter variant stays below the threshold.
+    assert [w for _, w in suffix_variants("fig leaf oil")] == [0.9, 0.8]
+    assert [w for _, w in suffix_variants("rose petals")] == [0.9]
+
+
+def test_word_edit_distance():
+    assert word_edit_distance("black peper", "black pepper") == 1
+    assert word_edit_distance("green pea", "green tea") is None
+    assert word_edit_distance("pink pepper", "black pepper") is None
+    assert word_edit_distance("sandal wood", "sandalwood") is None
+
+
+@pytest.mark.parametrize("note", ["violet leaf", "fig leaf", "orange flower", "green pea"])
+def test_distinct_notes_reach_the_llm(note):
+    normalize = load_script("normalize-note-ai.py")
+    crew = normalize.NoteNormalizationGraph()
+    outcome = crew.normalize_note_scored(note, EXISTING)
+    assert outcome["method"] == "llm"
+    assert outcome["normalized"] == note  # the fake model keeps the note as given
@@ -0,0 +1,113 @@
+import pytest
+
+from note_ai.manifest import RunManifest, is_recordable, manifest_key
+
+
+def row(note_id, name, reason="compound"):
+    return {"id": note_id, "name": name, "reason": reason}
+
+
+def answer(note_id, phrase, **fields):
+    return dict({"note_id": note_id, "original_phrase": phrase, "should_delete": False,
+                 "extracted_notes": [phrase.lower()], "reasoning": "model answer"}, **fields)
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Build a manifest over a shared file; each call is one run with its own results list."""
+    path = tmp_path / "manifest.sqlite3"
+
+    def start(origin, full=False, model="model-a", version="v1"):
+        written = []
+        manifest = RunManifest(
+            written.append,
+            key=lambda r: manifest_key(r["name"], r["reason"], model, version),
+            phrase=lambda r: r["name"],
+            origin=origin, path=path, full=full,
+        )
+        return manifest, written
+
+    return start
+
+
+def process(manifest, rows, make_result=answer):
+    """Send rows through the manifest; the ones it yields get make_result's answer."""
+    for r in manifest.iter_changed(rows):
+        manifest.sink(make_result(r["id"], r["name"]))
+    manifest.close()
+
+
+def test_key_folds_case_and_whitespace_only():
+    base = manifest_key("Rose  Petals", "compound", "m", "v1")
+    assert manifest_key(" rose petals ", "compound", "m", "v1") == base
+    assert manifest_key("Rose Petals", "descriptive", "m", "v1") != base
+    assert manifest_key("Rose Petals", "compound", "other", "v1") != base
+    assert manifest_key("Rose Petals", "compound", "m", "v2") != base
+
+
+def test_second_run_reuses_under_new_note_id(run):
+    first, _ = run("results-1")
+    process(first, [row("1", "Rose and Oud")])
+    assert first.stats()["recorded"] == 1
+
+    second, written = run("results-2")
+    process(second, [row("9", "rose and oud"), row("10", "Amber Musk")])
+    assert second.stats() == {"reused": 1, "recomputed": 1, "recorded": 1, "full": False}
+    reused = next(r for r in written if r["note_id"] == "9")
+    assert reused["reused_from"] == "results-1"
+    assert reused["original_phrase"] == "rose and oud"
+    assert reused["extracted_notes"] == ["rose and oud"]
+
+
+def test_model_or_prompt_change_recomputes(run):
+    first, _ = run("results-1")
+    process(first, [row("1", "Rose and Oud")])
+    for changed in ({"model": "model-b"}, {"version": "v2"}):
+        manifest, _ = run("results-2", **changed)
+        process(manifest, [row("1", "Rose and Oud")])
+        assert manifest.reused == 0
+
+
+def test_full_recomputes_and_refreshes(run):
+    first, _ = run("results-1")
+    process(first, [row("1", "Rose and Oud")])
+    full, _ = run("results-2", full=True)
+    process(full, [row("1", "Rose and Oud")])
+    assert (full.reused, full.recorded) == (0, 1)
+
+    later, written = run("results-3")
+    process(later, [row("1", "Rose and Oud")])
+    assert written[0]["reused_from"] == "results-2"
+
+
+@pytest.mark.parametrize("fields", [
+    {"source": "rule"},
+    {"source": "alias"},
+    {"status": "error"},
+    {"status": "unparseable"},
+    {"should_delete": True, "reasoning": "Could not parse LLM response"},
+])
+def test_local_and_unanswered_results_are_not_carried_forward(run, fields):
+    first, _ = run("results-1")
+    process(first, [row("1", "Rose and Oud")], lambda i, p: answer(i, p, **fields))
+    assert first.recorded == 0
+    assert not is_recordable(answer("1", "x", **fields))
+
+    second, _ = run("results-2")
+    process(second, [row("1", "Rose and Oud")])
+    assert second.reused == 0
+
+
+def test_stale_local_entries_are_recomputed(run):
+    # A manifest written before rule results were excluded still holds one.
+    first, _ = run("results-1")
+    list(first.iter_changed([row("1", "Rose and Oud")]))
+    first._connection().execute(
+        "INSERT OR REPLACE INTO manifest (key, result, origin, updated_at) VALUES (?, ?, ?, 0)",
+        (manifest_key("Rose and Oud", "compound", "model-a", "v1"), '{"source": "rule"}', "results-0"),
+    )
+    first.close()
+
+    second, _ = run("results-2")
+    process(second, [row("1", "Rose and Oud")])
+    assert (second.reused, second.recomputed) == (0, 1)
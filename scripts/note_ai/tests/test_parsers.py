@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import load_script
+from note_ai.results import is_unanswered
+
+extract = load_script("clean-notes-ai.py")
+
+
+def test_extraction_reads_json_inside_prose():
+    text = 'Sure! {"extracted_notes": ["rose", "oud"], "should_delete": false, "reasoning": "two notes", "confidence": 0.9}'
+    assert extract._parse_extraction_response(text) == {
+        "extracted_notes": ["rose", "oud"], "should_delete": False, "reasoning": "two notes", "confidence": 0.9,
+    }
+
+
+def test_extraction_defaults_and_out_of_range_confidence():
+    result = extract._parse_extraction_response('{"extracted_notes": null, "confidence": 7}')
+    assert result == {"extracted_notes": None, "should_delete": True, "reasoning": ""}
+
+
+@pytest.mark.parametrize("text", ["", "no json here", '{"extracted_notes": [', "{not json}"])
+def test_extraction_fallback_is_never_applied(text):
+    result = extract._parse_extraction_response(text)
+    assert result["reasoning"] == "Could not parse LLM response"
+    assert result["should_delete"] is True
+    assert is_unanswered(result)
+
+
+def test_confirm_valid_and_invalid():
+    valid = extract._parse_confirm_response('{"valid": true, "reasoning": "a scent"}')
+    assert valid == {"extracted_notes": None, "should_delete": False, "reasoning": "a scent"}
+    extracted = extract._parse_confirm_response('{"valid": false, "extracted_notes": ["leather"], "should_delete": false}')
+    assert extracted["extracted_notes"] == ["leather"] and extracted["should_delete"] is False
+    deleted = extract._parse_confirm_response('{"valid": false}')
+    assert deleted["should_delete"] is True and deleted["reasoning"] == "Not a valid scent note"
+    assert not is_unanswered(deleted)
+
+
+def test_confirm_fallback_is_never_applied():
+    result = extract._parse_confirm_response("I think so")
+    assert result["reasoning"] == "Could not parse confirmation response"
+    assert is_unanswered(result)
+
+
+def test_malformed_answers_reach_the_report_unanswered(monkeypatch):
+    monkeypatch.setenv("NOTE_AI_FAKE_FAULTS", "malformed=1")
+    crew = extract.NoteExtractionGraph(rules=False)
+    result = crew.extract_notes("rose and oud", [], reason="compound")
+    assert result["should_delete"] is True
+    assert is_unanswered(result)
@@ -0,0 +1,23 @@
+from conftest import load_script
+from note_ai.prompts import CACHE_MIN_PREFIX_TOKENS, cacheable, fit_context
+
+
+def test_cacheable_threshold():
+    assert not cacheable("x" * (CACHE_MIN_PREFIX_TOKENS * 4 - 4))
+    assert cacheable("x" * CACHE_MIN_PREFIX_TOKENS * 4)
+
+
+def test_current_prefixes_are_below_the_cache_minimum():
+    # The README and prompts.py say there is no caching gain at today's size; update them when this fails.
+    extract = load_script("clean-notes-ai.py")
+    normalize = load_script("normalize-note-ai.py")
+    prefixes = [extract.EXTRACT_PREFIX, extract.CONFIRM_PREFIX, extract.EXTRACT_BATCH_PREFIX,
+                normalize.NORMALIZE_PREFIX, normalize.NORMALIZE_BATCH_PREFIX, normalize.CANONICAL_PREFIX]
+    assert not any(cacheable(prefix) for prefix in prefixes)
+
+
+def test_fit_context_keeps_leading_notes_within_budget():
+    notes = ["amber", "vanilla", "sandalwood", "tonka bean"]
+    assert fit_context(notes, budget_tokens=1000) == notes
+    assert fit_context(notes, budget_tokens=4) == ["amber", "vanilla"]
+    assert fit_context(notes, budget_tokens=0) == []
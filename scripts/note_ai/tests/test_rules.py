@@ -0,0 +1,51 @@
+import pytest
+
+from conftest import load_script
+from note_ai.rules import apply_rules, is_displayable_scent_note
+
+
+@pytest.mark.parametrize("phrase, reasoning", [
+    ("   ", "Rule: empty phrase"),
+    ("No Name", "Rule: placeholder or noise phrase"),
+    ("100ml bottle", "Rule: placeholder or noise phrase"),
+    ("Hot", "Rule: standalone stopword"),
+    ("unknown / tbd", "Rule: only placeholder parts"),
+])
+def test_deletions(phrase, reasoning):
+    assert apply_rules(phrase) == {"extracted_notes": None, "should_delete": True, "reasoning": reasoning,
+                                   "source": "rule"}
+
+
+@pytest.mark.parametrize("phrase, notes", [
+    ("opoponax/resins", ["opoponax", "resins"]),
+    ("Base Musk.", ["Musk"]),
+    ("amber & more", ["amber"]),
+    ("rose / tbd", ["rose"]),
+])
+def test_rewrites(phrase, notes):
+    result = apply_rules(phrase)
+    assert result["extracted_notes"] == notes and result["should_delete"] is False
+
+
+@pytest.mark.parametrize("phrase", [
+    "rose",  # nothing to rewrite: the model decides
+    "rose and oud",
+    "coffee in your hand",
+    "smoke of the fire/rain",  # a part with a stopword still needs reading
+])
+def test_left_to_the_model(phrase):
+    assert apply_rules(phrase) is None
+
+
+def test_displayable_matches_note_validation():
+    assert is_displayable_scent_note("Vanilla Bean")
+    assert not is_displayable_scent_note("hints of")
+    assert not is_displayable_scent_note("a very long phrase with far too many words")
+    assert not is_displayable_scent_note("x")
+
+
+def test_rule_answers_skip_the_llm():
+    crew = load_script("clean-notes-ai.py").NoteExtractionGraph()
+    result = crew.extract_notes("opoponax/resins", [], reason="compound")
+    assert result["extracted_notes"] == ["opoponax", "resins"]
+    assert crew.llm.llm.stats()["calls"] == 0
@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+
+from note_ai.backends import prompt_messages
+from note_ai.fake_llm import FakeChatModel, FakeRateLimitError
+from note_ai.prompts import Prompt
+from note_ai.scheduler import (
+    CallTimeout, DeadlineExceeded, HedgePolicy, RequestScheduler, ScheduledLLM, TokenBucket, is_transient,
+    retry_after_seconds,
+)
+
+PROMPTS = [Prompt("Normalize the perfume note given below.\n", f'\nNote: "note {i}"\n') for i in range(40)]
+
+
+def scheduler(**overrides):
+    # No pacing and no jitter, so the only waits are the ones a test asks for.
+    values = dict(requests_per_minute=float("inf"), tokens_per_minute=float("inf"), base_delay=0.0,
+                  call_timeout=None)
+    values.update(overrides)
+    return RequestScheduler(**values)
+
+
+def test_error_classification():
+    assert is_transient(FakeRateLimitError(1.0))
+    assert is_transient(TimeoutError())
+    assert not is_transient(ValueError("bad request"))
+    assert not is_transient(DeadlineExceeded())
+    assert retry_after_seconds(FakeRateLimitError(0.25)) == 0.25
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_token_bucket_goes_into_debt():
+    bucket = TokenBucket(60)  # one per second
+    assert bucket.reserve(60) == 0
+    assert bucket.reserve(2) == pytest.approx(2, abs=0.05)
+    bucket.refund(10)
+    assert bucket.reserve(5) == 0
+
+
+def test_rate_limited_calls_are_retried_after_retry_after():
+    sched = scheduler()
+    llm = ScheduledLLM(FakeChatModel(faults="429=0.3", retry_after=0.05), sched)
+    started = time.monotonic()
+    for prompt in PROMPTS:
+        assert llm.invoke(prompt_messages(prompt)).content
+    injected = llm.llm.stats()["injected"]["429"]
+    assert injected > 0
+    assert sched.stats()["retries"] == sched.stats()["rate_limited"] == injected
+    assert sched.stats()["failures"] == 0
+    # base_delay is 0, so every pause came from the retry-after header.
+    assert time.monotonic() - started >= 0.05 * injected
+
+
+def test_retries_stop_at_the_limit():
+    sched = scheduler(max_retries=2)
+    llm = ScheduledLLM(FakeChatModel(faults="429=1", retry_after=0.0), sched)
+    with pytest.raises(FakeRateLimitError):
+        llm.invoke(prompt_messages(PROMPTS[0]))
+    assert llm.llm.stats()["calls"] == 3
+    assert (sched.retries, sched.failures) == (2, 1)
+
+
+def test_deadline_stops_retries_early():
+    sched = scheduler(deadline_seconds=0.1)
+    llm = ScheduledLLM(FakeChatModel(faults="429=1", retry_after=1.0), sched)
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        llm.invoke(prompt_messages(PROMPTS[0]))
+    assert time.monotonic() - started < 0.5
+    assert llm.llm.stats()["calls"] == 1
+
+
+def test_permanent_errors_are_not_retried():
+    sched = scheduler()
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise ValueError("invalid request")
+
+    with pytest.raises(ValueError):
+        sched.call(bad_request)
+    assert (len(calls), sched.retries) == (1, 0)
+
+
+def test_rate_limits_halve_async_concurrency():
+    sched = scheduler(max_concurrency=8)
+    llm = ScheduledLLM(FakeChatModel(faults="429=1", retry_after=0.0), sched)
+    sched.max_retries = 1
+
+    async def run():
+        with pytest.raises(FakeRateLimitError):
+            await llm.ainvoke(prompt_messages(PROMPTS[0]))
+
+    asyncio.run(run())
+    assert sched.concurrency_limit == 4
+    assert sched.rate_limited == 1
+
+
+def stalls_first_then_answers(seed_range=range(200)):
+    """A seed whose first call of PROMPTS[0] stalls and whose second does not (a hedge or retry)."""
+    for seed in seed_range:
+        probe = FakeChatModel(faults="stall=0.5", seed=seed)
+        faults = [probe._plan(prompt_messages(PROMPTS[0]))[1] for _ in range(2)]
+        if faults == ["stall", None]:
+            return seed
+    raise AssertionError("no suitable seed")
+
+
+def warmed_hedge(budget=1.0):
+    hedge = HedgePolicy(budget=budget, min_samples=1)
+    hedge.observe(0.05)
+    return hedge
+
+
+def test_call_timeout_gives_up_on_a_stalled_call():
+    sched = scheduler(call_timeout=0.1, max_retries=1)
+    llm = ScheduledLLM(FakeChatModel(faults="stall=1", stall_seconds=2), sched)
+    started = time.monotonic()
+    with pytest.raises(CallTimeout):
+        llm.invoke(prompt_messages(PROMPTS[0]))
+    assert time.monotonic() - started < 1
+    assert (sched.call_timeouts, sched.retries) == (2, 1)
+
+
+def test_timed_out_call_is_retried():
+    sched = scheduler(call_timeout=0.1)
+    llm = ScheduledLLM(FakeChatModel(faults="stall=0.5", stall_seconds=2, seed=stalls_first_then_answers()), sched)
+    assert llm.invoke(prompt_messages(PROMPTS[0])).content
+    assert (sched.call_timeouts, sched.retries) == (1, 1)
+
+
+def test_hedge_wins_over_a_stall():
+    sched = scheduler(call_timeout=1.0, hedge=warmed_hedge())
+    llm = ScheduledLLM(FakeChatModel(faults="stall=0.5", stall_seconds=2, seed=stalls_first_then_answers()), sched)
+    started = time.monotonic()
+    assert llm.invoke(prompt_messages(PROMPTS[0])).content
+    assert time.monotonic() - started < 0.5
+    stats = sched.stats()
+    assert (stats["hedges_sent"], stats["hedges_won"], stats["call_timeouts"]) == (1, 1, 0)
+
+
+def test_async_hedge_wins_over_a_stall():
+    sched = scheduler(call_timeout=1.0, hedge=warmed_hedge())
+    llm = ScheduledLLM(FakeChatModel(faults="stall=0.5", stall_seconds=2, seed=stalls_first_then_answers()), sched)
+
+    async def run():
+        return await llm.ainvoke(prompt_messages(PROMPTS[0]))
+
+    started = time.monotonic()
+    assert asyncio.run(run()).content
+    assert time.monotonic() - started < 0.5
+    assert sched.stats()["hedges_won"] == 1
+
+
+def test_hedges_stay_within_budget():
+    sched = scheduler(call_timeout=0.2, max_retries=0, hedge=warmed_hedge(budget=0.0))
+    llm = ScheduledLLM(FakeChatModel(faults="stall=1", stall_seconds=2), sched)
+    with pytest.raises(CallTimeout):
+        llm.invoke(prompt_messages(PROMPTS[0]))
+    stats = sched.stats()
+    assert (stats["hedges_sent"], stats["hedges_over_budget"]) == (0, 1)
+
+
+def test_hedge_delay_needs_enough_samples():
+    hedge = HedgePolicy(quantile=0.9, min_samples=10)
+    for seconds in range(9):
+        hedge.observe(seconds)
+    assert hedge.delay() is None
+    hedge.observe(9)
+    assert hedge.delay() == 9
@@ -0,0 +1,54 @@
+import io
+import json
+
+from conftest import load_script
+
+normalize = load_script("normalize-note-ai.py")
+
+
+def serve(*requests):
+    """Run the NDJSON loop over the given request lines and return the parsed response lines."""
+    stdin = io.StringIO("".join(r if isinstance(r, str) else json.dumps(r) for r in requests))
+    stdout = io.StringIO()
+    normalize.serve(normalize.NoteNormalizationGraph(), stdin=stdin, stdout=stdout)
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def test_one_line_per_request_in_order_with_ids():
+    responses = serve(
+        '{"id": 1, "note": "Rose Petals", "existingNotes": ["rose"]}\n',
+        "\n",
+        '{"note": "rose"}\n',
+        '{"id": "x", "note": "Amber Musk"}\n',
+    )
+    assert len(responses) == 3
+    assert responses[0] == {"id": 1, "normalized": "rose", "method": "suffix", "score": 0.9}
+    assert "id" not in responses[1]
+    assert responses[2]["id"] == "x"
+
+
+def test_existing_notes_carry_over_until_replaced():
+    responses = serve(
+        '{"note": "rose", "existingNotes": ["Rose", "oud"]}\n',
+        '{"note": "Oud"}\n',
+        '{"note": "Oud", "existingNotes": []}\n',
+    )
+    assert [r["method"] for r in responses] == ["exact", "exact", "llm"]
+
+
+def test_notes_list_answers_in_order():
+    [response] = serve('{"id": 2, "notes": ["Rose Petals", "Amber Musk"], "existingNotes": ["rose"]}\n')
+    assert response["id"] == 2
+    assert response["normalized"] == ["rose", "amber musk"]
+    assert [m["method"] for m in response["matches"]] == ["suffix", "llm"]
+
+
+def test_bad_requests_get_an_error_line_and_the_loop_goes_on():
+    responses = serve(
+        '{"id": 1, "note": "  "}\n',
+        "not json\n",
+        '{"id": 3, "note": "rose", "existingNotes": ["rose"]}\n',
+    )
+    assert responses[0] == {"id": 1, "error": "empty note"}
+    assert set(responses[1]) == {"error"}
+    assert responses[2]["normalized"] == "rose"
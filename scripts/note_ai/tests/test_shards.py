@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from note_ai.shards import in_shard, merge_streams, parse_shard, shard_of, shard_path
+
+
+def test_parse_shard():
+    assert parse_shard("1/4") == (1, 4)
+    for spec in ("4/4", "1", "a/b", "0/0", "-1/2"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_shards_partition_rows():
+    rows = [{"id": str(i)} for i in range(200)]
+    slices = [list(in_shard(rows, i, 3)) for i in range(3)]
+    assert sorted(r["id"] for s in slices for r in s) == sorted(r["id"] for r in rows)
+    assert all(slices)
+    assert shard_of(17, 3) == shard_of("17", 3)
+
+
+def test_merge_skips_ids_already_seen(tmp_path):
+    stream = tmp_path / "results.jsonl"
+    paths = [shard_path(stream, i, 2) for i in range(2)]
+    assert paths[0].name == "results.shard-0-of-2.jsonl"
+    paths[0].write_text(json.dumps({"note_id": "1", "n": "a"}) + "\n" + json.dumps({"note_id": 2, "n": "a"}) + "\n")
+    paths[1].write_text(json.dumps({"note_id": "2", "n": "b"}) + "\n" + json.dumps({"note_id": "3", "n": "b"}) + "\n"
+                        + '{"note_id": "4", "tru')  # interrupted last write
+    assert [(r["note_id"], r["n"]) for r in merge_streams(paths)] == [("1", "a"), (2, "a"), ("3", "b")]
@@ -0,0 +1,65 @@
+import json
+
+from conftest import load_script
+from note_ai.structured import JsonObjectScanner, compile_schema, parse_object
+
+extract = load_script("clean-notes-ai.py")
+normalize = load_script("normalize-note-ai.py")
+
+
+def test_parse_object_reasons():
+    validate = compile_schema({"type": "object", "properties": {"n": {"type": "integer"}},
+                               "required": ["n"], "additionalProperties": False})
+    assert parse_object('x {"n": 1} {"n": "ignored"}', validate) == ({"n": 1}, None)
+    assert parse_object('{"n": 1', validate) == (None, "no complete JSON object")
+    assert parse_object('{"n": 1,}', validate)[1].startswith("invalid JSON")
+    assert parse_object('{"n": true}', validate) == (None, "$.n: expected integer")
+    assert parse_object('{"n": 1, "m": 2}', validate) == (None, "$: unexpected 'm'")
+    assert parse_object('{"note": "a } in a string", "n": 2}', compile_schema({"type": "object"}))[0]["n"] == 2
+
+
+def test_validator_checks_nested_items_and_nullable_fields():
+    validate = compile_schema(extract.EXTRACT_SCHEMA)
+    answer = {"extracted_notes": None, "should_delete": True, "reasoning": "r", "confidence": 1}
+    assert validate(answer) is None
+    assert validate(dict(answer, extracted_notes=["rose", 3])) == "$.extracted_notes[]: expected string"
+    assert validate(dict(answer, extracted_notes="rose")) == "$.extracted_notes: expected array or null"
+
+
+def test_scanner_stops_at_the_first_object_across_chunks():
+    scanner = JsonObjectScanner()
+    pieces = ['noise {"a": "x\\"', '}", "b": {"c"', ': 1}}', ' trailing {']
+    done = [scanner.feed(piece) for piece in pieces]
+    assert done == [False, False, True, True]
+    assert json.loads(scanner.text) == {"a": 'x"}', "b": {"c": 1}}
+
+
+def test_structured_extraction_is_strict():
+    good = json.dumps({"extracted_notes": ["amber"], "should_delete": False, "reasoning": "r", "confidence": 1})
+    assert extract._parse_structured_response(good, False)["extracted_notes"] == ["amber"]
+    missing = extract._parse_structured_response('{"extracted_notes": ["amber"]}', False)
+    assert missing["status"] == "unparseable" and missing["should_delete"] is False
+    assert "missing 'should_delete'" in missing["reasoning"]
+    confirm = json.dumps({"valid": True, "extracted_notes": None, "should_delete": False,
+                          "reasoning": "", "confidence": 0.5})
+    assert extract._parse_structured_response(confirm, True) == {
+        "extracted_notes": None, "should_delete": False, "reasoning": "Confirmed valid scent note", "confidence": 0.5,
+    }
+
+
+def test_structured_normalize_and_canonical():
+    assert normalize._parse_normalize_structured('{"normalized_note": " Vetiver "}') == "vetiver"
+    assert normalize._parse_normalize_structured('{"normalized_note": " "}') is None
+    assert normalize._parse_normalize_structured('{"note": "vetiver"}') is None
+    names = ["Bergamot", "bergamotte"]
+    assert normalize._parse_canonical_structured('{"canonical": "Bergamot"}', names) is None
+    assert normalize._parse_canonical_structured('{"canonical": "bergamot", "distinct": []}', names) == {
+        "canonical": "Bergamot", "distinct": []}
+
+
+def test_malformed_structured_answer_is_kept_for_review(monkeypatch):
+    monkeypatch.setenv("NOTE_AI_FAKE_FAULTS", "malformed=1")
+    crew = extract.NoteExtractionGraph(rules=False, structured_output=True)
+    result = crew.extract_notes("rose and oud", [], reason="compound")
+    assert result["status"] == "unparseable"
+    assert result["should_delete"] is False